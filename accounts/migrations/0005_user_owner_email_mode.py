@@ -0,0 +1,18 @@
+# Generated by Django 4.2.28 on 2026-10-19 01:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_user_whatsapp_booking_updates_enabled'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='owner_email_mode',
+            field=models.CharField(choices=[('IMMEDIATE', 'Every booking'), ('HOURLY', 'Hourly digest'), ('DAILY', 'Daily digest')], default='IMMEDIATE', max_length=10),
+        ),
+    ]
@@ -10,6 +10,11 @@ class User(AbstractBaseUser, PermissionsMixin):
         ('owner', 'Ground Owner'),
         ('customer', 'Customer'),
     )
+    OWNER_EMAIL_MODE_CHOICES = (
+        ('IMMEDIATE', 'Every booking'),
+        ('HOURLY', 'Hourly digest'),
+        ('DAILY', 'Daily digest'),
+    )
 
     email = models.EmailField(unique=True)
     phone_number = models.CharField(max_length=15, unique=True)
@@ -37,6 +42,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     email_alerts = models.BooleanField(default=True)
     push_alerts = models.BooleanField(default=False)
     whatsapp_booking_updates_enabled = models.BooleanField(default=False)
+    owner_email_mode = models.CharField(max_length=10, choices=OWNER_EMAIL_MODE_CHOICES, default='IMMEDIATE')
 
     date_joined = models.DateTimeField(default=timezone.now)
 
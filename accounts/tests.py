@@ -347,6 +347,16 @@ class AdminGroundCrudTests(TestCase):
         self.owner.refresh_from_db()
         self.assertTrue(self.owner.whatsapp_booking_updates_enabled)
 
+    def test_admin_can_switch_owner_to_email_digest(self):
+        response = self.client.post(f'/accounts/ground-owner/{self.owner.id}/email-mode/', {'mode': 'HOURLY'})
+        self.assertEqual(response.status_code, 302)
+        self.owner.refresh_from_db()
+        self.assertEqual(self.owner.owner_email_mode, 'HOURLY')
+
+        self.client.post(f'/accounts/ground-owner/{self.owner.id}/email-mode/', {'mode': 'WEEKLY'})
+        self.owner.refresh_from_db()
+        self.assertEqual(self.owner.owner_email_mode, 'HOURLY')
+
 
 @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
 class RegistrationResilienceTests(TestCase):
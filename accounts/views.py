@@ -2,6 +2,8 @@ import logging
 from urllib.parse import quote
 
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
 from django.contrib.auth import login, logout, authenticate
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
@@ -21,8 +23,12 @@ from django import forms
 from .models import User
 from bookings.models import EmailVerification
 from bookings.models import Booking
+from bookings.analytics import booking_time_series
 from bookings.money import ground_collected_amount_expression, online_collected_amount_expression
+from bookings.public_cache import cached_leaderboard_html
 from bookings.slot_generation import create_initial_slots_for_ground
+from bookings.utilisation import occupancy_by_ground
+from config.db_routing import read_only
 from .forms import UserRegistrationForm, UserLoginForm, GroundOwnerCreationForm, GroundOwnerEditForm, GroundCreationForm, CustomerProfileForm
 from grounds.models import Ground, Tournament, TournamentRegistration
 
@@ -317,30 +323,40 @@ def register(request):
     return render(request, 'accounts/register.html', {'form': form})
 
 
-@ensure_csrf_cookie
-def login_view(request):
-    if request.user.is_authenticated:
-        return redirect('home')
-
-    today = timezone.localdate()
-    week_start = today - timedelta(days=6)
+def _build_public_leaderboards_html():
+    week_start = timezone.localdate() - timedelta(days=6)
     public_top_grounds = (
         Booking.objects.filter(status='BOOKED', slot__date__gte=week_start)
         .values('slot__ground__name')
         .annotate(bookings_count=Count('id'))
-        .order_by('-bookings_count', 'slot__ground__name')[:5]
+        .order_by('-bookings_count', 'slot__ground__name')[:3]
     )
     public_top_tournaments = (
         TournamentRegistration.objects.filter(status='REGISTERED', created_at__date__gte=week_start)
         .values('tournament__title')
         .annotate(registrations_count=Count('id'))
-        .order_by('-registrations_count', 'tournament__title')[:5]
+        .order_by('-registrations_count', 'tournament__title')[:3]
     )
     public_top_players = (
         User.objects.filter(role='customer')
         .annotate(total_bookings=Count('booking', filter=Q(booking__status='BOOKED')))
-        .order_by('-total_bookings', 'name')[:5]
+        .order_by('-total_bookings', 'name')[:3]
     )
+    return str(render_to_string('accounts/partials/_public_leaderboards.html', {
+        'public_top_grounds': public_top_grounds,
+        'public_top_tournaments': public_top_tournaments,
+        'public_top_players': public_top_players,
+    }))
+
+
+def _public_leaderboards_html():
+    return mark_safe(cached_leaderboard_html(_build_public_leaderboards_html))
+
+
+@ensure_csrf_cookie
+def login_view(request):
+    if request.user.is_authenticated:
+        return redirect('home')
 
     # Handle identifier pre-fill from register redirect
     identifier_param = request.GET.get('identifier', '')
@@ -372,9 +388,7 @@ def login_view(request):
                 messages.info(request, 'No account found with that login. You can register instead.')
                 context = {
                     'form': form,
-                    'public_top_grounds': public_top_grounds,
-                    'public_top_tournaments': public_top_tournaments,
-                    'public_top_players': public_top_players,
+                    'public_leaderboards_html': _public_leaderboards_html(),
                     'show_register_prompt': True,
                     'missing_account_email': identifier_value,
                     'next': next_url,
@@ -392,9 +406,7 @@ def login_view(request):
                     messages.error(request, 'Please verify your email before logging in.')
                     context = {
                         'form': form,
-                        'public_top_grounds': public_top_grounds,
-                        'public_top_tournaments': public_top_tournaments,
-                        'public_top_players': public_top_players,
+                        'public_leaderboards_html': _public_leaderboards_html(),
                         'unverified_email': user_obj.email,
                         'show_resend_verification': True,
                         'next': next_url,
@@ -418,9 +430,7 @@ def login_view(request):
 
     return render(request, 'accounts/login.html', {
         'form': form,
-        'public_top_grounds': public_top_grounds,
-        'public_top_tournaments': public_top_tournaments,
-        'public_top_players': public_top_players,
+        'public_leaderboards_html': _public_leaderboards_html(),
         'next': next_url,
         'slot': slot_id_param,
     })
@@ -584,6 +594,7 @@ def terms_conditions(request):
 
 
 @login_required
+@read_only()
 def admin_dashboard(request):
     if request.user.role != 'admin':
         messages.error(request, 'Access denied.')
@@ -629,9 +640,14 @@ def admin_dashboard(request):
     month_owner_payout = int(month_sums['owner_payout'] or 0)
     month_platform_revenue = month_gmv - month_owner_payout
 
-    days = [today - timedelta(days=i) for i in range(6, -1, -1)]
-    trend_labels = [d.strftime('%Y-%m-%d') for d in days]
-    trend_data = [booked.filter(slot__date=d).count() for d in days]
+    trend_series = booking_time_series(
+        start_date=today - timedelta(days=6),
+        end_date=today,
+        granularity='day',
+        bookings=booked,
+    )
+    trend_labels = [row['bucket'].strftime('%Y-%m-%d') for row in trend_series]
+    trend_data = [row['bookings'] for row in trend_series]
 
     top_grounds = (
         booked.values('slot__ground_id', 'slot__ground__name')
@@ -677,6 +693,10 @@ def admin_dashboard(request):
     )
 
     # Per-ground breakdown: total bookings & online money collected (all time + this month)
+    month_occupancy = {
+        row['ground_id']: row
+        for row in occupancy_by_ground(start_date=month_start, end_date=today)
+    }
     per_ground_data = []
     for g in grounds:
         all_bookings = booked.filter(slot__ground=g)
@@ -697,6 +717,7 @@ def admin_dashboard(request):
             'month_online_collected': month_online_collected,
             'month_manual_collected': month_manual_collected,
             'month_total_collected': month_online_collected + month_manual_collected,
+            'month_occupancy': month_occupancy.get(g.id),
         })
 
     context = {
@@ -821,6 +842,23 @@ def toggle_owner_whatsapp_booking_updates(request, owner_id):
     return redirect(request.POST.get('next') or 'admin_dashboard')
 
 
+@login_required
+def set_owner_email_mode(request, owner_id):
+    if request.user.role != 'admin' or request.method != 'POST':
+        messages.error(request, 'Access denied.')
+        return redirect('home')
+
+    owner = get_object_or_404(User, id=owner_id, role='owner')
+    mode = request.POST.get('mode')
+    if mode not in dict(User.OWNER_EMAIL_MODE_CHOICES):
+        messages.error(request, 'Invalid email mode.')
+        return redirect(request.POST.get('next') or 'admin_dashboard')
+    owner.owner_email_mode = mode
+    owner.save(update_fields=['owner_email_mode'])
+    messages.success(request, f'Booking emails for {owner.name}: {owner.get_owner_email_mode_display().lower()}.')
+    return redirect(request.POST.get('next') or 'admin_dashboard')
+
+
 @login_required
 def create_ground(request, owner_id):
     if request.user.role != 'admin':
@@ -955,4 +993,5 @@ def customer_profile(request):
         'loyalty_points': points,
         'free_booking_credits': request.user.free_booking_credits,
         'rank': rank,
+        'vapid_public_key': getattr(settings, 'VAPID_PUBLIC_KEY', ''),
     })
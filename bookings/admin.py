@@ -12,6 +12,18 @@ from .models import (
     AlertDispatchLog,
     OnlineSettlement,
     OnlineSettlementLineItem,
+    SlotUtilisationRollup,
+    ExportJob,
+    ReconciliationRun,
+    ReconciliationRecord,
+    PaymentAttempt,
+    PaymentAttemptEvent,
+    WebhookEvent,
+    WhatsAppDelivery,
+    WhatsAppOutboxMessage,
+    OwnerNotificationEvent,
+    PushSubscription,
+    SlotWaitlistEntry,
 )
 from .models import GroundInvoice
 from grounds.models import Ground
@@ -203,3 +215,95 @@ class AlertSubscriptionAdmin(admin.ModelAdmin):
 class AlertDispatchLogAdmin(admin.ModelAdmin):
     list_display = ('reason', 'ground', 'tournament', 'alert_date', 'created_at')
     list_filter = ('reason', 'alert_date')
+
+
+@admin.register(SlotUtilisationRollup)
+class SlotUtilisationRollupAdmin(admin.ModelAdmin):
+    list_display = ('ground', 'date', 'hour', 'weekday', 'booked_count', 'slot_count', 'refreshed_at')
+    list_filter = ('ground', 'weekday')
+    date_hierarchy = 'date'
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'file_format', 'status', 'rows_written', 'total_rows', 'requested_by', 'created_at')
+    list_filter = ('kind', 'status', 'file_format')
+    readonly_fields = ('created_at', 'started_at', 'heartbeat_at', 'finished_at')
+
+
+@admin.register(ReconciliationRun)
+class ReconciliationRunAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'source', 'source_name', 'status', 'rows_read', 'matched_count',
+        'missing_booking_count', 'amount_mismatch_count', 'orphan_booking_count', 'started_at',
+    )
+    list_filter = ('source', 'status')
+
+
+@admin.register(ReconciliationRecord)
+class ReconciliationRecordAdmin(admin.ModelAdmin):
+    list_display = ('run', 'result', 'payment_id', 'order_id', 'booking', 'reported_amount', 'expected_amount')
+    list_filter = ('result',)
+    search_fields = ('payment_id', 'order_id')
+    raw_id_fields = ('booking',)
+
+
+class PaymentAttemptEventInline(admin.TabularInline):
+    model = PaymentAttemptEvent
+    extra = 0
+    readonly_fields = ('status', 'source', 'detail', 'created_at')
+
+
+@admin.register(PaymentAttempt)
+class PaymentAttemptAdmin(admin.ModelAdmin):
+    list_display = ('razorpay_order_id', 'razorpay_payment_id', 'status', 'amount', 'booking', 'user', 'created_at')
+    list_filter = ('status', 'payment_mode')
+    search_fields = ('razorpay_order_id', 'razorpay_payment_id')
+    raw_id_fields = ('booking', 'user', 'slot')
+    inlines = [PaymentAttemptEventInline]
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'provider', 'event_type', 'ordering_key', 'status', 'attempts', 'received_at', 'processed_at')
+    list_filter = ('provider', 'status')
+    search_fields = ('dedupe_key', 'ordering_key', 'event_type')
+    readonly_fields = ('provider', 'dedupe_key', 'event_type', 'ordering_key', 'payload', 'received_at')
+
+
+@admin.register(WhatsAppDelivery)
+class WhatsAppDeliveryAdmin(admin.ModelAdmin):
+    list_display = ('message_id', 'recipient', 'template_name', 'status', 'status_at', 'booking', 'created_at')
+    list_filter = ('status', 'template_name')
+    search_fields = ('message_id', 'recipient')
+    raw_id_fields = ('booking',)
+
+
+@admin.register(WhatsAppOutboxMessage)
+class WhatsAppOutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('id', 'template_name', 'recipient', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'last_error')
+    list_filter = ('status', 'template_name')
+    search_fields = ('recipient', 'message_id')
+    raw_id_fields = ('booking',)
+
+
+@admin.register(OwnerNotificationEvent)
+class OwnerNotificationEventAdmin(admin.ModelAdmin):
+    list_display = ('owner', 'event', 'booking', 'created_at', 'digested_at')
+    list_filter = ('event',)
+    raw_id_fields = ('owner', 'booking')
+
+
+@admin.register(PushSubscription)
+class PushSubscriptionAdmin(admin.ModelAdmin):
+    list_display = ('user', 'endpoint', 'failure_count', 'last_success_at', 'created_at')
+    search_fields = ('user__email', 'endpoint')
+    raw_id_fields = ('user',)
+
+
+@admin.register(SlotWaitlistEntry)
+class SlotWaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'ground', 'date', 'start_time', 'status', 'created_at', 'offered_at')
+    list_filter = ('status', 'ground')
+    search_fields = ('user__email', 'ground__name')
+    raw_id_fields = ('user',)
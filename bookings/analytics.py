@@ -0,0 +1,83 @@
+"""Booking time series bucketed by day, week or month in a single grouped query."""
+
+from datetime import timedelta
+
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import Coalesce, Trunc
+
+from .models import Booking
+from .money import ground_collected_amount_expression, online_collected_amount_expression
+
+
+def _next_day(bucket):
+    return bucket + timedelta(days=1)
+
+
+def _next_week(bucket):
+    return bucket + timedelta(weeks=1)
+
+
+def _next_month(bucket):
+    if bucket.month == 12:
+        return bucket.replace(year=bucket.year + 1, month=1)
+    return bucket.replace(month=bucket.month + 1)
+
+
+def _week_start(value):
+    return value - timedelta(days=value.weekday())
+
+
+# granularity -> (Trunc kind, align a date to its bucket, step to the next bucket)
+GRANULARITIES = {
+    'day': ('day', lambda value: value, _next_day),
+    'week': ('week', _week_start, _next_week),
+    'month': ('month', lambda value: value.replace(day=1), _next_month),
+}
+
+SERIES_FIELDS = ('bookings', 'gmv', 'owner_payout', 'collected')
+
+
+def booking_time_series(*, start_date, end_date, granularity='day', grounds=None, bookings=None):
+    """Return zero-filled buckets of bookings, GMV, owner payout and collected amounts.
+
+    `grounds` narrows the series to a ground queryset or id list; `bookings` lets
+    callers pass an already-filtered base queryset (defaults to active bookings).
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f'Unsupported granularity: {granularity}')
+    kind, align, step = GRANULARITIES[granularity]
+
+    qs = bookings if bookings is not None else Booking.objects.filter(status='BOOKED')
+    qs = qs.filter(slot__date__gte=start_date, slot__date__lte=end_date)
+    if grounds is not None:
+        qs = qs.filter(slot__ground__in=grounds)
+
+    rows = (
+        qs.annotate(bucket=Trunc('slot__date', kind, output_field=DateField()))
+        .values('bucket')
+        .annotate(
+            bookings=Count('id'),
+            gmv=Coalesce(Sum('total_amount'), 0),
+            owner_payout=Coalesce(Sum('owner_payout'), 0),
+            online_collected=Coalesce(Sum(online_collected_amount_expression()), 0),
+            ground_collected=Coalesce(Sum(ground_collected_amount_expression()), 0),
+        )
+        .order_by('bucket')
+    )
+    by_bucket = {
+        row['bucket']: {
+            'bookings': int(row['bookings'] or 0),
+            'gmv': int(row['gmv'] or 0),
+            'owner_payout': int(row['owner_payout'] or 0),
+            'collected': int(row['online_collected'] or 0) + int(row['ground_collected'] or 0),
+        }
+        for row in rows
+    }
+
+    series = []
+    bucket = align(start_date)
+    while bucket <= end_date:
+        values = by_bucket.get(bucket) or dict.fromkeys(SERIES_FIELDS, 0)
+        series.append({'bucket': bucket, **values})
+        bucket = step(bucket)
+    return series
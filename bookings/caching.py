@@ -0,0 +1,83 @@
+"""Namespaced, versioned caching shared by every worker.
+
+Cached values declare the namespaces they depend on (availability, grounds,
+reviews, tournaments). Each namespace has a version counter stored in the shared cache
+and embedded in the keys of its entries; model signals bump the counter, so
+stale entries are never read again and simply age out. Inside a transaction the
+bump is repeated on commit, so a worker that rebuilds an entry between the
+write and the commit cannot pin pre-commit data under the new version.
+
+The backend comes from CACHES (locmem, file-based or Redis, see CACHE_BACKEND),
+so with a shared backend an invalidation in one worker is seen by all of them.
+"""
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from config.db_routing import use_primary
+
+
+AVAILABILITY = 'availability'
+GROUNDS = 'grounds'
+REVIEWS = 'reviews'
+TOURNAMENTS = 'tournaments'
+
+NAMESPACES = (AVAILABILITY, GROUNDS, REVIEWS, TOURNAMENTS)
+
+
+def _version_key(namespace):
+    return f'ns:{namespace}:version'
+
+
+def namespace_versions(namespaces):
+    """Current version of each namespace, fetched with one cache round trip."""
+    keys = {_version_key(namespace): namespace for namespace in namespaces}
+    found = cache.get_many(list(keys))
+    versions = {}
+    for key, namespace in keys.items():
+        version = found.get(key)
+        if version is None:
+            cache.add(key, 1, timeout=None)
+            version = cache.get(key) or 1
+        versions[namespace] = version
+    return versions
+
+
+def _bump(namespace):
+    try:
+        cache.incr(_version_key(namespace))
+    except ValueError:
+        cache.set(_version_key(namespace), 2, timeout=None)
+
+
+def invalidate(*namespaces):
+    """Retire every cached entry that depends on any of `namespaces`."""
+    for namespace in namespaces:
+        _bump(namespace)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: [_bump(namespace) for namespace in namespaces])
+
+
+def cache_key(name, *parts, depends_on=()):
+    versions = namespace_versions(depends_on)
+    bits = [name]
+    bits.extend(f'{namespace}{versions[namespace]}' for namespace in depends_on)
+    bits.extend(str(part) for part in parts)
+    return ':'.join(bits)
+
+
+def get_or_build(name, builder, *, parts=(), depends_on=(), ttl=None):
+    """Return the cached value for `name`/`parts`, calling `builder()` on a miss.
+
+    `builder` must return something picklable and must not return None (a None
+    result is never cached). `ttl` bounds time-sensitive data; invalidation
+    does not rely on it. The builder always reads the primary database.
+    """
+    key = cache_key(name, *parts, depends_on=depends_on)
+    value = cache.get(key)
+    if value is None:
+        with use_primary():
+            value = builder()
+        if value is not None:
+            cache.set(key, value, ttl)
+    return value
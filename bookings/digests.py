@@ -0,0 +1,119 @@
+"""Owner email digests.
+
+Owners on an hourly or daily digest get booking events recorded as
+`OwnerNotificationEvent` rows instead of one email each; `send_owner_digests`
+later renders all pending events for an owner into a single email, loading the
+owner's day sheets for every affected ground and date in one query. Events
+listed in OWNER_DIGEST_URGENT_EVENTS are always mailed immediately.
+"""
+
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db.models import Q
+from django.utils import timezone
+
+from accounts.models import User
+
+from .models import Booking, OwnerNotificationEvent
+
+
+logger = logging.getLogger(__name__)
+
+DIGEST_MODES = ('HOURLY', 'DAILY')
+
+
+def owner_uses_digest(owner, event):
+    """True when this event should wait for the owner's digest rather than be mailed now."""
+    if getattr(owner, 'owner_email_mode', 'IMMEDIATE') not in DIGEST_MODES:
+        return False
+    return event not in getattr(settings, 'OWNER_DIGEST_URGENT_EVENTS', ('BOOKING_CANCELLED',))
+
+
+def record_owner_event(owner, booking, event):
+    return OwnerNotificationEvent.objects.create(owner=owner, booking=booking, event=event)
+
+
+def _time_range(slot):
+    return f"{slot.start_time.strftime('%I:%M %p')} - {slot.end_time.strftime('%I:%M %p')}"
+
+
+def render_owner_digest(owner, events, day_bookings, mode):
+    event_labels = dict(OwnerNotificationEvent.EVENT_CHOICES)
+    counts = defaultdict(int)
+    for event in events:
+        counts[event.event] += 1
+    summary = ', '.join(f"{counts[code]} × {label}" for code, label in OwnerNotificationEvent.EVENT_CHOICES if counts[code])
+
+    update_lines = [
+        f"- [{event_labels[event.event]}] {event.booking.slot.ground.name} | {event.booking.slot.date} | "
+        f"{_time_range(event.booking.slot)} | {event.booking.customer_name} ({event.booking.customer_phone}) | "
+        f"{event.booking.get_payment_status_display()}"
+        for event in events
+    ]
+    sheets = defaultdict(list)
+    for booking in day_bookings:
+        sheets[(booking.slot.date, booking.slot.ground.name)].append(
+            f"- {_time_range(booking.slot)} | {booking.customer_name} | {booking.customer_phone} | {booking.get_status_display()}"
+        )
+    sheet_sections = [
+        f"{ground_name} on {day}:\n" + "\n".join(lines)
+        for (day, ground_name), lines in sorted(sheets.items())
+    ]
+
+    period = 'hourly' if mode == 'HOURLY' else 'daily'
+    subject = f"FootBook {period} summary: {len(events)} booking update{'s' if len(events) != 1 else ''}"
+    body = (
+        f"Hello {owner.name},\n\n"
+        f"Your {period} booking summary: {summary}.\n\n"
+        "Updates:\n"
+        + "\n".join(update_lines)
+        + "\n\nBookings on the affected days:\n"
+        + ("\n\n".join(sheet_sections) if sheet_sections else "- No confirmed bookings.")
+        + "\n\nRegards,\nFootBook"
+    )
+    return subject, body
+
+
+def send_owner_digests(mode):
+    """Mail one digest per owner on `mode` with pending events; returns a summary dict.
+
+    Owners who have since switched back to immediate emails get their leftover
+    events in whichever digest run comes next, so nothing recorded is dropped.
+    """
+    summary = {'owners': 0, 'events': 0, 'failed': 0}
+    pending = OwnerNotificationEvent.objects.filter(
+        Q(owner__owner_email_mode=mode) | ~Q(owner__owner_email_mode__in=DIGEST_MODES),
+        digested_at__isnull=True,
+    )
+    owner_ids = set(pending.values_list('owner_id', flat=True))
+    from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', None) or getattr(settings, 'EMAIL_HOST_USER', None)
+
+    for owner in User.objects.filter(id__in=owner_ids).exclude(email='').order_by('id'):
+        events = list(
+            pending.filter(owner=owner)
+            .select_related('booking__slot__ground')
+            .order_by('created_at', 'id')
+        )
+        if not events:
+            continue
+        dates = {event.booking.slot.date for event in events}
+        ground_ids = {event.booking.slot.ground_id for event in events}
+        day_bookings = (
+            Booking.objects.filter(slot__ground_id__in=ground_ids, slot__date__in=dates, status='BOOKED')
+            .select_related('slot__ground')
+            .order_by('slot__date', 'slot__ground__name', 'slot__start_time', 'created_at')
+        )
+        subject, body = render_owner_digest(owner, events, day_bookings, mode)
+        try:
+            send_mail(subject, body, from_email, [owner.email], fail_silently=False)
+        except Exception:
+            logger.exception('Failed to send owner digest owner=%s', owner.id)
+            summary['failed'] += 1
+            continue
+        OwnerNotificationEvent.objects.filter(id__in=[event.id for event in events]).update(digested_at=timezone.now())
+        summary['owners'] += 1
+        summary['events'] += len(events)
+    return summary
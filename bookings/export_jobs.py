@@ -0,0 +1,182 @@
+"""Background export jobs that write gzip-compressed CSV or JSONL files to EXPORT_ROOT.
+
+Jobs are queued from the admin invoices page and run on a small in-process
+executor after the creating transaction commits. `run_export_jobs` picks up
+anything left PENDING (e.g. after a restart) and RUNNING jobs whose worker
+died mid-export. Files sit outside MEDIA_ROOT and are only served by the admin
+download view.
+"""
+
+import csv
+import gzip
+import json
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from config.db_routing import read_only
+
+from .exports import (
+    BOOKING_EXPORT_HEADER,
+    EXPORT_CHUNK_SIZE,
+    SETTLEMENT_EXPORT_HEADER,
+    booking_export_queryset,
+    booking_export_row,
+    settlement_export_queryset,
+    settlement_export_row,
+)
+from .models import ExportJob
+
+
+logger = logging.getLogger(__name__)
+
+# A RUNNING job whose worker died (crash, --max-requests recycle) is picked up again once
+# its heartbeat, refreshed with every chunk written, is older than this.
+STALE_RUNNING_AFTER = timedelta(minutes=30)
+
+# kind -> (header, queryset builder, row builder)
+EXPORT_SOURCES = {
+    'bookings': (BOOKING_EXPORT_HEADER, booking_export_queryset, booking_export_row),
+    'settlements': (SETTLEMENT_EXPORT_HEADER, settlement_export_queryset, settlement_export_row),
+}
+
+_export_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='footbook-export')
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def queue_export_job(job):
+    """Hand the job to the background worker once the creating transaction commits."""
+    def _submit():
+        try:
+            _export_executor.submit(run_export_job, job.id)
+        except RuntimeError:
+            logger.exception('Could not queue export job=%s', job.id)
+
+    transaction.on_commit(_submit)
+
+
+def _write_rows(handle, file_format, header, rows):
+    if file_format == 'jsonl':
+        for row in rows:
+            handle.write(json.dumps(dict(zip(header, row)), default=str))
+            handle.write('\n')
+            yield
+    else:
+        writer = csv.writer(handle)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            yield
+
+
+def runnable_jobs(now=None):
+    """Jobs waiting to run: PENDING ones, plus RUNNING ones whose worker has gone away."""
+    now = now or timezone.now()
+    return ExportJob.objects.filter(
+        Q(status='PENDING') | Q(status='RUNNING', heartbeat_at__lte=now - STALE_RUNNING_AFTER)
+    )
+
+
+def run_export_job(job_id):
+    """Build the export file for a job, recording progress every chunk."""
+    try:
+        # Re-applying the runnable filter makes the claim atomic against other workers.
+        now = timezone.now()
+        claimed = runnable_jobs(now).filter(id=job_id).update(
+            status='RUNNING',
+            started_at=now,
+            heartbeat_at=now,
+            rows_written=0,
+        )
+        if not claimed:
+            return
+        job = ExportJob.objects.get(id=job_id)
+        header, build_queryset, build_row = EXPORT_SOURCES[job.kind]
+        params = {key: job.params.get(key) for key in ('ground_id', 'start', 'end')}
+        with read_only():
+            qs = build_queryset(**params)
+            qs = qs.using(qs.db)
+        ExportJob.objects.filter(id=job.id).update(total_rows=qs.count(), heartbeat_at=timezone.now())
+
+        relative_path = f'{job.kind}-{job.id}.{job.file_format}.gz'
+        absolute_path = job.file.storage.path(relative_path)
+        os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
+
+        written = 0
+        rows = (build_row(obj) for obj in qs.iterator(chunk_size=EXPORT_CHUNK_SIZE))
+        with gzip.open(absolute_path, 'wt', encoding='utf-8', newline='') as handle:
+            for _ in _write_rows(handle, job.file_format, header, rows):
+                written += 1
+                if written % EXPORT_CHUNK_SIZE == 0:
+                    ExportJob.objects.filter(id=job.id).update(rows_written=written, heartbeat_at=timezone.now())
+
+        ExportJob.objects.filter(id=job.id).update(
+            status='DONE',
+            rows_written=written,
+            file=relative_path,
+            finished_at=timezone.now(),
+        )
+    except Exception as exc:
+        logger.exception('Export job failed job=%s', job_id)
+        ExportJob.objects.filter(id=job_id).update(
+            status='FAILED',
+            error=str(exc)[:1000],
+            finished_at=timezone.now(),
+        )
+    finally:
+        close_old_connections()
+
+
+def export_file_response(request, job):
+    """Serve a finished export, honouring a single `Range: bytes=` request."""
+    path = job.file.path
+    size = os.path.getsize(path)
+    filename = os.path.basename(path)
+    range_header = request.headers.get('Range', '')
+    match = _RANGE_RE.match(range_header.strip())
+
+    if not match or match.groups() == ('', ''):
+        resp = FileResponse(open(path, 'rb'), as_attachment=True, filename=filename, content_type='application/gzip')
+        resp['Accept-Ranges'] = 'bytes'
+        return resp
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start > end or start >= size:
+        resp = HttpResponse(status=416)
+        resp['Content-Range'] = f'bytes */{size}'
+        return resp
+
+    handle = open(path, 'rb')
+    handle.seek(start)
+    resp = StreamingHttpResponse(_read_range(handle, end - start + 1), status=206, content_type='application/gzip')
+    resp['Content-Length'] = str(end - start + 1)
+    resp['Content-Range'] = f'bytes {start}-{end}/{size}'
+    resp['Content-Disposition'] = f'attachment; filename="{filename}"'
+    resp['Accept-Ranges'] = 'bytes'
+    return resp
+
+
+def _read_range(handle, length, block_size=64 * 1024):
+    try:
+        while length > 0:
+            data = handle.read(min(block_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        handle.close()
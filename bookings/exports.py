@@ -0,0 +1,148 @@
+"""CSV column layouts for booking, invoice and settlement exports, streamed row by row."""
+
+import csv
+
+from django.http import StreamingHttpResponse
+
+from .models import Booking, GroundInvoice, OnlineSettlement
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+BOOKING_EXPORT_HEADER = [
+    'Booking ID',
+    'Ground',
+    'Date',
+    'Start',
+    'End',
+    'Customer Name',
+    'Customer Phone',
+    'User Email',
+    'Booking Source',
+    'Payment Mode',
+    'Payment Status',
+    'Paid Amount',
+    'Due Amount',
+    'Owner Payout',
+    'Amount',
+    'Status',
+]
+
+INVOICE_EXPORT_HEADER = ['Ground', 'Period Start', 'Period End', 'Bookings', 'Charge Per Booking', 'Total', 'Paid', 'Created At']
+
+
+def booking_export_queryset(*, ground_id=None, start=None, end=None):
+    qs = Booking.objects.select_related('slot__ground', 'user')
+    if ground_id:
+        qs = qs.filter(slot__ground__id=ground_id)
+    if start:
+        qs = qs.filter(slot__date__gte=start)
+    if end:
+        qs = qs.filter(slot__date__lte=end)
+    return qs.order_by('-slot__date', '-slot__start_time')
+
+
+def booking_export_row(b):
+    return [
+        str(b.id),
+        b.slot.ground.name if b.slot and b.slot.ground else '',
+        b.slot.date if b.slot else '',
+        b.slot.start_time.strftime('%H:%M') if b.slot else '',
+        b.slot.end_time.strftime('%H:%M') if b.slot else '',
+        b.customer_name,
+        b.customer_phone,
+        b.user.email if b.user and getattr(b.user, 'email', None) else '',
+        b.get_booking_source_display(),
+        b.get_payment_mode_display(),
+        b.get_payment_status_display(),
+        f"{b.paid_amount}",
+        f"{b.due_amount}",
+        f"{b.owner_payout}",
+        f"{b.total_amount}",
+        b.status,
+    ]
+
+
+def invoice_export_queryset(*, start=None, end=None):
+    qs = GroundInvoice.objects.select_related('ground')
+    if start and end:
+        qs = qs.filter(period_start__gte=start, period_end__lte=end)
+    return qs.order_by('-created_at')
+
+
+def invoice_export_row(inv):
+    return [
+        inv.ground.name,
+        inv.period_start,
+        inv.period_end,
+        inv.bookings_count,
+        f"{inv.charge_per_booking}",
+        f"{inv.total_amount}",
+        'Yes' if inv.is_paid else 'No',
+        inv.created_at,
+    ]
+
+
+SETTLEMENT_EXPORT_HEADER = [
+    'Reference',
+    'Ground',
+    'Owner',
+    'Period Start',
+    'Period End',
+    'Bookings',
+    'Collected Amount',
+    'Status',
+    'Created At',
+    'Transferred At',
+    'Owner Confirmed At',
+]
+
+
+def settlement_export_queryset(*, ground_id=None, start=None, end=None):
+    qs = OnlineSettlement.objects.select_related('ground', 'owner')
+    if ground_id:
+        qs = qs.filter(ground__id=ground_id)
+    if start:
+        qs = qs.filter(period_start__gte=start)
+    if end:
+        qs = qs.filter(period_end__lte=end)
+    return qs.order_by('-period_start', '-created_at')
+
+
+def settlement_export_row(s):
+    return [
+        s.reference,
+        s.ground.name,
+        s.owner.name,
+        s.period_start,
+        s.period_end,
+        s.booking_count,
+        f"{s.collected_amount}",
+        s.status,
+        s.created_at,
+        s.transferred_at or '',
+        s.owner_confirmed_at or '',
+    ]
+
+
+class _Echo:
+    """File-like sink for csv.writer that hands each encoded line straight back."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(header, queryset, row_builder):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for obj in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield writer.writerow(row_builder(obj))
+
+
+def streaming_csv_response(filename, header, queryset, row_builder):
+    # Rows are read after the view returns, so fix the database now, while any
+    # read_only() context of the view still applies.
+    queryset = queryset.using(queryset.db)
+    resp = StreamingHttpResponse(iter_csv(header, queryset, row_builder), content_type='text/csv')
+    resp['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return resp
@@ -0,0 +1,144 @@
+"""Ground invoice generation shared by the admin invoices page and `generate_invoices`.
+
+`invoice_ground` bills one ground's uninvoiced bookings for a period;
+`generate_invoices` runs it for every ground with pending bookings, each in its
+own savepoint so one bad ground does not roll back the whole month-end run.
+"""
+
+import logging
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from grounds.models import Ground
+
+from .models import Booking, GroundInvoice, InvoiceLineItem
+
+
+logger = logging.getLogger(__name__)
+
+
+def invoice_ground(ground_id, period_start, period_end, charge_per_booking):
+    """Create or refresh the ground's invoice for the period.
+
+    Returns `(status, invoice, bookings_count, total)` where status is one of
+    'created', 'updated', 'empty' or 'paid' (an already-paid invoice is left alone).
+    Must run inside a transaction; the ground and its bookings are row-locked.
+    """
+    ground = Ground.objects.select_for_update().get(id=ground_id)
+    booking_ids = list(
+        Booking.objects.select_for_update()
+        .filter(
+            status='BOOKED',
+            invoiced_at__isnull=True,
+            slot__ground=ground,
+            slot__date__gte=period_start,
+            slot__date__lte=period_end,
+        )
+        .order_by('slot__date', 'slot__start_time', 'id')
+        .values_list('id', flat=True)
+    )
+    bookings_count = len(booking_ids)
+    if bookings_count == 0:
+        return 'empty', None, 0, Decimal('0.00')
+
+    total = (Decimal(bookings_count) * charge_per_booking).quantize(Decimal('0.01'))
+    invoice = GroundInvoice.objects.select_for_update().filter(
+        ground=ground,
+        period_start=period_start,
+        period_end=period_end,
+    ).first()
+
+    if invoice and invoice.is_paid:
+        return 'paid', invoice, bookings_count, total
+
+    if invoice is None:
+        status = 'created'
+        invoice = GroundInvoice.objects.create(
+            ground=ground,
+            period_start=period_start,
+            period_end=period_end,
+            bookings_count=bookings_count,
+            charge_per_booking=charge_per_booking,
+            total_amount=total,
+            is_paid=False,
+        )
+    else:
+        status = 'updated'
+        previous_booking_ids = set(invoice.line_items.values_list('booking_id', flat=True))
+        invoice.bookings_count = bookings_count
+        invoice.charge_per_booking = charge_per_booking
+        invoice.total_amount = total
+        invoice.is_paid = False
+        invoice.settled_at = None
+        invoice.settled_by = None
+        invoice.save(update_fields=[
+            'bookings_count',
+            'charge_per_booking',
+            'total_amount',
+            'is_paid',
+            'settled_at',
+            'settled_by',
+        ])
+        invoice.line_items.all().delete()
+        stale_booking_ids = previous_booking_ids.difference(booking_ids)
+        if stale_booking_ids:
+            Booking.objects.filter(id__in=stale_booking_ids, invoiced_at__isnull=False).update(invoiced_at=None)
+
+    InvoiceLineItem.objects.bulk_create(
+        [
+            InvoiceLineItem(invoice=invoice, booking_id=booking_id, charge_amount=charge_per_booking)
+            for booking_id in booking_ids
+        ],
+        batch_size=1000,
+    )
+    Booking.objects.filter(id__in=booking_ids).update(invoiced_at=timezone.now())
+    return status, invoice, bookings_count, total
+
+
+def generate_invoices(period_start, period_end, charge_per_booking, *, ground_ids=None):
+    """Bill every ground with uninvoiced bookings in the period; returns a summary dict."""
+    pending = Booking.objects.filter(
+        status='BOOKED',
+        invoiced_at__isnull=True,
+        slot__date__gte=period_start,
+        slot__date__lte=period_end,
+    )
+    if ground_ids is not None:
+        pending = pending.filter(slot__ground_id__in=ground_ids)
+    pending_ground_ids = [
+        row['slot__ground_id']
+        for row in pending.values('slot__ground_id', 'slot__ground__name')
+        .annotate(count=Count('id'))
+        .order_by('slot__ground__name')
+    ]
+
+    summary = {
+        'created': 0,
+        'updated': 0,
+        'skipped_paid': [],
+        'failed': [],
+        'bookings': 0,
+        'total': Decimal('0.00'),
+    }
+    with transaction.atomic():
+        for ground_id in pending_ground_ids:
+            try:
+                with transaction.atomic():
+                    status, invoice, bookings_count, total = invoice_ground(
+                        ground_id, period_start, period_end, charge_per_booking,
+                    )
+            except Exception:
+                logger.exception('Invoice generation failed ground=%s period=%s..%s', ground_id, period_start, period_end)
+                summary['failed'].append(ground_id)
+                continue
+
+            if status == 'paid':
+                summary['skipped_paid'].append(invoice.ground.name)
+            elif status in ('created', 'updated'):
+                summary[status] += 1
+                summary['bookings'] += bookings_count
+                summary['total'] += total
+    return summary
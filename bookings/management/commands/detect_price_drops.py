@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from bookings.price_drops import detect_price_drops
+from bookings.views import _dispatch_ground_alerts
+from bookings.waitlist import expire_waitlist_holds
+
+
+class Command(BaseCommand):
+    help = (
+        'Announce free slots that have entered the last-minute discount window and pass lapsed '
+        'waitlist holds on. Run every minute from cron.'
+    )
+
+    def handle(self, *args, **options):
+        slots = detect_price_drops(
+            lambda ground, slot: _dispatch_ground_alerts(ground, slot=slot, reason='PRICE_DROP')
+        )
+        grounds = len({slot.ground_id for slot in slots})
+        self.stdout.write(self.style.SUCCESS(f'Price drops announced: {len(slots)} slots at {grounds} grounds.'))
+
+        holds = expire_waitlist_holds(
+            lambda ground, slot: _dispatch_ground_alerts(ground, slot=slot, reason='LAST_MINUTE_OPENING')
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Waitlist holds expired: {holds['expired']}, re-offered: {holds['offered']}, released: {holds['released']}."
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from bookings.models import WhatsAppOutboxMessage
+from bookings.whatsapp import dispatch_outbox
+
+
+class Command(BaseCommand):
+    help = 'Send due WhatsApp outbox messages, including retries whose backoff has elapsed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        summary = dispatch_outbox(batch_size=options['batch_size'])
+        waiting = WhatsAppOutboxMessage.objects.filter(status='QUEUED').count()
+        self.stdout.write(self.style.SUCCESS(
+            f"WhatsApp outbox: {summary['sent']} sent, {summary['retrying']} rescheduled, "
+            f"{summary['failed']} failed, {waiting} waiting."
+        ))
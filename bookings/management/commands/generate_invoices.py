@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from bookings.invoicing import generate_invoices
+
+
+class Command(BaseCommand):
+    help = 'Create or refresh ground invoices for every ground with uninvoiced bookings in a period.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--charge', required=True, help='Platform charge per booking, e.g. 25.00')
+        parser.add_argument('--start', help='Period start (YYYY-MM-DD). Default: first day of last month.')
+        parser.add_argument('--end', help='Period end (YYYY-MM-DD). Default: last day of last month.')
+        parser.add_argument('--ground', action='append', type=int, dest='ground_ids', help='Limit to a ground id (repeatable).')
+
+    def handle(self, *args, **options):
+        try:
+            charge = Decimal(options['charge'])
+        except InvalidOperation as exc:
+            raise CommandError('--charge must be a number.') from exc
+        if charge <= 0:
+            raise CommandError('--charge must be positive.')
+
+        last_month_end = timezone.localdate().replace(day=1) - timedelta(days=1)
+        try:
+            start_date = datetime.strptime(options['start'], '%Y-%m-%d').date() if options['start'] else last_month_end.replace(day=1)
+            end_date = datetime.strptime(options['end'], '%Y-%m-%d').date() if options['end'] else last_month_end
+        except ValueError as exc:
+            raise CommandError(f'Invalid date: {exc}') from exc
+        if start_date > end_date:
+            raise CommandError('--start must be on or before --end.')
+
+        summary = generate_invoices(start_date, end_date, charge, ground_ids=options['ground_ids'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Invoices for {start_date} to {end_date}: {summary['created']} created, {summary['updated']} updated, "
+            f"{summary['bookings']} bookings billed, total {summary['total']}."
+        ))
+        for name in summary['skipped_paid']:
+            self.stdout.write(self.style.WARNING(f'Skipped (already paid): {name}'))
+        for ground_id in summary['failed']:
+            self.stdout.write(self.style.ERROR(f'Failed: ground {ground_id}'))
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from accounts.models import User
+from bookings.settlements import generate_online_settlements, preview_online_settlements
+
+
+class Command(BaseCommand):
+    help = 'Create or refresh online settlements for every ground with unsettled online bookings in a period.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='Period start (YYYY-MM-DD). Default: Monday of last week.')
+        parser.add_argument('--end', help='Period end (YYYY-MM-DD). Default: Sunday of last week.')
+        parser.add_argument('--admin', help='Email of the admin recorded as creator. Default: first admin user.')
+        parser.add_argument('--note', default='', help='Admin note stored on every settlement.')
+        parser.add_argument('--dry-run', action='store_true', help='Only print the totals that would be settled.')
+
+    def handle(self, *args, **options):
+        last_week_end = timezone.localdate() - timedelta(days=timezone.localdate().weekday() + 1)
+        try:
+            start_date = datetime.strptime(options['start'], '%Y-%m-%d').date() if options['start'] else last_week_end - timedelta(days=6)
+            end_date = datetime.strptime(options['end'], '%Y-%m-%d').date() if options['end'] else last_week_end
+        except ValueError as exc:
+            raise CommandError(f'Invalid date: {exc}') from exc
+        if start_date > end_date:
+            raise CommandError('--start must be on or before --end.')
+
+        if options['dry_run']:
+            rows = preview_online_settlements(start_date, end_date)
+            for row in rows:
+                self.stdout.write(
+                    f"{row['slot__ground__name']}: {row['booking_count']} bookings, {row['collected_amount']} ({row['action']})"
+                )
+            total = sum(row['collected_amount'] for row in rows)
+            self.stdout.write(self.style.SUCCESS(
+                f"Dry run for {start_date} to {end_date}: {len(rows)} grounds, "
+                f"{sum(row['booking_count'] for row in rows)} bookings, total {total}."
+            ))
+            return
+
+        admins = User.objects.filter(role='admin')
+        admin = admins.filter(email=options['admin']).first() if options['admin'] else admins.order_by('id').first()
+        if admin is None:
+            raise CommandError('No admin user found to record as settlement creator.')
+
+        summary = generate_online_settlements(start_date, end_date, created_by=admin, admin_note=options['note'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Online settlements for {start_date} to {end_date}: {summary['created']} created, "
+            f"{summary['updated']} updated, {summary['bookings']} bookings, total {summary['total']}."
+        ))
+        for name in summary['skipped_locked']:
+            self.stdout.write(self.style.WARNING(f'Skipped (already transferred or acknowledged): {name}'))
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from bookings.models import WebhookEvent
+from bookings.webhooks import process_pending_events, replay_events
+
+
+class Command(BaseCommand):
+    help = 'Apply queued webhook events, optionally retrying failures or replaying historic events.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true', help='Re-queue FAILED events before processing.')
+        parser.add_argument('--replay', action='store_true', help='Re-apply already processed events in the window.')
+        parser.add_argument('--provider', choices=[code for code, _ in WebhookEvent.PROVIDER_CHOICES])
+        parser.add_argument('--since', help='Replay events received on or after this date (YYYY-MM-DD).')
+        parser.add_argument('--until', help='Replay events received before the end of this date (YYYY-MM-DD).')
+        parser.add_argument('--event', type=int, action='append', dest='event_ids', help='Replay only this event id (repeatable).')
+
+    def handle(self, *args, **options):
+        tz = timezone.get_current_timezone()
+        try:
+            since = (
+                datetime.combine(datetime.strptime(options['since'], '%Y-%m-%d').date(), datetime.min.time(), tzinfo=tz)
+                if options['since'] else None
+            )
+            until = (
+                datetime.combine(datetime.strptime(options['until'], '%Y-%m-%d').date() + timedelta(days=1), datetime.min.time(), tzinfo=tz)
+                if options['until'] else None
+            )
+        except ValueError as exc:
+            raise CommandError(f'Invalid date: {exc}') from exc
+
+        if options['replay'] or options['retry_failed']:
+            statuses = ('PROCESSED', 'FAILED') if options['replay'] else ('FAILED',)
+            summary = replay_events(
+                provider=options['provider'],
+                since=since,
+                until=until,
+                event_ids=options['event_ids'],
+                statuses=statuses,
+            )
+            self.stdout.write(f"Re-queued {summary['replayed']} event(s).")
+        else:
+            if since or until or options['event_ids'] or options['provider']:
+                raise CommandError('--provider, --since, --until and --event only apply with --replay or --retry-failed.')
+            summary = process_pending_events()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Webhook events: {summary['processed']} processed, {summary['failed']} failed, "
+            f"{summary['deferred']} still pending."
+        ))
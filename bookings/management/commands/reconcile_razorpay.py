@@ -0,0 +1,75 @@
+import os
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.razorpay_gateway import get_client
+from bookings.reconciliation import iter_api_payments, iter_report_rows, reconcile_rows, write_mismatch_report
+
+
+class Command(BaseCommand):
+    help = 'Match a Razorpay payments/settlement report (or the payments API) against bookings and report mismatches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Report file (.csv, .json or .jsonl).')
+        parser.add_argument('--format', choices=('csv', 'json', 'jsonl'), help='Override the format inferred from the file extension.')
+        parser.add_argument('--report-type', choices=('payments', 'settlements'), default='payments')
+        parser.add_argument('--amount-unit', choices=('rupees', 'paise'), help='Default: rupees for CSV, paise for JSON.')
+        parser.add_argument('--from-api', action='store_true', help='Fetch payments from the Razorpay API for --start..--end instead of a file.')
+        parser.add_argument('--start', help='Window start (YYYY-MM-DD) for API fetch and orphan detection.')
+        parser.add_argument('--end', help='Window end (YYYY-MM-DD) for API fetch and orphan detection.')
+        parser.add_argument('--output', help='Write mismatches (missing, amount mismatch, orphan) to this CSV file.')
+
+    def handle(self, *args, **options):
+        try:
+            start_date = datetime.strptime(options['start'], '%Y-%m-%d').date() if options['start'] else None
+            end_date = datetime.strptime(options['end'], '%Y-%m-%d').date() if options['end'] else None
+        except ValueError as exc:
+            raise CommandError(f'Invalid date: {exc}') from exc
+
+        if options['from_api']:
+            if not (start_date and end_date):
+                raise CommandError('--from-api needs --start and --end.')
+            client, _ = get_client()
+            if not client:
+                raise CommandError('Razorpay is not configured.')
+            run = reconcile_rows(
+                iter_api_payments(client, start_date, end_date),
+                source='API',
+                source_name=f'payments {start_date}..{end_date}',
+                amount_in_paise=True,
+                window_start=start_date,
+                window_end=end_date,
+            )
+        else:
+            path = options['file']
+            if not path:
+                raise CommandError('Pass --file or --from-api.')
+            file_format = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+            if file_format not in ('csv', 'json', 'jsonl'):
+                raise CommandError(f'Cannot infer report format from {path}; pass --format.')
+            amount_unit = options['amount_unit'] or ('rupees' if file_format == 'csv' else 'paise')
+            try:
+                with open(path, newline='', encoding='utf-8-sig') as handle:
+                    run = reconcile_rows(
+                        iter_report_rows(handle, file_format),
+                        source='SETTLEMENTS' if options['report_type'] == 'settlements' else 'PAYMENTS',
+                        source_name=os.path.basename(path),
+                        amount_in_paise=amount_unit == 'paise',
+                        window_start=start_date,
+                        window_end=end_date,
+                    )
+            except OSError as exc:
+                raise CommandError(f'Cannot read {path}: {exc}') from exc
+            except ValueError as exc:
+                raise CommandError(f'Cannot parse {path}: {exc}') from exc
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Reconciliation {run.id}: {run.rows_read} rows, {run.matched_count} matched, '
+            f'{run.missing_booking_count} missing booking, {run.amount_mismatch_count} amount mismatch, '
+            f'{run.orphan_booking_count} orphan booking, {run.skipped_count} skipped.'
+        ))
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as handle:
+                written = write_mismatch_report(run, handle)
+            self.stdout.write(f'Mismatch report: {written} rows written to {options["output"]}')
@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from bookings.utilisation import refresh_utilisation_rollup
+
+
+class Command(BaseCommand):
+    help = 'Recompute slot occupancy rollups (slot inventory vs active bookings) for a date range.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First date to refresh (YYYY-MM-DD). Default: 35 days ago.')
+        parser.add_argument('--end', help='Last date to refresh (YYYY-MM-DD). Default: 14 days ahead.')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        try:
+            start_date = datetime.strptime(options['start'], '%Y-%m-%d').date() if options['start'] else today - timedelta(days=35)
+            end_date = datetime.strptime(options['end'], '%Y-%m-%d').date() if options['end'] else today + timedelta(days=14)
+        except ValueError as exc:
+            raise CommandError(f'Invalid date: {exc}') from exc
+        if start_date > end_date:
+            raise CommandError('--start must be on or before --end.')
+
+        buckets = refresh_utilisation_rollup(start_date=start_date, end_date=end_date)
+        self.stdout.write(self.style.SUCCESS(
+            f'Utilisation rollup refreshed for {start_date} to {end_date}: {buckets} buckets.'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from bookings.export_jobs import run_export_job, runnable_jobs
+from bookings.models import ExportJob
+
+
+class Command(BaseCommand):
+    help = 'Run queued export jobs not picked up by the in-process worker, and jobs whose worker died.'
+
+    def handle(self, *args, **options):
+        job_ids = list(runnable_jobs().order_by('created_at').values_list('id', flat=True))
+        for job_id in job_ids:
+            run_export_job(job_id)
+        done = ExportJob.objects.filter(id__in=job_ids, status='DONE').count()
+        self.stdout.write(self.style.SUCCESS(f'Export jobs processed: {done}/{len(job_ids)} completed.'))
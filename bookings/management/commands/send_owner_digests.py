@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from bookings.digests import send_owner_digests
+
+
+class Command(BaseCommand):
+    help = 'Email hourly or daily booking digests to owners who opted out of per-booking emails.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('mode', choices=('hourly', 'daily'), help='Run hourly and daily from cron respectively.')
+
+    def handle(self, *args, **options):
+        summary = send_owner_digests(options['mode'].upper())
+        self.stdout.write(self.style.SUCCESS(
+            f"Owner digests sent: {summary['owners']} ({summary['events']} events), failed: {summary['failed']}."
+        ))
@@ -3,6 +3,7 @@ from django.utils import timezone
 from django.core.mail import send_mail
 from django.conf import settings
 from bookings.models import Booking
+from bookings.whatsapp import queue_owner_reminders
 from datetime import timedelta
 
 
@@ -18,6 +19,7 @@ class Command(BaseCommand):
         candidates = Booking.objects.filter(status='BOOKED', reminder_sent=False)
 
         sent_count = 0
+        reminded = []
         for booking in candidates.select_related('slot__ground__owner', 'user'):
             try:
                 slot = booking.slot
@@ -44,6 +46,7 @@ class Command(BaseCommand):
                     # No email recipients available; mark as sent to avoid repeated attempts
                     booking.reminder_sent = True
                     booking.save(update_fields=['reminder_sent'])
+                    reminded.append(booking)
                     continue
 
                 subject = f"Upcoming booking reminder: {slot.ground.name} at {slot.start_time.strftime('%I:%M %p')}"
@@ -61,9 +64,14 @@ class Command(BaseCommand):
                     send_mail(subject, body, from_email, recipients, fail_silently=False)
                     booking.reminder_sent = True
                     booking.save(update_fields=['reminder_sent'])
+                    reminded.append(booking)
                     sent_count += 1
                 except Exception as e:
                     # log error to stderr but continue
                     self.stderr.write(f"Failed to send reminder for booking {booking.id}: {e}\n")
 
+        # Owner WhatsApp reminders go out as one batch through the outbox.
+        whatsapp_count = queue_owner_reminders(reminded)
         self.stdout.write(f"Reminders sent: {sent_count}\n")
+        if whatsapp_count:
+            self.stdout.write(f"WhatsApp reminders queued: {whatsapp_count}\n")
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.28 on 2026-10-19 01:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grounds', '0007_ground_last_minute_price_drop_enabled'),
+        ('bookings', '0017_onlinesettlement_onlinesettlementlineitem_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotUtilisationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('weekday', models.PositiveSmallIntegerField(help_text='ISO weekday, Monday=1')),
+                ('slot_count', models.PositiveIntegerField(default=0)),
+                ('booked_count', models.PositiveIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+                ('ground', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='utilisation_rollups', to='grounds.ground')),
+            ],
+            options={
+                'ordering': ['ground', 'date', 'hour'],
+                'indexes': [models.Index(fields=['date', 'ground'], name='bookings_sl_date_18e90c_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='slotutilisationrollup',
+            constraint=models.UniqueConstraint(fields=('ground', 'date', 'hour'), name='unique_slot_utilisation_bucket'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.28 on 2026-10-19 01:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0019_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciliationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('PAYMENTS', 'Payments report'), ('SETTLEMENTS', 'Settlement report'), ('API', 'Razorpay API')], max_length=12)),
+                ('source_name', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='RUNNING', max_length=10)),
+                ('window_start', models.DateField(blank=True, null=True)),
+                ('window_end', models.DateField(blank=True, null=True)),
+                ('rows_read', models.PositiveIntegerField(default=0)),
+                ('matched_count', models.PositiveIntegerField(default=0)),
+                ('missing_booking_count', models.PositiveIntegerField(default=0)),
+                ('amount_mismatch_count', models.PositiveIntegerField(default=0)),
+                ('orphan_booking_count', models.PositiveIntegerField(default=0)),
+                ('skipped_count', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReconciliationRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('result', models.CharField(choices=[('MATCHED', 'Matched'), ('MISSING_BOOKING', 'Missing booking'), ('AMOUNT_MISMATCH', 'Amount mismatch'), ('ORPHAN_BOOKING', 'Orphan booking'), ('SKIPPED', 'Skipped')], max_length=16)),
+                ('payment_id', models.CharField(blank=True, db_index=True, max_length=100)),
+                ('order_id', models.CharField(blank=True, max_length=100)),
+                ('reported_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('expected_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('payment_status', models.CharField(blank=True, max_length=20)),
+                ('settlement_id', models.CharField(blank=True, max_length=100)),
+                ('booking', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reconciliation_records', to='bookings.booking')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='records', to='bookings.reconciliationrun')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['run', 'result'], name='bookings_re_run_id_f90953_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 4.2.28 on 2026-10-19 01:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_payment_attempts(apps, schema_editor):
+    Booking = apps.get_model('bookings', 'Booking')
+    PaymentAttempt = apps.get_model('bookings', 'PaymentAttempt')
+    PaymentAttemptEvent = apps.get_model('bookings', 'PaymentAttemptEvent')
+    seen_orders = set()
+    seen_payments = set()
+    bookings = (
+        Booking.objects.exclude(razorpay_order_id__isnull=True)
+        .exclude(razorpay_order_id='')
+        .order_by('created_at')
+        .iterator()
+    )
+    for booking in bookings:
+        payment_id = booking.razorpay_payment_id or None
+        if booking.razorpay_order_id in seen_orders or (payment_id and payment_id in seen_payments):
+            continue
+        seen_orders.add(booking.razorpay_order_id)
+        if payment_id:
+            seen_payments.add(payment_id)
+        attempt = PaymentAttempt.objects.create(
+            razorpay_order_id=booking.razorpay_order_id,
+            razorpay_payment_id=payment_id,
+            booking=booking,
+            user_id=booking.user_id,
+            slot_id=booking.slot_id,
+            payment_mode=booking.payment_mode,
+            amount=booking.paid_amount,
+            status='CAPTURED' if payment_id else 'CREATED',
+        )
+        PaymentAttemptEvent.objects.create(attempt=attempt, status=attempt.status, source='BACKFILL')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bookings', '0020_razorpay_reconciliation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('razorpay_order_id', models.CharField(max_length=100, unique=True)),
+                ('razorpay_payment_id', models.CharField(blank=True, max_length=100, null=True, unique=True)),
+                ('payment_mode', models.CharField(blank=True, max_length=12)),
+                ('amount', models.PositiveIntegerField(default=0)),
+                ('status', models.CharField(choices=[('CREATED', 'Created'), ('AUTHORIZED', 'Authorized'), ('CAPTURED', 'Captured'), ('FAILED', 'Failed')], default='CREATED', max_length=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PaymentAttemptEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('CREATED', 'Created'), ('AUTHORIZED', 'Authorized'), ('CAPTURED', 'Captured'), ('FAILED', 'Failed')], max_length=12)),
+                ('source', models.CharField(choices=[('ORDER', 'Order created'), ('VERIFY', 'Checkout verification'), ('WEBHOOK', 'Webhook'), ('BACKFILL', 'Backfill')], max_length=10)),
+                ('detail', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('attempt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='bookings.paymentattempt')),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='paymentattempt',
+            name='booking',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payment_attempts', to='bookings.booking'),
+        ),
+        migrations.AddField(
+            model_name='paymentattempt',
+            name='slot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payment_attempts', to='bookings.slot'),
+        ),
+        migrations.AddField(
+            model_name='paymentattempt',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payment_attempts', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_payment_attempts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.28 on 2026-10-19 01:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0021_payment_attempts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paymentattempt',
+            index=models.Index(fields=['user', 'slot', 'payment_mode', 'amount', 'status'], name='payment_attempt_reuse_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.28 on 2026-10-19 01:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0022_payment_attempt_reuse_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(choices=[('RAZORPAY', 'Razorpay'), ('STRIPE', 'Stripe'), ('WHATSAPP', 'WhatsApp')], max_length=10)),
+                ('dedupe_key', models.CharField(max_length=255, unique=True)),
+                ('event_type', models.CharField(blank=True, max_length=100)),
+                ('ordering_key', models.CharField(blank=True, max_length=100)),
+                ('payload', models.TextField()),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('PROCESSED', 'Processed'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'id'], name='webhook_event_status_idx'), models.Index(fields=['provider', 'ordering_key', 'status'], name='webhook_event_ordering_idx')],
+            },
+        ),
+    ]
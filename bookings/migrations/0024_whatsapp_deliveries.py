@@ -0,0 +1,30 @@
+# Generated by Django 4.2.28 on 2026-10-19 01:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0023_webhook_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WhatsAppDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message_id', models.CharField(max_length=128, unique=True)),
+                ('recipient', models.CharField(blank=True, max_length=20)),
+                ('template_name', models.CharField(blank=True, max_length=100)),
+                ('status', models.CharField(choices=[('ACCEPTED', 'Accepted'), ('SENT', 'Sent'), ('DELIVERED', 'Delivered'), ('READ', 'Read'), ('FAILED', 'Failed')], default='ACCEPTED', max_length=10)),
+                ('error_code', models.CharField(blank=True, max_length=20)),
+                ('error_title', models.CharField(blank=True, max_length=255)),
+                ('status_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('booking', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='whatsapp_deliveries', to='bookings.booking')),
+            ],
+        ),
+    ]
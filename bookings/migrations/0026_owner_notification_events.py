@@ -0,0 +1,30 @@
+# Generated by Django 4.2.28 on 2026-10-19 01:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bookings', '0025_whatsapp_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OwnerNotificationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(choices=[('BOOKING_CREATED', 'New booking'), ('PAYMENT_UPDATED', 'Payment update'), ('BOOKING_CANCELLED', 'Cancellation')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('digested_at', models.DateTimeField(blank=True, null=True)),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='owner_notification_events', to='bookings.booking')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='owner_notification_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['digested_at', 'owner'], name='owner_event_pending_idx')],
+            },
+        ),
+    ]
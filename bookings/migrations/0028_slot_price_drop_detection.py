@@ -0,0 +1,22 @@
+# Generated by Django 4.2.28 on 2026-10-19 02:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0027_push_subscriptions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='slot',
+            name='price_drop_announced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='slot',
+            index=models.Index(fields=['date', 'start_time', 'is_booked'], name='slot_start_window_idx'),
+        ),
+    ]
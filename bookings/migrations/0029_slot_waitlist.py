@@ -0,0 +1,44 @@
+# Generated by Django 4.2.28 on 2026-10-19 02:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('grounds', '0007_ground_last_minute_price_drop_enabled'),
+        ('bookings', '0028_slot_price_drop_detection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='slot',
+            name='held_for',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='held_slots', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='slot',
+            name='hold_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='SlotWaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('status', models.CharField(choices=[('WAITING', 'Waiting'), ('OFFERED', 'Offered'), ('LEFT', 'Left')], default='WAITING', max_length=10)),
+                ('offered_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('ground', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to='grounds.ground')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_waitlist_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['ground', 'date', 'start_time', 'status', 'created_at'], name='slot_waitlist_match_idx')],
+                'unique_together': {('user', 'ground', 'date', 'start_time')},
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.28 on 2026-10-19 02:24
+
+import bookings.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0029_slot_waitlist'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='file',
+            field=models.FileField(blank=True, storage=bookings.models.PrivateExportStorage(), upload_to='exports/'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.28 on 2026-10-19 02:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0030_export_job_private_storage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='slotwaitlistentry',
+            name='status',
+            field=models.CharField(choices=[('WAITING', 'Waiting'), ('OFFERED', 'Offered'), ('EXPIRED', 'Offer expired'), ('LEFT', 'Left')], default='WAITING', max_length=10),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.28 on 2026-10-19 02:39
+
+from django.db import migrations, models
+
+
+def backfill_heartbeat(apps, schema_editor):
+    ExportJob = apps.get_model('bookings', 'ExportJob')
+    ExportJob.objects.filter(status='RUNNING').update(heartbeat_at=models.F('started_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0031_waitlist_entry_expired'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_heartbeat, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
 from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+import os
 import uuid
 from grounds.models import Ground
 from django.utils.timezone import now
@@ -10,11 +13,23 @@ class Slot(models.Model):
     start_time = models.TimeField()
     end_time = models.TimeField()
     is_booked = models.BooleanField(default=False)
+    # Set by `detect_price_drops` once the slot's last-minute discount has been announced.
+    price_drop_announced_at = models.DateTimeField(null=True, blank=True)
+    # A freed slot offered to the first waitlisted player; others cannot check out until it expires.
+    held_for = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='held_slots',
+    )
+    hold_expires_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         unique_together = ('ground', 'date', 'start_time')
         indexes = [
             models.Index(fields=['ground', 'date']),
+            models.Index(fields=['date', 'start_time', 'is_booked'], name='slot_start_window_idx'),
         ]
 
     def __str__(self):
@@ -419,3 +434,411 @@ class ActivityLog(models.Model):
 
     def __str__(self):
         return f"{self.action} | {self.user} | {self.timestamp}"
+
+
+class SlotUtilisationRollup(models.Model):
+    """Per ground/date/hour slot inventory vs booked counts, refreshed by bookings.utilisation."""
+
+    ground = models.ForeignKey(Ground, on_delete=models.CASCADE, related_name='utilisation_rollups')
+    date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    weekday = models.PositiveSmallIntegerField(help_text='ISO weekday, Monday=1')
+    slot_count = models.PositiveIntegerField(default=0)
+    booked_count = models.PositiveIntegerField(default=0)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['ground', 'date', 'hour']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['ground', 'date', 'hour'],
+                name='unique_slot_utilisation_bucket',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'ground']),
+        ]
+
+    def __str__(self):
+        return f"{self.ground_id} {self.date} {self.hour:02d}:00 {self.booked_count}/{self.slot_count}"
+
+
+@deconstructible
+class PrivateExportStorage(FileSystemStorage):
+    """Export files live under EXPORT_ROOT, outside the publicly served MEDIA_ROOT.
+
+    They are only ever served through `admin_export_job_download`.
+    """
+
+    @property
+    def base_location(self):
+        return self._value_or_setting(self._location, settings.EXPORT_ROOT)
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+
+class ExportJob(models.Model):
+    KIND_CHOICES = (
+        ('bookings', 'Bookings'),
+        ('settlements', 'Online settlements'),
+    )
+    FORMAT_CHOICES = (
+        ('csv', 'CSV'),
+        ('jsonl', 'JSON Lines'),
+    )
+    STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    )
+
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    file_format = models.CharField(max_length=8, choices=FORMAT_CHOICES, default='csv')
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='export_jobs',
+    )
+    total_rows = models.PositiveIntegerField(default=0)
+    rows_written = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to='exports/', storage=PrivateExportStorage(), blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    @property
+    def progress_percent(self):
+        if self.status == 'DONE':
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(99, int(self.rows_written * 100 / self.total_rows))
+
+    def __str__(self):
+        return f"{self.get_kind_display()} export {self.id} ({self.status})"
+
+
+class ReconciliationRun(models.Model):
+    SOURCE_CHOICES = (
+        ('PAYMENTS', 'Payments report'),
+        ('SETTLEMENTS', 'Settlement report'),
+        ('API', 'Razorpay API'),
+    )
+    STATUS_CHOICES = (
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    )
+
+    source = models.CharField(max_length=12, choices=SOURCE_CHOICES)
+    source_name = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='RUNNING')
+    window_start = models.DateField(null=True, blank=True)
+    window_end = models.DateField(null=True, blank=True)
+    rows_read = models.PositiveIntegerField(default=0)
+    matched_count = models.PositiveIntegerField(default=0)
+    missing_booking_count = models.PositiveIntegerField(default=0)
+    amount_mismatch_count = models.PositiveIntegerField(default=0)
+    orphan_booking_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"Reconciliation {self.id} ({self.get_source_display()}, {self.status})"
+
+
+class ReconciliationRecord(models.Model):
+    RESULT_CHOICES = (
+        ('MATCHED', 'Matched'),
+        ('MISSING_BOOKING', 'Missing booking'),
+        ('AMOUNT_MISMATCH', 'Amount mismatch'),
+        ('ORPHAN_BOOKING', 'Orphan booking'),
+        ('SKIPPED', 'Skipped'),
+    )
+
+    run = models.ForeignKey(ReconciliationRun, on_delete=models.CASCADE, related_name='records')
+    result = models.CharField(max_length=16, choices=RESULT_CHOICES)
+    payment_id = models.CharField(max_length=100, blank=True, db_index=True)
+    order_id = models.CharField(max_length=100, blank=True)
+    booking = models.ForeignKey(
+        Booking,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='reconciliation_records',
+    )
+    reported_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    expected_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    payment_status = models.CharField(max_length=20, blank=True)
+    settlement_id = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['run', 'result']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_result_display()} {self.payment_id or self.booking_id}"
+
+
+class PaymentAttempt(models.Model):
+    """One Razorpay order and the payment made against it; lookups go through its unique ids."""
+
+    STATUS_CHOICES = (
+        ('CREATED', 'Created'),
+        ('AUTHORIZED', 'Authorized'),
+        ('CAPTURED', 'Captured'),
+        ('FAILED', 'Failed'),
+    )
+
+    razorpay_order_id = models.CharField(max_length=100, unique=True)
+    razorpay_payment_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
+    booking = models.ForeignKey(
+        Booking,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='payment_attempts',
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='payment_attempts',
+    )
+    slot = models.ForeignKey(Slot, null=True, blank=True, on_delete=models.SET_NULL, related_name='payment_attempts')
+    payment_mode = models.CharField(max_length=12, blank=True)
+    amount = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default='CREATED')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'slot', 'payment_mode', 'amount', 'status'], name='payment_attempt_reuse_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.razorpay_order_id} ({self.status})"
+
+
+class PaymentAttemptEvent(models.Model):
+    SOURCE_CHOICES = (
+        ('ORDER', 'Order created'),
+        ('VERIFY', 'Checkout verification'),
+        ('WEBHOOK', 'Webhook'),
+        ('BACKFILL', 'Backfill'),
+    )
+
+    attempt = models.ForeignKey(PaymentAttempt, on_delete=models.CASCADE, related_name='events')
+    status = models.CharField(max_length=12, choices=PaymentAttempt.STATUS_CHOICES)
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES)
+    detail = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+
+    def __str__(self):
+        return f"{self.attempt.razorpay_order_id} -> {self.status} ({self.source})"
+
+
+class WebhookEvent(models.Model):
+    """A verified webhook delivery, stored verbatim before any processing.
+
+    Rows are never deleted; `payload` is the raw body as received, so an event can
+    be replayed exactly. Events sharing an `ordering_key` (order, payment or invoice
+    id) are applied in arrival order.
+    """
+
+    PROVIDER_CHOICES = (
+        ('RAZORPAY', 'Razorpay'),
+        ('STRIPE', 'Stripe'),
+        ('WHATSAPP', 'WhatsApp'),
+    )
+    STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('PROCESSED', 'Processed'),
+        ('FAILED', 'Failed'),
+    )
+
+    provider = models.CharField(max_length=10, choices=PROVIDER_CHOICES)
+    dedupe_key = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100, blank=True)
+    ordering_key = models.CharField(max_length=100, blank=True)
+    payload = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='webhook_event_status_idx'),
+            models.Index(fields=['provider', 'ordering_key', 'status'], name='webhook_event_ordering_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.provider} {self.event_type or self.dedupe_key} ({self.status})"
+
+
+class WhatsAppDelivery(models.Model):
+    """Delivery state of one WhatsApp message, keyed by the Cloud API message id."""
+
+    STATUS_CHOICES = (
+        ('ACCEPTED', 'Accepted'),
+        ('SENT', 'Sent'),
+        ('DELIVERED', 'Delivered'),
+        ('READ', 'Read'),
+        ('FAILED', 'Failed'),
+    )
+
+    message_id = models.CharField(max_length=128, unique=True)
+    recipient = models.CharField(max_length=20, blank=True)
+    template_name = models.CharField(max_length=100, blank=True)
+    booking = models.ForeignKey(
+        Booking,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='whatsapp_deliveries',
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='ACCEPTED')
+    error_code = models.CharField(max_length=20, blank=True)
+    error_title = models.CharField(max_length=255, blank=True)
+    status_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.message_id} ({self.status})"
+
+
+class WhatsAppOutboxMessage(models.Model):
+    """A template message waiting to be sent; failed sends stay here until their retry is due."""
+
+    STATUS_CHOICES = (
+        ('QUEUED', 'Queued'),
+        ('SENDING', 'Sending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    )
+
+    recipient = models.CharField(max_length=20)
+    template_name = models.CharField(max_length=100)
+    language = models.CharField(max_length=10, default='en')
+    parameters = models.JSONField(default=list, blank=True)
+    booking = models.ForeignKey(
+        Booking,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='whatsapp_outbox',
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='QUEUED')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=now)
+    last_error = models.CharField(max_length=255, blank=True)
+    message_id = models.CharField(max_length=128, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='whatsapp_outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.template_name} -> {self.recipient} ({self.status})"
+
+
+class OwnerNotificationEvent(models.Model):
+    """A booking event held back for an owner's hourly or daily email digest."""
+
+    EVENT_CHOICES = (
+        ('BOOKING_CREATED', 'New booking'),
+        ('PAYMENT_UPDATED', 'Payment update'),
+        ('BOOKING_CANCELLED', 'Cancellation'),
+    )
+
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='owner_notification_events')
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='owner_notification_events')
+    event = models.CharField(max_length=20, choices=EVENT_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+    digested_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['digested_at', 'owner'], name='owner_event_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.owner_id} {self.event} booking={self.booking_id}"
+
+
+class PushSubscription(models.Model):
+    """A browser's Web Push endpoint; deleted as soon as the push service reports it gone."""
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='push_subscriptions')
+    endpoint = models.URLField(max_length=500, unique=True)
+    p256dh = models.CharField(max_length=255)
+    auth = models.CharField(max_length=255)
+    user_agent = models.CharField(max_length=255, blank=True)
+    failure_count = models.PositiveIntegerField(default=0)
+    last_success_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user} | {self.endpoint[:60]}"
+
+
+class SlotWaitlistEntry(models.Model):
+    """A player waiting for a booked slot, keyed by slot time so it survives slot regeneration."""
+
+    STATUS_CHOICES = (
+        ('WAITING', 'Waiting'),
+        ('OFFERED', 'Offered'),
+        ('CLAIMED', 'Booked'),
+        ('EXPIRED', 'Offer expired'),
+        ('LEFT', 'Left'),
+    )
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='slot_waitlist_entries')
+    ground = models.ForeignKey(Ground, on_delete=models.CASCADE, related_name='waitlist_entries')
+    date = models.DateField()
+    start_time = models.TimeField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='WAITING')
+    offered_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'ground', 'date', 'start_time')
+        indexes = [
+            models.Index(fields=['ground', 'date', 'start_time', 'status', 'created_at'], name='slot_waitlist_match_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} | {self.ground_id} {self.date} {self.start_time} | {self.status}"
@@ -0,0 +1,112 @@
+"""Payment-attempt bookkeeping for Razorpay orders.
+
+Every order gets a `PaymentAttempt` keyed by its unique order id; the payment
+id is attached when checkout verification or a webhook first reports it. Both
+ids are uniquely indexed, so webhooks, verification and reconciliation resolve
+a booking with one index lookup instead of scanning `Booking`.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import PaymentAttempt, PaymentAttemptEvent
+
+
+# Later states win; FAILED never overrides a capture.
+_STATUS_RANK = {'CREATED': 0, 'FAILED': 1, 'AUTHORIZED': 2, 'CAPTURED': 3}
+
+RAZORPAY_STATUS_MAP = {
+    'created': 'CREATED',
+    'authorized': 'AUTHORIZED',
+    'captured': 'CAPTURED',
+    'failed': 'FAILED',
+}
+
+
+def find_reusable_order(*, user, slot, payment_mode, amount):
+    """Return a still-pending attempt for the same checkout, if one was opened recently.
+
+    The amount is part of the key, so a slot price change simply misses; a paid,
+    failed or expired order is never returned.
+    """
+    ttl = getattr(settings, 'RAZORPAY_ORDER_REUSE_SECONDS', 900)
+    if ttl <= 0:
+        return None
+    return (
+        PaymentAttempt.objects.filter(
+            user=user,
+            slot=slot,
+            payment_mode=payment_mode,
+            amount=amount,
+            status='CREATED',
+            razorpay_payment_id__isnull=True,
+            created_at__gte=timezone.now() - timedelta(seconds=ttl),
+        )
+        .order_by('-created_at')
+        .first()
+    )
+
+
+def record_order(order_id, *, user=None, slot=None, amount=0, payment_mode=''):
+    attempt = PaymentAttempt.objects.create(
+        razorpay_order_id=order_id,
+        user=user,
+        slot=slot,
+        amount=amount,
+        payment_mode=payment_mode,
+    )
+    PaymentAttemptEvent.objects.create(attempt=attempt, status='CREATED', source='ORDER')
+    return attempt
+
+
+def record_payment(order_id, payment_id, status, *, source, booking=None, detail=''):
+    """Attach the payment id, advance the status and link the booking; returns the attempt.
+
+    A status change is appended to the attempt's event history. Unknown orders
+    (created before attempts were tracked) get an attempt on first sight.
+    """
+    with transaction.atomic():
+        attempt = (
+            PaymentAttempt.objects.select_for_update(of=('self',))
+            .select_related('booking')
+            .filter(razorpay_order_id=order_id)
+            .first()
+        )
+        if attempt is None:
+            try:
+                with transaction.atomic():
+                    attempt = PaymentAttempt.objects.create(razorpay_order_id=order_id)
+            except IntegrityError:
+                attempt = PaymentAttempt.objects.select_for_update().get(razorpay_order_id=order_id)
+
+        update_fields = []
+        if payment_id and not attempt.razorpay_payment_id:
+            attempt.razorpay_payment_id = payment_id
+            update_fields.append('razorpay_payment_id')
+        if booking is not None and attempt.booking_id != booking.id:
+            attempt.booking = booking
+            update_fields.append('booking')
+        status_changed = _STATUS_RANK.get(status, -1) > _STATUS_RANK.get(attempt.status, -1)
+        if status_changed:
+            attempt.status = status
+            update_fields.append('status')
+        if update_fields:
+            attempt.save(update_fields=update_fields + ['updated_at'])
+        if status_changed:
+            PaymentAttemptEvent.objects.create(attempt=attempt, status=status, source=source, detail=detail[:100])
+    return attempt
+
+
+def find_attempt(*, payment_id=None, order_id=None):
+    """Resolve an attempt (with its booking) by payment id, falling back to order id."""
+    qs = PaymentAttempt.objects.select_related('booking')
+    if payment_id:
+        attempt = qs.filter(razorpay_payment_id=payment_id).first()
+        if attempt is not None:
+            return attempt
+    if order_id:
+        return qs.filter(razorpay_order_id=order_id).first()
+    return None
@@ -0,0 +1,75 @@
+"""Last-minute price-drop detection.
+
+A free slot at a ground with price drops enabled is discounted once it is
+within PRICE_DROP_WINDOW_MINUTES of starting, except during the evening peak.
+`find_new_price_drops` finds every such slot across all grounds with one query
+on the (date, start_time, is_booked) index; `detect_price_drops` (run every
+minute from cron) fans out alerts without waiting for a page view and marks the
+slots whose alert actually went out.
+"""
+
+from datetime import time, timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Slot
+
+
+PRICE_DROP_WINDOW_MINUTES = 10
+PEAK_START = time(17, 0)
+PEAK_END = time(21, 0)
+
+
+def _window_filter(now):
+    window_end = now + timedelta(minutes=PRICE_DROP_WINDOW_MINUTES)
+    if window_end.date() == now.date():
+        return Q(date=now.date(), start_time__gt=now.time(), start_time__lte=window_end.time())
+    return Q(date=now.date(), start_time__gt=now.time()) | Q(date=window_end.date(), start_time__lte=window_end.time())
+
+
+def find_new_price_drops(now=None):
+    """Unannounced free slots that have just entered the discount window, earliest first."""
+    now = timezone.localtime(now or timezone.now())
+    return (
+        Slot.objects.filter(
+            _window_filter(now),
+            is_booked=False,
+            price_drop_announced_at__isnull=True,
+            ground__is_active=True,
+            ground__last_minute_price_drop_enabled=True,
+        )
+        .exclude(start_time__gte=PEAK_START, start_time__lt=PEAK_END)
+        .exclude(booking__status='BOOKED')
+        .select_related('ground')
+        .order_by('date', 'start_time', 'ground_id')
+    )
+
+
+def detect_price_drops(dispatch_alerts, now=None):
+    """Call `dispatch_alerts(ground, slot)` once per ground and mark the slots it announced.
+
+    `dispatch_alerts` returns whether an alert went out; slots it declined (outside
+    alert hours, no subscribers, already alerted today) stay unmarked and are
+    offered again on the next run while they remain in the window. Returns the
+    marked slots. Rows are claimed under a skip-locked lock held until they are
+    marked, so overlapping runs never announce the same slot twice; the lock is
+    held while `dispatch_alerts` runs, so it must only record the alert and
+    queue its emails and pushes for after commit, never send them inline.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        slots = list(find_new_price_drops(now).select_for_update(skip_locked=True, of=('self',)))
+        by_ground = {}
+        for slot in slots:
+            by_ground.setdefault(slot.ground_id, []).append(slot)
+        announced = [
+            slot
+            for ground_slots in by_ground.values()
+            if dispatch_alerts(ground_slots[0].ground, ground_slots[0])
+            for slot in ground_slots
+        ]
+        if announced:
+            Slot.objects.filter(id__in=[slot.id for slot in announced]).update(price_drop_announced_at=now)
+    return announced
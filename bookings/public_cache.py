@@ -0,0 +1,59 @@
+"""Cached payloads for public listings: the landing page (leaderboards, grounds,
+slot search) and the ground and tournament lists.
+
+Built on `bookings.caching`: entries depend on the availability, grounds,
+reviews and tournaments namespaces, which model signals invalidate. The TTLs only bound how long
+time-sensitive data (past slots, last-minute discounts) lives.
+"""
+
+from django.conf import settings
+from django.utils import timezone
+
+from .caching import AVAILABILITY, GROUNDS, REVIEWS, TOURNAMENTS, get_or_build
+
+
+LEADERBOARD_TTL = getattr(settings, 'PUBLIC_LEADERBOARD_CACHE_TTL', 300)
+GROUNDS_TTL = getattr(settings, 'PUBLIC_GROUNDS_CACHE_TTL', 900)
+SLOT_SEARCH_TTL = getattr(settings, 'PUBLIC_SLOT_SEARCH_CACHE_TTL', 60)
+LISTING_TTL = getattr(settings, 'PUBLIC_LISTING_CACHE_TTL', 3600)
+
+
+def cached_leaderboard_html(builder):
+    """Rendered leaderboard fragment; rolls over daily because the window is the last 7 days."""
+    return get_or_build(
+        'public:leaderboards',
+        builder,
+        parts=(timezone.localdate().isoformat(),),
+        depends_on=(AVAILABILITY,),
+        ttl=LEADERBOARD_TTL,
+    )
+
+
+def cached_active_grounds(builder):
+    return get_or_build('public:active-grounds', builder, depends_on=(GROUNDS,), ttl=GROUNDS_TTL)
+
+
+def cached_slot_search(search_date, ground_id, builder):
+    return get_or_build(
+        'public:slot-search',
+        builder,
+        parts=(search_date.isoformat(), ground_id or 'all'),
+        depends_on=(AVAILABILITY, GROUNDS),
+        ttl=SLOT_SEARCH_TTL,
+    )
+
+
+def cached_ground_list(builder):
+    """Active grounds with their denormalised review stats; only ground or review changes retire it."""
+    return get_or_build('public:ground-list', builder, depends_on=(GROUNDS, REVIEWS), ttl=LISTING_TTL)
+
+
+def cached_tournament_list(today, builder):
+    """Listed tournaments; keyed by day because finished tournaments drop off at midnight."""
+    return get_or_build(
+        'public:tournament-list',
+        builder,
+        parts=(today.isoformat(),),
+        depends_on=(TOURNAMENTS, GROUNDS),
+        ttl=LISTING_TTL,
+    )
@@ -0,0 +1,145 @@
+"""Web Push (VAPID) alerts.
+
+Browsers register a `PushSubscription` through `push_subscribe`. Alerts fan out
+through a bounded worker pool that shares one pooled HTTP session; only the
+encryption and HTTP calls run on the workers, and the results are written back
+in bulk on the calling thread. Endpoints the push service reports as gone
+(404/410) are deleted, and endpoints that keep failing are pruned after
+PUSH_MAX_FAILURES attempts.
+"""
+
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+try:
+    from pywebpush import WebPushException, webpush
+except ImportError:  # pragma: no cover - optional in local dev
+    WebPushException = None
+    webpush = None
+
+from .models import PushSubscription
+
+
+logger = logging.getLogger(__name__)
+
+# Push services answer 404/410 for subscriptions the browser has dropped.
+EXPIRED_STATUS_CODES = {404, 410}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def push_configured():
+    return webpush is not None and bool(
+        getattr(settings, 'VAPID_PRIVATE_KEY', '') and getattr(settings, 'VAPID_PUBLIC_KEY', '')
+    )
+
+
+def is_allowed_endpoint(endpoint):
+    """True for an https URL on one of PUSH_ALLOWED_HOSTS (or a subdomain of one)."""
+    try:
+        parts = urlsplit(endpoint)
+    except ValueError:
+        return False
+    host = (parts.hostname or '').lower()
+    if parts.scheme != 'https' or not host or parts.port not in (None, 443):
+        return False
+    return any(host == allowed or host.endswith(f'.{allowed}') for allowed in getattr(settings, 'PUSH_ALLOWED_HOSTS', ()))
+
+
+def _push_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                pool_size = getattr(settings, 'PUSH_MAX_WORKERS', 8)
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def reset_push_session():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def _deliver(subscription, data, ttl):
+    """Send one push; returns the HTTP status (0 for a network failure)."""
+    try:
+        response = webpush(
+            subscription_info={
+                'endpoint': subscription.endpoint,
+                'keys': {'p256dh': subscription.p256dh, 'auth': subscription.auth},
+            },
+            data=data,
+            vapid_private_key=settings.VAPID_PRIVATE_KEY,
+            # pywebpush fills in `aud` per endpoint origin, so each call needs its own claims dict.
+            vapid_claims={'sub': getattr(settings, 'VAPID_CLAIM_SUBJECT', 'mailto:admin@footbook.online')},
+            ttl=ttl,
+            timeout=getattr(settings, 'PUSH_TIMEOUT_SECONDS', 5),
+            requests_session=_push_session(),
+        )
+        return response.status_code
+    except WebPushException as exc:
+        return exc.response.status_code if exc.response is not None else 0
+    except (requests.exceptions.RequestException, ValueError):
+        logger.warning('Web push failed subscription=%s', subscription.id, exc_info=True)
+        return 0
+
+
+def send_push_batch(subscriptions, payload, *, ttl=None):
+    """Deliver `payload` to every subscription; returns a summary dict of sent/expired/failed counts."""
+    summary = {'sent': 0, 'expired': 0, 'failed': 0}
+    subscriptions = list(subscriptions)
+    if not subscriptions or not push_configured():
+        return summary
+    data = json.dumps(payload)
+    ttl = getattr(settings, 'PUSH_TTL_SECONDS', 600) if ttl is None else ttl
+    workers = max(1, min(getattr(settings, 'PUSH_MAX_WORKERS', 8), len(subscriptions)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='footbook-push') as pool:
+        statuses = list(pool.map(lambda subscription: _deliver(subscription, data, ttl), subscriptions))
+
+    delivered, expired, failed = [], [], []
+    for subscription, status in zip(subscriptions, statuses):
+        if 200 <= status < 300:
+            delivered.append(subscription.id)
+        elif status in EXPIRED_STATUS_CODES:
+            expired.append(subscription.id)
+        else:
+            failed.append(subscription.id)
+    if delivered:
+        PushSubscription.objects.filter(id__in=delivered).update(failure_count=0, last_success_at=timezone.now())
+    if failed:
+        PushSubscription.objects.filter(id__in=failed).update(failure_count=F('failure_count') + 1)
+        max_failures = getattr(settings, 'PUSH_MAX_FAILURES', 5)
+        pruned = list(
+            PushSubscription.objects.filter(id__in=failed, failure_count__gte=max_failures).values_list('id', flat=True)
+        )
+        expired.extend(pruned)
+        failed = [subscription_id for subscription_id in failed if subscription_id not in pruned]
+    if expired:
+        PushSubscription.objects.filter(id__in=expired).delete()
+    summary['sent'] = len(delivered)
+    summary['expired'] = len(expired)
+    summary['failed'] = len(failed)
+    return summary
+
+
+def notify_users(user_ids, payload, *, ttl=None):
+    """Push `payload` to every registered browser of the given users."""
+    return send_push_batch(PushSubscription.objects.filter(user_id__in=set(user_ids)), payload, ttl=ttl)
@@ -0,0 +1,150 @@
+"""Process-wide Razorpay client.
+
+One `razorpay.Client` per configuration shares a pooled keep-alive
+`requests.Session`. Every call gets connect/read timeouts, a latency log line
+and goes through a circuit breaker, so a Razorpay outage fails bookings fast
+instead of pinning gunicorn workers on TLS handshakes.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+try:
+    import razorpay
+except ImportError:  # pragma: no cover - optional in local dev
+    razorpay = None
+
+
+logger = logging.getLogger(__name__)
+
+_fetch_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='footbook-razorpay')
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without touching the network while the breaker is open."""
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures; one trial call is let through after `reset_seconds`."""
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_seconds:
+                raise CircuitOpenError('Razorpay circuit is open; skipping call')
+            # Half-open: allow this call and re-arm the timer for concurrent callers.
+            self._opened_at = time.monotonic()
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning('Razorpay circuit opened after %s consecutive failures', self._failures)
+                self._opened_at = time.monotonic()
+
+
+class InstrumentedSession(requests.Session):
+    """requests.Session with default timeouts, per-call latency logging and a circuit breaker."""
+
+    def __init__(self, *, timeout, pool_size, breaker):
+        super().__init__()
+        self.default_timeout = timeout
+        self.breaker = breaker
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault('timeout', self.default_timeout)
+        self.breaker.before_call()
+        path = urlsplit(url).path
+        started = time.perf_counter()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except requests.exceptions.RequestException as exc:
+            self.breaker.record_failure()
+            logger.warning(
+                'razorpay %s %s failed after %.1fms: %s',
+                method.upper(), path, (time.perf_counter() - started) * 1000, exc.__class__.__name__,
+            )
+            raise
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        # 4xx means Razorpay answered (bad id, validation); only gateway-side errors trip the breaker.
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        logger.info('razorpay %s %s status=%s duration_ms=%.1f', method.upper(), path, response.status_code, elapsed_ms)
+        return response
+
+
+def _config():
+    return (
+        getattr(settings, 'RAZORPAY_KEY_ID', None),
+        getattr(settings, 'RAZORPAY_KEY_SECRET', None),
+        getattr(settings, 'RAZORPAY_BASE_URL', 'https://api.razorpay.com'),
+        getattr(settings, 'RAZORPAY_CONNECT_TIMEOUT', 3.05),
+        getattr(settings, 'RAZORPAY_READ_TIMEOUT', 10),
+        getattr(settings, 'RAZORPAY_POOL_SIZE', 10),
+        getattr(settings, 'RAZORPAY_CIRCUIT_FAILURE_THRESHOLD', 5),
+        getattr(settings, 'RAZORPAY_CIRCUIT_RESET_SECONDS', 30),
+    )
+
+
+def get_client():
+    """Return `(client, key_id)`; the client is built once per configuration and reused."""
+    config = _config()
+    key_id, key_secret, base_url, connect_timeout, read_timeout, pool_size, failures, reset_seconds = config
+    if not key_id or not key_secret or razorpay is None:
+        return None, key_id
+    client = _clients.get(config)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(config)
+            if client is None:
+                session = InstrumentedSession(
+                    timeout=(connect_timeout, read_timeout),
+                    pool_size=pool_size,
+                    breaker=CircuitBreaker(failures, reset_seconds),
+                )
+                client = razorpay.Client(session=session, auth=(key_id, key_secret), base_url=base_url)
+                _clients[config] = client
+    return client, key_id
+
+
+def reset_clients():
+    """Drop cached clients (and their pooled connections); used by tests and after key rotation."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.session.close()
+        _clients.clear()
+
+
+def fetch_order_and_payment(client, order_id, payment_id):
+    """Fetch the order and the payment concurrently; re-raises the first failure."""
+    order_future = _fetch_executor.submit(client.order.fetch, order_id)
+    payment_future = _fetch_executor.submit(client.payment.fetch, payment_id)
+    return order_future.result(), payment_future.result()
@@ -0,0 +1,353 @@
+"""Reconcile Razorpay payment and settlement reports against bookings.
+
+Report rows are streamed in chunks; each chunk resolves its bookings through
+`PaymentAttempt`'s unique payment and order ids and bulk-inserts one
+`ReconciliationRecord` per row. Orphan bookings (paid online but absent from the
+report) are found afterwards with a single anti-join against the stored records,
+so memory stays bounded by the chunk size rather than the report size.
+"""
+
+import csv
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Booking, PaymentAttempt, ReconciliationRecord, ReconciliationRun
+from .money import online_collected_amount_expression
+
+
+RECONCILE_CHUNK_SIZE = 1000
+
+# JSON reports are read this many characters at a time, and no single item may exceed
+# MAX_JSON_ITEM_CHARS, so a malformed or unsplit document cannot be loaded into memory whole.
+JSON_READ_SIZE = 64 * 1024
+MAX_JSON_ITEM_CHARS = 1024 * 1024
+
+# Payments in these states never moved money, so they are not expected to have a booking.
+NON_CAPTURED_STATUSES = {'created', 'failed'}
+
+_CREATED_AT_FORMATS = ('%d/%m/%Y %H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%d/%m/%Y', '%Y-%m-%d')
+
+
+class _JsonStream:
+    """Decode consecutive JSON values from a text handle, holding at most one value in memory."""
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = '' if self.eof else self.handle.read(JSON_READ_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it ('' at end of file)."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f'Malformed JSON report: expected {char!r} at character {self.pos}')
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                end = None
+            size = (end if end is not None else len(self.buffer)) - self.pos
+            if size > MAX_JSON_ITEM_CHARS:
+                raise ValueError(
+                    f'JSON report item exceeds {MAX_JSON_ITEM_CHARS} characters; export the report as JSON Lines (.jsonl).'
+                )
+            # A number at the end of the buffer may continue in the next read.
+            if end is not None and (end < len(self.buffer) or self.eof):
+                self.pos = end
+                return value
+            if not self._fill() and end is None:
+                raise ValueError(f'Malformed JSON report at character {self.pos}')
+
+
+def _iter_json_array(stream):
+    stream.expect('[')
+    if stream.peek() == ']':
+        stream.pos += 1
+        return
+    while True:
+        yield stream.value()
+        if stream.peek() != ',':
+            stream.expect(']')
+            return
+        stream.pos += 1
+
+
+def _iter_json_items(handle):
+    """Stream the items of a JSON array, or of the `items` array of a Razorpay collection."""
+    stream = _JsonStream(handle)
+    if stream.peek() != '{':
+        yield from _iter_json_array(stream)
+        return
+    stream.expect('{')
+    while stream.peek() != '}':
+        key = stream.value()
+        stream.expect(':')
+        if key == 'items':
+            yield from _iter_json_array(stream)
+        else:
+            stream.value()
+        if stream.peek() == ',':
+            stream.pos += 1
+    stream.pos += 1
+
+
+def iter_report_rows(handle, file_format):
+    """Yield raw dict rows from a CSV, JSON Lines or JSON (collection/array) report."""
+    if file_format == 'csv':
+        yield from csv.DictReader(handle)
+    elif file_format == 'jsonl':
+        for line in handle:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    elif file_format == 'json':
+        yield from _iter_json_items(handle)
+    else:
+        raise ValueError(f'Unsupported report format: {file_format}')
+
+
+def iter_api_payments(client, start_date, end_date, page_size=100):
+    """Page through Razorpay payments created between the two dates (inclusive)."""
+    tz = timezone.get_current_timezone()
+    start_ts = int(datetime.combine(start_date, datetime.min.time(), tzinfo=tz).timestamp())
+    end_ts = int(datetime.combine(end_date + timedelta(days=1), datetime.min.time(), tzinfo=tz).timestamp()) - 1
+    skip = 0
+    while True:
+        page = client.payment.all({'from': start_ts, 'to': end_ts, 'count': page_size, 'skip': skip})
+        items = page.get('items') or []
+        yield from items
+        if len(items) < page_size:
+            return
+        skip += page_size
+
+
+def _parse_amount(value, amount_in_paise):
+    if value in (None, ''):
+        return None
+    try:
+        amount = Decimal(str(value).replace(',', ''))
+    except InvalidOperation:
+        return None
+    if amount_in_paise:
+        amount = amount / 100
+    return amount.quantize(Decimal('0.01'))
+
+
+def _parse_created_on(value):
+    if value in (None, ''):
+        return None
+    if isinstance(value, (int, float)) or str(value).isdigit():
+        return timezone.localdate(datetime.fromtimestamp(int(value), tz=dt_timezone.utc))
+    for fmt in _CREATED_AT_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def normalise_row(raw, *, amount_in_paise):
+    """Map payment-report and settlement-report column names onto one shape."""
+    entity_type = (raw.get('type') or raw.get('entity') or 'payment').strip().lower()
+    payment_id = (raw.get('payment_id') or raw.get('entity_id') or raw.get('id') or '').strip()
+    status = (raw.get('status') or '').strip().lower()
+    return {
+        'payment_id': payment_id,
+        'order_id': (raw.get('order_id') or '').strip(),
+        'amount': _parse_amount(raw.get('amount'), amount_in_paise),
+        'status': status,
+        'settlement_id': (raw.get('settlement_id') or '').strip(),
+        'created_on': _parse_created_on(raw.get('created_at')),
+        'skip': entity_type != 'payment' or not payment_id or status in NON_CAPTURED_STATUSES,
+    }
+
+
+def _bookings_by(field, values):
+    """Map payment or order ids to booking rows via the uniquely indexed payment attempts."""
+    if not values:
+        return {}
+    booking_ids = dict(
+        PaymentAttempt.objects.filter(**{f'{field}__in': values}, booking__isnull=False)
+        .values_list(field, 'booking_id')
+    )
+    if not booking_ids:
+        return {}
+    bookings = {
+        row['id']: row
+        for row in Booking.objects.filter(id__in=booking_ids.values())
+        .annotate(expected=online_collected_amount_expression())
+        .values('id', 'expected', 'created_at')
+    }
+    return {key: bookings[booking_id] for key, booking_id in booking_ids.items() if booking_id in bookings}
+
+
+def _reconcile_chunk(run, rows, counts, window):
+    payment_lookup = _bookings_by('razorpay_payment_id', {row['payment_id'] for row in rows if not row['skip']})
+    order_lookup = _bookings_by('razorpay_order_id', {
+        row['order_id'] for row in rows
+        if not row['skip'] and row['order_id'] and row['payment_id'] not in payment_lookup
+    })
+
+    records = []
+    for row in rows:
+        booking = None
+        if row['skip']:
+            result = 'SKIPPED'
+        else:
+            booking = payment_lookup.get(row['payment_id']) or order_lookup.get(row['order_id'])
+            if booking is None:
+                result = 'MISSING_BOOKING'
+            elif row['amount'] is not None and row['amount'] != Decimal(booking['expected']):
+                result = 'AMOUNT_MISMATCH'
+            else:
+                result = 'MATCHED'
+            created_on = row['created_on'] or (timezone.localdate(booking['created_at']) if booking else None)
+            if created_on:
+                window[0] = min(window[0] or created_on, created_on)
+                window[1] = max(window[1] or created_on, created_on)
+        counts[result] += 1
+        records.append(ReconciliationRecord(
+            run=run,
+            result=result,
+            payment_id=row['payment_id'][:100],
+            order_id=row['order_id'][:100],
+            booking_id=booking['id'] if booking else None,
+            reported_amount=row['amount'],
+            expected_amount=Decimal(booking['expected']) if booking else None,
+            payment_status=row['status'][:20],
+            settlement_id=row['settlement_id'][:100],
+        ))
+    ReconciliationRecord.objects.bulk_create(records, batch_size=RECONCILE_CHUNK_SIZE)
+
+
+def _record_orphans(run, window_start, window_end):
+    seen_payment = ReconciliationRecord.objects.filter(run=run, payment_id=OuterRef('razorpay_payment_id'))
+    seen_booking = ReconciliationRecord.objects.filter(run=run, booking=OuterRef('pk'))
+    orphans = (
+        Booking.objects.filter(
+            booking_source='ONLINE',
+            razorpay_payment_id__isnull=False,
+            created_at__date__gte=window_start,
+            created_at__date__lte=window_end,
+        )
+        .exclude(razorpay_payment_id='')
+        .exclude(Exists(seen_payment))
+        .exclude(Exists(seen_booking))
+        .annotate(expected=online_collected_amount_expression())
+        .order_by('pk')
+    )
+    # Keyset pages rather than one open cursor, since each page inserts into the table the query anti-joins.
+    total = 0
+    last_pk = None
+    while True:
+        page = orphans.filter(pk__gt=last_pk) if last_pk else orphans
+        chunk = list(page.values_list('id', 'razorpay_payment_id', 'razorpay_order_id', 'expected')[:RECONCILE_CHUNK_SIZE])
+        if not chunk:
+            return total
+        ReconciliationRecord.objects.bulk_create([
+            ReconciliationRecord(
+                run=run,
+                result='ORPHAN_BOOKING',
+                payment_id=payment_id,
+                order_id=order_id or '',
+                booking_id=booking_id,
+                expected_amount=Decimal(expected),
+            )
+            for booking_id, payment_id, order_id, expected in chunk
+        ])
+        total += len(chunk)
+        last_pk = chunk[-1][0]
+
+
+def reconcile_rows(raw_rows, *, source, source_name='', amount_in_paise=False, window_start=None, window_end=None):
+    """Reconcile an iterable of raw report rows and return the finished `ReconciliationRun`.
+
+    Without an explicit window, orphan detection covers the dates spanned by the
+    report's payments (falling back to the matched bookings' creation dates).
+    """
+    run = ReconciliationRun.objects.create(source=source, source_name=source_name[:255])
+    counts = dict.fromkeys(('MATCHED', 'MISSING_BOOKING', 'AMOUNT_MISMATCH', 'SKIPPED'), 0)
+    window = [None, None]
+    rows_read = 0
+    try:
+        raw_rows = iter(raw_rows)
+        while True:
+            chunk = [normalise_row(raw, amount_in_paise=amount_in_paise) for raw in islice(raw_rows, RECONCILE_CHUNK_SIZE)]
+            if not chunk:
+                break
+            rows_read += len(chunk)
+            _reconcile_chunk(run, chunk, counts, window)
+
+        window_start = window_start or window[0]
+        window_end = window_end or window[1]
+        orphan_count = _record_orphans(run, window_start, window_end) if window_start and window_end else 0
+    except Exception as exc:
+        ReconciliationRun.objects.filter(id=run.id).update(
+            status='FAILED',
+            rows_read=rows_read,
+            error=str(exc)[:1000],
+            finished_at=timezone.now(),
+        )
+        raise
+
+    ReconciliationRun.objects.filter(id=run.id).update(
+        status='DONE',
+        window_start=window_start,
+        window_end=window_end,
+        rows_read=rows_read,
+        matched_count=counts['MATCHED'],
+        missing_booking_count=counts['MISSING_BOOKING'],
+        amount_mismatch_count=counts['AMOUNT_MISMATCH'],
+        orphan_booking_count=orphan_count,
+        skipped_count=counts['SKIPPED'],
+        finished_at=timezone.now(),
+    )
+    run.refresh_from_db()
+    return run
+
+
+MISMATCH_REPORT_HEADER = ['Result', 'Payment ID', 'Order ID', 'Booking ID', 'Reported Amount', 'Expected Amount', 'Payment Status', 'Settlement ID']
+
+
+def write_mismatch_report(run, handle):
+    """Stream every non-matching record of a run to `handle` as CSV."""
+    writer = csv.writer(handle)
+    writer.writerow(MISMATCH_REPORT_HEADER)
+    records = (
+        run.records.exclude(result__in=('MATCHED', 'SKIPPED'))
+        .order_by('result', 'id')
+        .values_list('result', 'payment_id', 'order_id', 'booking_id', 'reported_amount', 'expected_amount', 'payment_status', 'settlement_id')
+    )
+    written = 0
+    for row in records.iterator(chunk_size=RECONCILE_CHUNK_SIZE):
+        writer.writerow(['' if value is None else value for value in row])
+        written += 1
+    return written
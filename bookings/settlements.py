@@ -0,0 +1,164 @@
+"""Batch online-settlement generation.
+
+Collected amounts come from `online_collected_amount_expression`, evaluated in
+SQL for every pending online booking in the period, so the preview, the admin
+page and the `generate_online_settlements` command all agree on the totals.
+"""
+
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from grounds.models import Ground
+
+from .models import Booking, OnlineSettlement, OnlineSettlementLineItem
+from .money import online_collected_amount_expression
+
+
+# Only a CREATED settlement is refreshed in place; once money has moved (or the owner has
+# responded) the record is final, so regenerating can never erase a transfer.
+LOCKED_SETTLEMENT_STATUSES = ('TRANSFERRED', 'ACKNOWLEDGED', 'DISPUTED')
+
+
+def _existing_settlements(period_start, period_end, ground_ids=None, lock=False):
+    qs = OnlineSettlement.objects.filter(period_start=period_start, period_end=period_end)
+    if lock:
+        qs = qs.select_for_update()
+    if ground_ids is not None:
+        qs = qs.filter(ground_id__in=ground_ids)
+    return {settlement.ground_id: settlement for settlement in qs}
+
+
+def _settleable_bookings(period_start, period_end, existing, ground_ids=None):
+    """Unsettled online bookings plus those already on a refreshable settlement for this period."""
+    refreshable_ids = [s.id for s in existing.values() if s.status not in LOCKED_SETTLEMENT_STATUSES]
+    locked_ground_ids = [s.ground_id for s in existing.values() if s.status in LOCKED_SETTLEMENT_STATUSES]
+    qs = Booking.objects.filter(
+        Q(online_settlement__isnull=True) | Q(online_settlement_id__in=refreshable_ids),
+        status='BOOKED',
+        booking_source='ONLINE',
+        slot__date__gte=period_start,
+        slot__date__lte=period_end,
+    ).exclude(slot__ground_id__in=locked_ground_ids)
+    if ground_ids is not None:
+        qs = qs.filter(slot__ground_id__in=ground_ids)
+    return qs
+
+
+def preview_online_settlements(period_start, period_end, *, ground_ids=None):
+    """Dry run: per-ground booking counts and collected amounts, in one grouped query."""
+    existing = _existing_settlements(period_start, period_end, ground_ids)
+    rows = list(
+        _settleable_bookings(period_start, period_end, existing, ground_ids)
+        .values('slot__ground_id', 'slot__ground__name', 'slot__ground__owner__name')
+        .annotate(
+            booking_count=Count('id'),
+            collected_amount=Coalesce(Sum(online_collected_amount_expression()), 0),
+        )
+        .order_by('slot__ground__name')
+    )
+    for row in rows:
+        row['collected_amount'] = Decimal(row['collected_amount']).quantize(Decimal('0.01'))
+        settlement = existing.get(row['slot__ground_id'])
+        row['action'] = 'update' if settlement else 'create'
+    return rows
+
+
+def generate_online_settlements(period_start, period_end, *, created_by, admin_note='', ground_ids=None):
+    """Create or refresh settlements for every ground with settleable online bookings.
+
+    Returns a summary dict with created/updated counts, the settlements written,
+    names of grounds skipped because their settlement is already transferred,
+    acknowledged or disputed, and totals.
+    """
+    summary = {
+        'created': 0,
+        'updated': 0,
+        'settlements': [],
+        'skipped_locked': [],
+        'bookings': 0,
+        'total': Decimal('0.00'),
+    }
+    with transaction.atomic():
+        existing = _existing_settlements(period_start, period_end, ground_ids, lock=True)
+        locked_ground_ids = [s.ground_id for s in existing.values() if s.status in LOCKED_SETTLEMENT_STATUSES]
+        if locked_ground_ids:
+            summary['skipped_locked'] = list(
+                Ground.objects.filter(id__in=locked_ground_ids).order_by('name').values_list('name', flat=True)
+            )
+
+        booking_rows = (
+            _settleable_bookings(period_start, period_end, existing, ground_ids)
+            .select_for_update()
+            .annotate(collected=online_collected_amount_expression())
+            .order_by('slot__ground_id', 'slot__date', 'slot__start_time', 'id')
+            .values_list('id', 'slot__ground_id', 'collected')
+        )
+        by_ground = defaultdict(list)
+        for booking_id, ground_id, collected in booking_rows:
+            by_ground[ground_id].append((booking_id, Decimal(collected).quantize(Decimal('0.01'))))
+        if not by_ground:
+            return summary
+
+        owners = dict(Ground.objects.filter(id__in=by_ground).values_list('id', 'owner_id'))
+        now = timezone.now()
+        to_create = []
+        to_update = []
+        for ground_id, lines in by_ground.items():
+            booking_count = len(lines)
+            collected_amount = sum((amount for _, amount in lines), Decimal('0.00'))
+            settlement = existing.get(ground_id)
+            if settlement is None:
+                to_create.append(OnlineSettlement(
+                    ground_id=ground_id,
+                    owner_id=owners[ground_id],
+                    period_start=period_start,
+                    period_end=period_end,
+                    booking_count=booking_count,
+                    collected_amount=collected_amount,
+                    status='CREATED',
+                    reference=f"FB-OS-{now:%Y%m%d}-{str(uuid.uuid4())[:8].upper()}",
+                    admin_note=admin_note,
+                    created_by=created_by,
+                ))
+            else:
+                settlement.booking_count = booking_count
+                settlement.collected_amount = collected_amount
+                settlement.admin_note = admin_note
+                to_update.append(settlement)
+            summary['bookings'] += booking_count
+            summary['total'] += collected_amount
+
+        if to_update:
+            OnlineSettlement.objects.bulk_update(to_update, ['booking_count', 'collected_amount', 'admin_note'])
+            OnlineSettlementLineItem.objects.filter(settlement__in=to_update).delete()
+            current_ids = [booking_id for lines in by_ground.values() for booking_id, _ in lines]
+            Booking.objects.filter(online_settlement__in=to_update).exclude(id__in=current_ids).update(online_settlement=None)
+        if to_create:
+            OnlineSettlement.objects.bulk_create(to_create)
+            # Re-read by reference so primary keys are available on every backend.
+            to_create = list(OnlineSettlement.objects.filter(reference__in=[s.reference for s in to_create]))
+
+        settlements = to_update + to_create
+        OnlineSettlementLineItem.objects.bulk_create(
+            [
+                OnlineSettlementLineItem(settlement=settlement, booking_id=booking_id, collected_amount=amount)
+                for settlement in settlements
+                for booking_id, amount in by_ground[settlement.ground_id]
+            ],
+            batch_size=1000,
+        )
+        for settlement in settlements:
+            Booking.objects.filter(id__in=[booking_id for booking_id, _ in by_ground[settlement.ground_id]]).update(
+                online_settlement=settlement,
+            )
+
+        summary['created'] = len(to_create)
+        summary['updated'] = len(to_update)
+        summary['settlements'] = sorted(settlements, key=lambda s: s.ground_id)
+    return summary
@@ -0,0 +1,77 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from grounds.models import Ground, GroundPricing, GroundReview, Tournament
+from grounds.uploads import queue_processing
+
+from .caching import AVAILABILITY, GROUNDS, REVIEWS, TOURNAMENTS, invalidate
+from .models import Booking, Slot
+from .utilisation import refresh_slot_day
+
+
+@receiver([post_save, post_delete], sender=Booking)
+@receiver([post_save, post_delete], sender=Slot)
+def _invalidate_availability(sender, **kwargs):
+    invalidate(AVAILABILITY)
+
+
+def _utilisation_state(booking):
+    # Read from __dict__ so deferred fields are never fetched; None means "unknown".
+    status = booking.__dict__.get('status')
+    return (None if status is None else status == 'BOOKED', booking.__dict__.get('slot_id'))
+
+
+def _queue_refresh(slot_ids):
+    for slot_id in slot_ids:
+        if slot_id is not None:
+            transaction.on_commit(lambda slot_id=slot_id: refresh_slot_day(slot_id))
+
+
+@receiver(post_init, sender=Booking)
+def _remember_utilisation_state(sender, instance, **kwargs):
+    instance._utilisation_state = _utilisation_state(instance)
+
+
+@receiver(post_save, sender=Booking)
+def _refresh_utilisation(sender, instance, created, **kwargs):
+    # The rollup only counts BOOKED bookings per slot, so payment updates and the like skip it.
+    before = getattr(instance, '_utilisation_state', (None, None))
+    after = _utilisation_state(instance)
+    instance._utilisation_state = after
+    if not created and None not in before and before == after:
+        return
+    _queue_refresh({before[1], after[1]})
+
+
+@receiver(post_delete, sender=Booking)
+def _refresh_utilisation_on_delete(sender, instance, **kwargs):
+    _queue_refresh({instance.slot_id})
+
+
+@receiver([post_save, post_delete], sender=Ground)
+@receiver([post_save, post_delete], sender=GroundPricing)
+def _invalidate_grounds(sender, **kwargs):
+    invalidate(GROUNDS)
+
+
+@receiver([post_save, post_delete], sender=Tournament)
+def _invalidate_tournaments(sender, **kwargs):
+    invalidate(TOURNAMENTS)
+
+
+@receiver(post_save, sender=Tournament)
+def _process_tournament_image(sender, instance, **kwargs):
+    # Variants are recorded with a queryset update, so the cached list is retired explicitly.
+    queue_processing(instance, 'image', on_done=lambda: invalidate(TOURNAMENTS))
+
+
+@receiver(post_save, sender=GroundReview)
+def _process_review_photo(sender, instance, **kwargs):
+    queue_processing(instance, 'photo')
+
+
+@receiver([post_save, post_delete], sender=GroundReview)
+def _refresh_review_stats(sender, instance, **kwargs):
+    Ground.refresh_review_stats(instance.ground_id)
+    invalidate(REVIEWS)
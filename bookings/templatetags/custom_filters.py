@@ -1,4 +1,5 @@
 from django import template
+from django.utils.html import format_html
 from datetime import date
 
 register = template.Library()
@@ -59,3 +60,27 @@ def day_of_week_full(date_obj):
             return date_obj
     
     return date_obj.strftime('%A')
+
+
+@register.simple_tag
+def responsive_image(image, variants, alt='', css_class='', sizes='100vw'):
+    """
+    Render an uploaded image as a <picture> with WebP and JPEG srcsets.
+    Falls back to the original file until its variants have been processed.
+    """
+    if not image:
+        return ''
+    variants = variants or {}
+    if variants.get('source') != image.name or not variants.get('jpeg'):
+        return format_html('<img src="{}" class="{}" alt="{}" loading="lazy">', image.url, css_class, alt)
+
+    def srcset(fmt):
+        widths = sorted(variants.get(fmt, {}).items(), key=lambda item: int(item[0]))
+        return ', '.join(f'{image.storage.url(name)} {width}w' for width, name in widths)
+
+    smallest = min(variants['jpeg'].items(), key=lambda item: int(item[0]))[1]
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" loading="lazy"></picture>',
+        srcset('webp'), sizes, image.storage.url(smallest), srcset('jpeg'), sizes, css_class, alt,
+    )
@@ -1,18 +1,30 @@
+import hashlib
+import hmac
+import importlib.util
+import json
+import os
 import uuid
 from decimal import Decimal
 
+from django.core.cache import cache
+from django.db import DatabaseError, connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from datetime import datetime, time, date
 from datetime import timedelta
-from unittest.mock import patch
+from unittest import skipIf
+from unittest.mock import MagicMock, patch
 
 from accounts.models import User
 from grounds.models import Ground, GroundPricing, Tournament, TournamentRegistration
 from django.utils import timezone
 
-from .models import Slot, Booking, OwnerExpense, BookingAttendance, GroundInvoice, InvoiceLineItem, OnlineSettlement, OnlineSettlementLineItem
+from .models import Slot, Booking, OwnerExpense, BookingAttendance, GroundInvoice, InvoiceLineItem, OnlineSettlement, OnlineSettlementLineItem, SlotUtilisationRollup, ExportJob, PaymentAttempt, WebhookEvent, WhatsAppDelivery, WhatsAppOutboxMessage
+from .payments import record_payment
+from .webhooks import ingest_event, process_event, process_pending_events, replay_events
 from .slot_generation import create_initial_slots_for_ground, ensure_slots_for_ground_date
 from .views import _slot_price_for_slot
+from .whatsapp import dispatch_outbox, queue_templates, send_test_template
 
 
 class SlotGenerationTests(TestCase):
@@ -487,6 +499,8 @@ class BookingFlowTests(TestCase):
         self.assertContains(response, 'aria-controls="owner-extended-metrics"')
         self.assertContains(response, 'aria-controls="owner-grounds-performance"')
         self.assertContains(response, 'aria-controls="owner-tournaments-section"')
+        self.assertContains(response, 'aria-controls="owner-bookings-trend"')
+        self.assertContains(response, 'data-url="/dashboard/analytics/bookings/"')
 
     def test_owner_dashboard_booking_rows_use_button_headers(self):
         slot = Slot.objects.create(
@@ -1059,6 +1073,27 @@ class AdminInvoiceTests(TestCase):
         self.assertContains(detail_response, 'FB-INV-')
         self.assertContains(detail_response, 'Line Items')
 
+    def test_generate_invoices_command_bills_every_ground_and_skips_paid(self):
+        from django.core.management import call_command
+        from io import StringIO
+
+        period = self.settlement_date.isoformat()
+        paid_invoice = GroundInvoice.objects.create(
+            ground=self.ground_two, period_start=self.settlement_date, period_end=self.settlement_date,
+            bookings_count=0, charge_per_booking=Decimal('10.00'), total_amount=Decimal('0.00'), is_paid=True,
+        )
+        out = StringIO()
+        call_command('generate_invoices', '--charge', '20', '--start', period, '--end', period, stdout=out)
+
+        invoice = GroundInvoice.objects.get(ground=self.ground_one)
+        self.assertEqual((invoice.bookings_count, invoice.total_amount), (1, Decimal('20.00')))
+        self.assertEqual(invoice.line_items.count(), 1)
+        paid_invoice.refresh_from_db()
+        self.assertEqual(paid_invoice.line_items.count(), 0)
+        self.assertIsNone(Booking.objects.get(slot=self.slot_two).invoiced_at)
+        self.assertIn('1 created, 0 updated, 1 bookings billed', out.getvalue())
+        self.assertIn('Skipped (already paid): Invoice Arena Two', out.getvalue())
+
     def test_admin_mark_paid_and_unpaid_updates_settlement_metadata(self):
         invoice = GroundInvoice.objects.create(
             ground=self.ground_one,
@@ -1174,6 +1209,67 @@ class AdminInvoiceTests(TestCase):
         self.assertEqual(settlement.owner_confirmed_by, self.owner)
         self.assertIsNotNone(settlement.owner_confirmed_at)
 
+    def test_online_settlement_dry_run_matches_generated_totals(self):
+        from django.core.management import call_command
+        from io import StringIO
+
+        for ground, hour, mode, paid in ((self.ground_one, 13, 'FULL', 500), (self.ground_one, 14, 'PARTIAL_99', 99), (self.ground_two, 13, 'FULL', 600)):
+            slot = Slot.objects.create(
+                ground=ground, date=self.settlement_date, start_time=time(hour, 0), end_time=time(hour + 1, 0), is_booked=True,
+            )
+            Booking.objects.create(
+                slot=slot, customer_name='Online', customer_phone='9000000010', total_amount=max(paid, 500),
+                owner_payout=500, booking_source='ONLINE', payment_mode=mode, payment_status='PAID',
+                paid_amount=paid, due_amount=0,
+            )
+        period = self.settlement_date.isoformat()
+
+        preview_out = StringIO()
+        call_command('generate_online_settlements', '--start', period, '--end', period, '--dry-run', stdout=preview_out)
+        self.assertIn('2 grounds, 3 bookings, total 1199.00', preview_out.getvalue())
+        self.assertFalse(OnlineSettlement.objects.exists())
+
+        out = StringIO()
+        call_command('generate_online_settlements', '--start', period, '--end', period, stdout=out)
+        self.assertIn('2 created, 0 updated, 3 bookings, total 1199.00', out.getvalue())
+        settlement = OnlineSettlement.objects.get(ground=self.ground_one)
+        self.assertEqual((settlement.booking_count, settlement.collected_amount), (2, Decimal('599.00')))
+        self.assertEqual(settlement.created_by, self.admin)
+        self.assertEqual(Booking.objects.filter(online_settlement=settlement).count(), 2)
+        self.assertEqual(OnlineSettlementLineItem.objects.count(), 3)
+
+        call_command('generate_online_settlements', '--start', period, '--end', period, stdout=StringIO())
+        settlement.refresh_from_db()
+        self.assertEqual((settlement.booking_count, settlement.collected_amount), (2, Decimal('599.00')))
+        self.assertEqual(OnlineSettlement.objects.count(), 2)
+
+    def test_regenerating_keeps_transferred_settlement_intact(self):
+        from bookings.settlements import generate_online_settlements
+
+        slot = Slot.objects.create(
+            ground=self.ground_one, date=self.settlement_date, start_time=time(13, 0), end_time=time(14, 0), is_booked=True,
+        )
+        Booking.objects.create(
+            slot=slot, customer_name='Online', customer_phone='9000000010', total_amount=500,
+            owner_payout=500, booking_source='ONLINE', payment_mode='FULL', payment_status='PAID',
+            paid_amount=500, due_amount=0,
+        )
+        generate_online_settlements(self.settlement_date, self.settlement_date, created_by=self.admin)
+        settlement = OnlineSettlement.objects.get(ground=self.ground_one)
+        transferred_at = timezone.now()
+        OnlineSettlement.objects.filter(id=settlement.id).update(
+            status='TRANSFERRED', transferred_at=transferred_at, transferred_by=self.admin,
+        )
+
+        summary = generate_online_settlements(self.settlement_date, self.settlement_date, created_by=self.admin)
+
+        settlement.refresh_from_db()
+        self.assertEqual(summary['skipped_locked'], [self.ground_one.name])
+        self.assertEqual(summary['updated'], 0)
+        self.assertEqual(settlement.status, 'TRANSFERRED')
+        self.assertEqual(settlement.transferred_at, transferred_at)
+        self.assertEqual(settlement.transferred_by, self.admin)
+
     def test_admin_online_settlements_page_renders_submit_form(self):
         settlement_slot = Slot.objects.create(
             ground=self.ground_one,
@@ -1271,6 +1367,89 @@ class AdminInvoiceTests(TestCase):
         self.assertContains(response, 'Invoice Pending')
         self.assertContains(response, 'Settlement Pending')
 
+    def test_admin_bookings_export_streams_csv_rows(self):
+        self.client.force_login(self.admin)
+        response = self.client.get('/dashboard/admin/invoices/export-bookings/', {
+            'ground_id': str(self.ground_one.id),
+            'start': self.settlement_date.isoformat(),
+            'end': self.settlement_date.isoformat(),
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="bookings.csv"')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('Booking ID,Ground,Date'))
+        self.assertIn('Ground One User', lines[1])
+
+    def test_admin_export_job_writes_gzip_file_and_serves_ranges(self):
+        import gzip
+        import tempfile
+
+        from .export_jobs import run_export_job
+
+        with tempfile.TemporaryDirectory() as export_root, override_settings(EXPORT_ROOT=export_root):
+            self.client.force_login(self.admin)
+            with self.captureOnCommitCallbacks(execute=False):
+                response = self.client.post('/dashboard/admin/exports/', {
+                    'kind': 'bookings',
+                    'file_format': 'jsonl',
+                    'start': self.settlement_date.isoformat(),
+                    'end': self.settlement_date.isoformat(),
+                })
+            self.assertRedirects(response, '/dashboard/admin/invoices/', fetch_redirect_response=False)
+            job = ExportJob.objects.get()
+            self.assertEqual(job.status, 'PENDING')
+
+            run_export_job(job.id)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.rows_written, job.total_rows), ('DONE', 2, 2))
+            self.assertTrue(job.file.path.startswith(export_root))
+            with gzip.open(job.file.path, 'rt') as handle:
+                names = sorted(json.loads(line)['Customer Name'] for line in handle)
+            self.assertEqual(names, ['Ground One User', 'Ground Two User'])
+
+            status = self.client.get(f'/dashboard/admin/exports/{job.id}/status/').json()
+            self.assertEqual(status['progress'], 100)
+
+            partial = self.client.get(f'/dashboard/admin/exports/{job.id}/download/', HTTP_RANGE='bytes=0-9')
+            self.assertEqual(partial.status_code, 206)
+            self.assertEqual(len(b''.join(partial.streaming_content)), 10)
+            full = self.client.get(f'/dashboard/admin/exports/{job.id}/download/')
+            self.assertEqual(full.status_code, 200)
+            self.assertEqual(full['Accept-Ranges'], 'bytes')
+            full.close()
+
+    def test_run_export_jobs_reclaims_jobs_whose_worker_died(self):
+        import tempfile
+        from django.core.management import call_command
+        from io import StringIO
+
+        stale = ExportJob.objects.create(
+            kind='bookings',
+            status='RUNNING',
+            started_at=timezone.now() - timedelta(hours=1),
+            heartbeat_at=timezone.now() - timedelta(hours=1),
+        )
+        # Started long ago but still writing chunks, so it must not be claimed twice.
+        active = ExportJob.objects.create(
+            kind='bookings',
+            status='RUNNING',
+            started_at=timezone.now() - timedelta(hours=2),
+            heartbeat_at=timezone.now(),
+        )
+
+        with tempfile.TemporaryDirectory() as export_root, override_settings(EXPORT_ROOT=export_root):
+            out = StringIO()
+            call_command('run_export_jobs', stdout=out)
+
+        self.assertIn('1/1 completed', out.getvalue())
+        stale.refresh_from_db()
+        active.refresh_from_db()
+        self.assertEqual((stale.status, stale.rows_written), ('DONE', 2))
+        self.assertEqual(active.status, 'RUNNING')
+
 
 class BookingFraudDetectionTests(TestCase):
     def setUp(self):
@@ -1386,3 +1565,1368 @@ class BookingFraudDetectionTests(TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertIn('Paid amount mismatch', response.json().get('error', ''))
         self.assertFalse(Booking.objects.filter(slot=self.slot, status='BOOKED').exists())
+
+    def test_verify_payment_records_attempt_and_webhook_resolves_it(self):
+        from .models import PaymentAttempt
+
+        self.client.force_login(self.customer)
+        fake_client = self._mock_razorpay_client(
+            user_id=self.customer.id,
+            slot_id=self.slot.id,
+            amount_paise=_slot_price_for_slot(self.slot) * 100,
+        )
+        payload = {
+            'slot_id': self.slot.id,
+            'payment_mode': 'FULL',
+            'razorpay_order_id': 'order_test_1',
+            'razorpay_payment_id': 'pay_test_1',
+            'razorpay_signature': 'sig_test_1',
+        }
+        with patch('bookings.views._razorpay_client', return_value=(fake_client, 'rzp_test_key')):
+            response = self.client.post('/payments/razorpay/verify-and-book/', data=payload, content_type='application/json')
+            retry = self.client.post('/payments/razorpay/verify-and-book/', data=payload, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(retry.json()['booking_id'], response.json()['booking_id'])
+        attempt = PaymentAttempt.objects.get(razorpay_payment_id='pay_test_1')
+        self.assertEqual(str(attempt.booking_id), response.json()['booking_id'])
+        self.assertEqual(attempt.status, 'CAPTURED')
+
+        fake_client.utility.verify_webhook_signature = lambda *args: None
+        event = {
+            'event': 'payment.captured',
+            'payload': {'payment': {'entity': {'id': 'pay_test_1', 'order_id': 'order_test_1'}}},
+        }
+        Booking.objects.filter(id=attempt.booking_id).update(payment_status='PENDING')
+        with patch('bookings.views._razorpay_client', return_value=(fake_client, 'rzp_test_key')), \
+                override_settings(RAZORPAY_WEBHOOK_SECRET='whsec'):
+            # The view only stores the event; a redelivery with the same event id is acknowledged once.
+            with self.assertNumQueries(3):
+                webhook = self.client.post(
+                    '/payments/razorpay/webhook/', data=json.dumps(event),
+                    content_type='application/json', HTTP_X_RAZORPAY_SIGNATURE='sig', HTTP_X_RAZORPAY_EVENT_ID='evt_1',
+                )
+            redelivery = self.client.post(
+                '/payments/razorpay/webhook/', data=json.dumps(event),
+                content_type='application/json', HTTP_X_RAZORPAY_SIGNATURE='sig', HTTP_X_RAZORPAY_EVENT_ID='evt_1',
+            )
+        self.assertEqual(webhook.status_code, 200)
+        self.assertEqual(redelivery.status_code, 200)
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+        self.assertEqual(Booking.objects.get(id=attempt.booking_id).payment_status, 'PENDING')
+
+        self.assertEqual(process_pending_events(), {'processed': 1, 'failed': 0, 'deferred': 0})
+        self.assertEqual(Booking.objects.get(id=attempt.booking_id).payment_status, 'PAID')
+        self.assertEqual(WebhookEvent.objects.get().status, 'PROCESSED')
+
+        Booking.objects.filter(id=attempt.booking_id).update(payment_status='PENDING')
+        self.assertEqual(replay_events(provider='RAZORPAY')['replayed'], 1)
+        self.assertEqual(Booking.objects.get(id=attempt.booking_id).payment_status, 'PAID')
+
+        # Settling the balance at the ground is further along than the online capture; replay keeps it.
+        Booking.objects.filter(id=attempt.booking_id).update(payment_status='PAID_AT_GROUND')
+        self.assertEqual(replay_events(provider='RAZORPAY')['replayed'], 1)
+        self.assertEqual(Booking.objects.get(id=attempt.booking_id).payment_status, 'PAID_AT_GROUND')
+
+    def test_webhook_events_apply_in_order_per_ordering_key(self):
+        failed = ingest_event('RAZORPAY', '{not json', dedupe_key='evt_bad', ordering_key='order_a')[0]
+        first = ingest_event('RAZORPAY', json.dumps({'event': 'payment.failed', 'payload': {'payment': {'entity': {
+            'id': 'pay_a', 'order_id': 'order_a'}}}}), dedupe_key='evt_a1', ordering_key='order_a')[0]
+        second = ingest_event('RAZORPAY', json.dumps({'event': 'payment.failed', 'payload': {'payment': {'entity': {
+            'id': 'pay_b', 'order_id': 'order_b'}}}}), dedupe_key='evt_b1', ordering_key='order_b')[0]
+
+        # The later event for order_a waits until its predecessor is no longer pending.
+        self.assertIsNone(process_event(first.id))
+        self.assertEqual(process_event(second.id), 'PROCESSED')
+
+        with self.assertLogs('bookings.webhooks', level='ERROR'):
+            summary = process_pending_events()
+        self.assertEqual(summary, {'processed': 1, 'failed': 1, 'deferred': 0})
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.attempts), ('FAILED', 1))
+        self.assertEqual(PaymentAttempt.objects.get(razorpay_order_id='order_a').status, 'FAILED')
+
+    def test_create_order_reuses_pending_order_until_price_changes(self):
+        from .models import PaymentAttempt
+
+        self.client.force_login(self.customer)
+        fake_client = MagicMock()
+        fake_client.order.create.side_effect = [{'id': 'order_reuse_1'}, {'id': 'order_reuse_2'}]
+        payload = json.dumps({'slot_id': self.slot.id, 'payment_mode': 'FULL'})
+        with patch('bookings.views._razorpay_client', return_value=(fake_client, 'rzp_test_key')):
+            first = self.client.post('/payments/razorpay/create-order/', data=payload, content_type='application/json')
+            second = self.client.post('/payments/razorpay/create-order/', data=payload, content_type='application/json')
+            self.assertEqual(first.json()['order_id'], 'order_reuse_1')
+            self.assertEqual(second.json()['order_id'], 'order_reuse_1')
+            self.assertEqual(fake_client.order.create.call_count, 1)
+
+            Ground.objects.filter(id=self.ground.id).update(day_price=650, night_price=650)
+            repriced = self.client.post('/payments/razorpay/create-order/', data=payload, content_type='application/json')
+
+        self.assertEqual(repriced.json()['order_id'], 'order_reuse_2')
+        self.assertEqual(PaymentAttempt.objects.filter(slot=self.slot, user=self.customer).count(), 2)
+
+
+class WhatsAppDispatchTests(TestCase):
+    """Runs the WhatsApp sender against a local fake Graph API."""
+
+    def setUp(self):
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        requests_seen = self.requests_seen = []
+        throttled = {'919000000429': 1}
+
+        class FakeGraphAPI(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                requests_seen.append({'path': self.path, 'port': self.client_address[1], 'body': body})
+                recipient = body['to']
+                if throttled.get(recipient):
+                    throttled[recipient] -= 1
+                    status, payload = 429, {'error': {'message': 'Rate limit hit', 'code': 130429}}
+                elif recipient == '919000000400':
+                    status, payload = 400, {'error': {'message': 'Template name does not exist', 'code': 132001}}
+                else:
+                    status, payload = 200, {'messages': [{'id': f'wamid.{len(requests_seen)}'}]}
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        from .whatsapp import reset_sessions
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeGraphAPI)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.addCleanup(reset_sessions)
+        reset_sessions()
+        self.settings_override = override_settings(
+            WHATSAPP_GRAPH_BASE_URL=f'http://127.0.0.1:{self.server.server_address[1]}',
+            WHATSAPP_ACCESS_TOKEN='token',
+            WHATSAPP_PHONE_NUMBER_ID='12345',
+            WHATSAPP_APP_SECRET='app-secret',
+            WHATSAPP_SEND_CONCURRENCY=1,
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def _post_statuses(self, *statuses):
+        body = json.dumps({'entry': [{'changes': [{'value': {'statuses': list(statuses)}}]}]}).encode('utf-8')
+        signature = 'sha256=' + hmac.new(b'app-secret', body, hashlib.sha256).hexdigest()
+        return self.client.post(
+            '/webhooks/whatsapp/', data=body, content_type='application/json', HTTP_X_HUB_SIGNATURE_256=signature,
+        )
+
+    def test_sent_message_is_tracked_and_statuses_never_regress(self):
+        self.assertTrue(send_test_template('9876543210'))
+        delivery = WhatsAppDelivery.objects.get(message_id='wamid.1')
+        self.assertEqual((delivery.status, delivery.recipient), ('ACCEPTED', '919876543210'))
+        self.assertEqual(self.requests_seen[0]['path'], '/v25.0/12345/messages')
+
+        self._post_statuses({'id': 'wamid.1', 'status': 'read', 'timestamp': '1700000100', 'recipient_id': '919876543210'})
+        self._post_statuses(
+            {'id': 'wamid.1', 'status': 'delivered', 'timestamp': '1700000050', 'recipient_id': '919876543210'},
+            {'id': 'wamid.2', 'status': 'failed', 'timestamp': '1700000060', 'recipient_id': '919800000000',
+             'errors': [{'code': 131026, 'title': 'Message undeliverable'}]},
+        )
+        self.assertEqual(WhatsAppDelivery.objects.get(message_id='wamid.1').status, 'ACCEPTED')
+
+        # Both callbacks are applied together and written as one upsert.
+        with CaptureQueriesContext(connection) as queries:
+            process_pending_events()
+        self.assertEqual(sum('bookings_whatsappdelivery' in q['sql'] for q in queries.captured_queries), 2)
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, 'READ')
+        failed = WhatsAppDelivery.objects.get(message_id='wamid.2')
+        self.assertEqual((failed.status, failed.error_code), ('FAILED', '131026'))
+
+    def test_failed_status_write_leaves_events_pending_for_the_next_run(self):
+        self._post_statuses({'id': 'wamid.9', 'status': 'delivered', 'timestamp': '1700000050', 'recipient_id': '919800000000'})
+
+        with patch('bookings.whatsapp.WhatsAppDelivery.objects.bulk_create', side_effect=DatabaseError('locked')), \
+                self.assertLogs('bookings.webhooks', level='ERROR'):
+            self.assertEqual(process_pending_events(), {'processed': 0, 'failed': 0, 'deferred': 1})
+        self.assertEqual(WebhookEvent.objects.get().status, 'PENDING')
+        self.assertFalse(WhatsAppDelivery.objects.filter(message_id='wamid.9').exists())
+
+        self.assertEqual(process_pending_events(), {'processed': 1, 'failed': 0, 'deferred': 0})
+        self.assertEqual(WebhookEvent.objects.get().status, 'PROCESSED')
+        self.assertEqual(WhatsAppDelivery.objects.get(message_id='wamid.9').status, 'DELIVERED')
+
+    def test_outbox_batch_reuses_connection_and_retries_throttled_sends(self):
+        queued = queue_templates(
+            [{'recipient': f'91980000000{i}', 'template_name': 'booking_reminder', 'parameters': ['Arena', i]} for i in range(3)]
+            + [
+                {'recipient': '919000000429', 'template_name': 'booking_reminder'},
+                {'recipient': '919000000400', 'template_name': 'booking_reminder'},
+            ]
+        )
+        self.assertEqual(queued, 5)
+
+        with self.assertLogs('bookings.whatsapp', level='ERROR'):
+            self.assertEqual(dispatch_outbox(), {'sent': 3, 'retrying': 1, 'failed': 1})
+        self.assertEqual(len({request['port'] for request in self.requests_seen}), 1)
+        self.assertEqual(WhatsAppDelivery.objects.filter(template_name='booking_reminder').count(), 3)
+
+        throttled = WhatsAppOutboxMessage.objects.get(recipient='919000000429')
+        self.assertEqual((throttled.status, throttled.attempts), ('QUEUED', 1))
+        self.assertGreater(throttled.next_attempt_at, timezone.now())
+        self.assertEqual(dispatch_outbox(), {'sent': 0, 'retrying': 0, 'failed': 0})
+
+        WhatsAppOutboxMessage.objects.filter(id=throttled.id).update(next_attempt_at=timezone.now())
+        self.assertEqual(dispatch_outbox(), {'sent': 1, 'retrying': 0, 'failed': 0})
+        throttled.refresh_from_db()
+        self.assertEqual((throttled.status, throttled.attempts), ('SENT', 2))
+        self.assertEqual(
+            WhatsAppOutboxMessage.objects.get(recipient='919000000400').status, 'FAILED',
+        )
+
+    @override_settings(WHATSAPP_MESSAGES_PER_SECOND=2)
+    def test_send_window_is_shared_through_the_cache(self):
+        from .whatsapp import acquire_send_slot
+
+        clock = [1000.25]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            clock[0] += seconds
+
+        # Another worker already used one send of this second's budget.
+        cache.set('whatsapp:rate:123:1000', 1, timeout=5)
+        with patch('bookings.whatsapp.time.time', side_effect=lambda: clock[0]), \
+                patch('bookings.whatsapp.time.sleep', side_effect=sleep):
+            for _ in range(4):
+                acquire_send_slot('123')
+            self.assertEqual(cache.get('whatsapp:rate:123:1001'), 3)
+            self.assertEqual(cache.get('whatsapp:rate:123:1002'), 1)
+
+        self.assertEqual(sleeps, [0.75, 1.0])
+
+
+class OwnerDigestTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email='digestowner@example.com',
+            phone_number='6333333333',
+            name='Digest Owner',
+            password='password123',
+            role='owner',
+            owner_email_mode='DAILY',
+        )
+        self.ground = Ground.objects.create(
+            name='Digest Arena',
+            location='City',
+            owner=self.owner,
+            day_price=500,
+            night_price=900,
+            opening_time=time(6, 0),
+            closing_time=time(23, 0),
+        )
+        day = timezone.localdate() + timedelta(days=1)
+        self.bookings = [
+            Booking.objects.create(
+                slot=Slot.objects.create(ground=self.ground, date=day, start_time=time(hour, 0), end_time=time(hour + 1, 0), is_booked=True),
+                customer_name=f'Customer {hour}',
+                customer_phone=f'700000000{hour % 10}',
+                total_amount=500,
+                owner_payout=500,
+            )
+            for hour in (8, 9)
+        ]
+
+    def test_digest_owner_gets_one_email_for_many_events_but_cancellations_immediately(self):
+        from django.core import mail
+
+        from .digests import send_owner_digests
+        from .models import OwnerNotificationEvent
+        from .views import _owner_booking_email, _send_booking_cancelled_email
+
+        for booking in self.bookings:
+            _owner_booking_email(booking, event='BOOKING_CREATED')
+        _owner_booking_email(self.bookings[0], event='PAYMENT_UPDATED')
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OwnerNotificationEvent.objects.filter(digested_at__isnull=True).count(), 3)
+
+        _send_booking_cancelled_email(self.bookings[1])
+        self.assertEqual(mail.outbox[0].to, ['digestowner@example.com'])
+
+        with self.assertNumQueries(5):
+            summary = send_owner_digests('DAILY')
+        self.assertEqual(summary, {'owners': 1, 'events': 3, 'failed': 0})
+        self.assertEqual(len(mail.outbox), 2)
+        digest = mail.outbox[1]
+        self.assertIn('3 booking updates', digest.subject)
+        self.assertIn('Customer 9', digest.body)
+        self.assertEqual(send_owner_digests('DAILY')['owners'], 0)
+        self.assertEqual(send_owner_digests('HOURLY')['owners'], 0)
+
+    def test_events_left_pending_after_switching_to_immediate_are_flushed(self):
+        from django.core import mail
+
+        from .digests import send_owner_digests
+        from .models import OwnerNotificationEvent
+        from .views import _owner_booking_email
+
+        _owner_booking_email(self.bookings[0], event='BOOKING_CREATED')
+        User.objects.filter(id=self.owner.id).update(owner_email_mode='IMMEDIATE')
+
+        self.assertEqual(send_owner_digests('HOURLY'), {'owners': 1, 'events': 1, 'failed': 0})
+        self.assertEqual(mail.outbox[0].to, ['digestowner@example.com'])
+        self.assertFalse(OwnerNotificationEvent.objects.filter(digested_at__isnull=True).exists())
+        self.assertEqual(send_owner_digests('DAILY')['owners'], 0)
+
+
+class PriceDropDetectionTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email='dropowner@example.com',
+            phone_number='6555555555',
+            name='Drop Owner',
+            password='password123',
+            role='owner',
+        )
+        self.ground = Ground.objects.create(
+            name='Drop Arena',
+            location='City',
+            owner=self.owner,
+            day_price=500,
+            night_price=900,
+            opening_time=time(6, 0),
+            closing_time=time(23, 0),
+            last_minute_price_drop_enabled=True,
+        )
+        self.day = timezone.localdate() + timedelta(days=1)
+        self.now = timezone.make_aware(datetime.combine(self.day, time(14, 0)), timezone.get_current_timezone())
+
+    def _slot(self, ground, start, **kwargs):
+        end = (datetime.combine(self.day, start) + timedelta(hours=1)).time()
+        return Slot.objects.create(ground=ground, date=self.day, start_time=start, end_time=end, **kwargs)
+
+    def test_detector_marks_slots_entering_discount_window_once(self):
+        from .price_drops import detect_price_drops
+
+        disabled_ground = Ground.objects.create(
+            name='Full Price Arena',
+            location='City',
+            owner=self.owner,
+            day_price=500,
+            night_price=900,
+            opening_time=time(6, 0),
+            closing_time=time(23, 0),
+            last_minute_price_drop_enabled=False,
+        )
+        due = self._slot(self.ground, time(14, 5))
+        self._slot(self.ground, time(14, 10), is_booked=True)
+        self._slot(self.ground, time(14, 30))
+        self._slot(disabled_ground, time(14, 5))
+
+        dispatched = []
+        with CaptureQueriesContext(connection) as queries:
+            slots = detect_price_drops(lambda ground, slot: dispatched.append((ground.id, slot.id)) or True, now=self.now)
+        # One indexed scan across all grounds, then one bulk mark.
+        self.assertEqual(len([query for query in queries.captured_queries if 'bookings_slot' in query['sql']]), 2)
+        self.assertEqual([slot.id for slot in slots], [due.id])
+        self.assertEqual(dispatched, [(self.ground.id, due.id)])
+        due.refresh_from_db()
+        self.assertEqual(due.price_drop_announced_at, self.now)
+
+        self.assertEqual(detect_price_drops(lambda ground, slot: dispatched.append(slot.id) or True, now=self.now), [])
+        self.assertEqual(len(dispatched), 1)
+
+    def test_slots_whose_alert_was_not_sent_stay_unannounced(self):
+        from .price_drops import detect_price_drops
+
+        due = self._slot(self.ground, time(14, 5))
+
+        self.assertEqual(detect_price_drops(lambda ground, slot: False, now=self.now), [])
+        due.refresh_from_db()
+        self.assertIsNone(due.price_drop_announced_at)
+
+        slots = detect_price_drops(lambda ground, slot: True, now=self.now + timedelta(minutes=1))
+        self.assertEqual([slot.id for slot in slots], [due.id])
+
+    def test_alert_emails_go_out_after_the_slot_lock_is_released(self):
+        from django.core import mail
+
+        from .models import AlertSubscription
+        from .price_drops import detect_price_drops
+        from .views import _dispatch_ground_alerts
+
+        subscriber = User.objects.create_user(
+            email='dropfan@example.com',
+            phone_number='6555555556',
+            name='Drop Fan',
+            password='password123',
+        )
+        AlertSubscription.objects.create(user=subscriber, ground=self.ground)
+        self._slot(self.ground, time(16, 5))
+        evening = self.now.replace(hour=16, minute=0)
+
+        with patch('bookings.views._promo_email_allowed_now', return_value=True), \
+                patch('bookings.views._notification_executor.submit', side_effect=lambda fn, *args: fn(*args)):
+            with self.captureOnCommitCallbacks() as callbacks:
+                slots = detect_price_drops(
+                    lambda ground, slot: _dispatch_ground_alerts(ground, slot=slot, reason='PRICE_DROP'),
+                    now=evening,
+                )
+                self.assertEqual(len(slots), 1)
+                self.assertEqual(mail.outbox, [])
+
+            for callback in callbacks:
+                callback()
+        self.assertEqual([message.to for message in mail.outbox], [['dropfan@example.com']])
+
+    def test_peak_slots_are_never_announced(self):
+        from .price_drops import detect_price_drops
+
+        self._slot(self.ground, time(17, 5))
+        peak_now = self.now.replace(hour=17, minute=0)
+        self.assertEqual(detect_price_drops(lambda ground, slot: None, now=peak_now), [])
+
+    def test_command_alerts_each_ground_once(self):
+        from django.core.management import call_command
+
+        self._slot(self.ground, time(14, 5))
+        self._slot(self.ground, time(14, 10))
+        with patch('bookings.price_drops.timezone.now', return_value=self.now), \
+                patch('bookings.management.commands.detect_price_drops._dispatch_ground_alerts') as dispatch:
+            call_command('detect_price_drops', stdout=open(os.devnull, 'w'))
+        dispatch.assert_called_once()
+        self.assertEqual(dispatch.call_args.kwargs['reason'], 'PRICE_DROP')
+        self.assertEqual(dispatch.call_args.kwargs['slot'].start_time, time(14, 5))
+
+
+class SlotWaitlistTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email='waitowner@example.com',
+            phone_number='6566666666',
+            name='Wait Owner',
+            password='password123',
+            role='owner',
+        )
+        self.ground = Ground.objects.create(
+            name='Waitlist Arena',
+            location='City',
+            owner=self.owner,
+            day_price=500,
+            night_price=900,
+            opening_time=time(6, 0),
+            closing_time=time(23, 0),
+        )
+        self.customer, self.first_waiter, self.second_waiter = [
+            User.objects.create_user(
+                email=f'wait{index}@example.com',
+                phone_number=f'657777777{index}',
+                name=f'Wait Player {index}',
+                password='password123',
+            )
+            for index in range(3)
+        ]
+        self.slot = Slot.objects.create(
+            ground=self.ground,
+            date=timezone.localdate() + timedelta(days=2),
+            start_time=time(9, 0),
+            end_time=time(10, 0),
+            is_booked=True,
+        )
+        self.booking = Booking.objects.create(
+            user=self.customer,
+            slot=self.slot,
+            customer_name='Wait Player 0',
+            customer_phone='6577777770',
+            total_amount=500,
+            owner_payout=500,
+        )
+
+    def _join(self, user):
+        self.client.force_login(user)
+        return self.client.post(f'/grounds/{self.ground.id}/', {'action': 'waitlist_join', 'slot_id': self.slot.id})
+
+    def test_cancellation_holds_slot_for_first_waiter_only(self):
+        from django.core import mail
+
+        from .models import SlotWaitlistEntry
+        from .waitlist import send_waitlist_offers
+
+        self._join(self.first_waiter)
+        self._join(self.second_waiter)
+        self.assertEqual(SlotWaitlistEntry.objects.filter(status='WAITING').count(), 2)
+
+        self.client.force_login(self.customer)
+        with patch('bookings.views._dispatch_ground_alerts') as ground_alerts, \
+                patch('bookings.views._queue_waitlist_offers') as queue_offers, \
+                patch('bookings.views._queue_booking_cancellation_notifications'), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.get(f'/cancel/{self.booking.id}/')
+        ground_alerts.assert_not_called()
+        offered_ids = queue_offers.call_args.args[0]
+
+        self.slot.refresh_from_db()
+        self.assertFalse(self.slot.is_booked)
+        self.assertEqual(self.slot.held_for, self.first_waiter)
+        first_entry = SlotWaitlistEntry.objects.get(user=self.first_waiter)
+        self.assertEqual(offered_ids, [first_entry.id])
+        self.assertEqual(first_entry.status, 'OFFERED')
+        self.assertEqual(SlotWaitlistEntry.objects.get(user=self.second_waiter).status, 'WAITING')
+
+        self.assertEqual(send_waitlist_offers(offered_ids), 1)
+        self.assertEqual([message.to for message in mail.outbox], [['wait1@example.com']])
+
+        self.client.force_login(self.second_waiter)
+        response = self.client.post(
+            '/payments/razorpay/create-order/',
+            data='{"slot_id": %s, "payment_mode": "FULL"}' % self.slot.id,
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 409)
+        self.client.force_login(self.first_waiter)
+        response = self.client.post(
+            '/payments/razorpay/create-order/',
+            data='{"slot_id": %s, "payment_mode": "FULL"}' % self.slot.id,
+            content_type='application/json',
+        )
+        self.assertNotEqual(response.status_code, 409)
+
+    def test_checkout_rechecks_hold_under_lock_and_holder_claims_offer(self):
+        from .models import SlotWaitlistEntry
+        from .waitlist import offer_freed_slots
+
+        self._join(self.first_waiter)
+        self.booking.delete()
+        Slot.objects.filter(id=self.slot.id).update(is_booked=False)
+        self.slot.refresh_from_db()
+        offer_freed_slots([self.slot])
+
+        def verify(user, payment_id):
+            # The order was opened before the hold, so only verify can stop it.
+            client = MagicMock()
+            client.order.fetch.return_value = {'notes': {'slot_id': str(self.slot.id), 'user_id': str(user.id)}}
+            client.payment.fetch.return_value = {
+                'order_id': f'order_{payment_id}',
+                'status': 'captured',
+                'amount': _slot_price_for_slot(self.slot) * 100,
+            }
+            self.client.force_login(user)
+            with patch('bookings.views._razorpay_client', return_value=(client, 'rzp_test_key')):
+                return self.client.post('/payments/razorpay/verify-and-book/', data=json.dumps({
+                    'slot_id': self.slot.id,
+                    'payment_mode': 'FULL',
+                    'razorpay_order_id': f'order_{payment_id}',
+                    'razorpay_payment_id': payment_id,
+                    'razorpay_signature': 'sig',
+                }), content_type='application/json')
+
+        self.assertEqual(verify(self.second_waiter, 'pay_other').status_code, 409)
+        self.assertFalse(Booking.objects.filter(slot=self.slot, status='BOOKED').exists())
+
+        self.assertEqual(verify(self.first_waiter, 'pay_holder').status_code, 200)
+        self.slot.refresh_from_db()
+        self.assertTrue(self.slot.is_booked)
+        self.assertIsNone(self.slot.held_for)
+        self.assertEqual(SlotWaitlistEntry.objects.get(user=self.first_waiter).status, 'CLAIMED')
+
+    def test_cancellation_without_waiters_falls_back_to_ground_alert(self):
+        self.client.force_login(self.customer)
+        with patch('bookings.views._dispatch_ground_alerts') as ground_alerts:
+            self.client.get(f'/cancel/{self.booking.id}/')
+        ground_alerts.assert_called_once()
+        self.slot.refresh_from_db()
+        self.assertIsNone(self.slot.held_for)
+
+    def test_lapsed_hold_moves_to_next_waiter_then_falls_back_to_alerts(self):
+        from .models import SlotWaitlistEntry
+        from .waitlist import expire_waitlist_holds, offer_freed_slots
+
+        self._join(self.first_waiter)
+        self._join(self.second_waiter)
+        self.booking.delete()
+        Slot.objects.filter(id=self.slot.id).update(is_booked=False)
+        self.slot.refresh_from_db()
+        offer_freed_slots([self.slot])
+        dispatch = MagicMock()
+
+        self.assertEqual(expire_waitlist_holds(dispatch), {'expired': 0, 'offered': 0, 'released': 0})
+
+        later = timezone.now() + timedelta(minutes=20)
+        with patch('bookings.waitlist.send_waitlist_offers') as send_offers:
+            summary = expire_waitlist_holds(dispatch, now=later)
+        self.assertEqual(summary, {'expired': 1, 'offered': 1, 'released': 0})
+        second_entry = SlotWaitlistEntry.objects.get(user=self.second_waiter)
+        send_offers.assert_called_once_with([second_entry.id])
+        self.assertEqual(SlotWaitlistEntry.objects.get(user=self.first_waiter).status, 'EXPIRED')
+        self.assertEqual(second_entry.status, 'OFFERED')
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.held_for, self.second_waiter)
+        dispatch.assert_not_called()
+
+        summary = expire_waitlist_holds(dispatch, now=later + timedelta(minutes=20))
+        self.assertEqual(summary, {'expired': 1, 'offered': 0, 'released': 1})
+        self.slot.refresh_from_db()
+        self.assertIsNone(self.slot.held_for)
+        dispatch.assert_called_once_with(self.ground, self.slot)
+
+
+class WebPushTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            email='pushcustomer@example.com',
+            phone_number='6444444444',
+            name='Push Customer',
+            password='password123',
+            role='customer',
+            email_verified=True,
+        )
+
+    def test_subscribe_stores_endpoint_and_enables_push_alerts(self):
+        from .models import PushSubscription
+
+        self.client.force_login(self.customer)
+        subscription = {'endpoint': 'https://fcm.googleapis.com/fcm/send/abc', 'keys': {'p256dh': 'BPkey', 'auth': 'authkey'}}
+        for _ in range(2):
+            response = self.client.post('/push/subscribe/', data=json.dumps(subscription), content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(PushSubscription.objects.filter(user=self.customer).count(), 1)
+        self.customer.refresh_from_db()
+        self.assertTrue(self.customer.push_alerts)
+
+        keys = subscription['keys']
+        for endpoint in (
+            'http://fcm.googleapis.com/fcm/send/abc',
+            'https://169.254.169.254/latest/meta-data/',
+            'https://push.example.com/send/abc',
+            'https://fcm.googleapis.com.evil.example/send/abc',
+            'https://fcm.googleapis.com:8443/send/abc',
+        ):
+            bad = self.client.post('/push/subscribe/', data=json.dumps({'endpoint': endpoint, 'keys': keys}), content_type='application/json')
+            self.assertEqual(bad.status_code, 400, endpoint)
+        self.assertEqual(PushSubscription.objects.count(), 1)
+
+        self.client.post('/push/unsubscribe/', data=json.dumps({'endpoint': subscription['endpoint']}), content_type='application/json')
+        self.assertFalse(PushSubscription.objects.exists())
+
+    @skipIf(importlib.util.find_spec('pywebpush') is None, 'pywebpush is not installed')
+    def test_batch_fans_out_to_push_service_stub_and_prunes_expired_endpoints(self):
+        import base64
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import ec
+
+        from .models import PushSubscription
+        from .push import notify_users, reset_push_session
+
+        hits = []
+
+        class PushServiceStub(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                hits.append((self.path, self.headers.get('TTL'), self.headers.get('Authorization', '')))
+                status = 410 if self.path.startswith('/gone/') else 500 if self.path.startswith('/flaky/') else 201
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), PushServiceStub)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.addCleanup(reset_push_session)
+
+        def b64(raw):
+            return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+        vapid_key = ec.generate_private_key(ec.SECP256R1())
+        browser_key = ec.generate_private_key(ec.SECP256R1()).public_key().public_bytes(
+            serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint,
+        )
+        base_url = f'http://127.0.0.1:{server.server_address[1]}'
+        for path in ['ok/1', 'ok/2', 'ok/3', 'gone/1', 'flaky/1']:
+            PushSubscription.objects.create(
+                user=self.customer,
+                endpoint=f'{base_url}/{path}',
+                p256dh=b64(browser_key),
+                auth=b64(os.urandom(16)),
+                failure_count=4 if path == 'flaky/1' else 0,
+            )
+
+        with override_settings(
+            VAPID_PRIVATE_KEY=b64(vapid_key.private_numbers().private_value.to_bytes(32, 'big')),
+            VAPID_PUBLIC_KEY='configured',
+            PUSH_MAX_WORKERS=3,
+            PUSH_MAX_FAILURES=5,
+        ):
+            summary = notify_users([self.customer.id], {'title': 'Price drop', 'url': '/grounds/1/'}, ttl=600)
+
+        self.assertEqual(summary, {'sent': 3, 'expired': 2, 'failed': 0})
+        self.assertEqual(len(hits), 5)
+        self.assertTrue(all(ttl == '600' and auth.startswith('vapid ') for _, ttl, auth in hits))
+        self.assertEqual(
+            sorted(PushSubscription.objects.values_list('endpoint', flat=True)),
+            [f'{base_url}/ok/{i}' for i in (1, 2, 3)],
+        )
+
+
+class GroundImageTests(TestCase):
+    def setUp(self):
+        import tempfile
+
+        from PIL import Image
+
+        from grounds.images import reset_caches
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(reset_caches)
+        source = os.path.join(self.tmp.name, 'pitch.png')
+        Image.new('RGB', (2000, 1500), (20, 120, 40)).save(source)
+        owner = User.objects.create_user(
+            email='imageowner@example.com',
+            phone_number='5222222222',
+            name='Image Owner',
+            password='password123',
+            role='owner',
+        )
+        self.ground = Ground.objects.create(
+            name='Image Arena',
+            location='City',
+            owner=owner,
+            day_price=500,
+            night_price=900,
+            opening_time=time(6, 0),
+            closing_time=time(23, 0),
+            image=source,
+        )
+        override = override_settings(GROUND_IMAGE_VARIANT_DIR=os.path.join(self.tmp.name, 'variants'))
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_thumbnail_variants_are_negotiated_and_revalidated(self):
+        from io import BytesIO
+
+        from PIL import Image
+
+        url = f'/grounds/{self.ground.id}/image/?size=thumb'
+        response = self.client.get(url, HTTP_ACCEPT='image/avif,image/webp,*/*')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('max-age=', response['Cache-Control'])
+        self.assertIn('Accept', response['Vary'])
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as thumb:
+            self.assertEqual(thumb.size, (480, 270))
+
+        revalidated = self.client.get(url, HTTP_ACCEPT='image/webp', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+        jpeg = self.client.get(url, HTTP_ACCEPT='image/png,*/*')
+        self.assertEqual(jpeg['Content-Type'], 'image/jpeg')
+        self.assertNotEqual(jpeg['ETag'], response['ETag'])
+
+        original = self.client.get(f'/grounds/{self.ground.id}/image/')
+        self.assertEqual(original['Content-Type'], 'image/png')
+        self.assertIn('Last-Modified', original)
+
+    def test_switching_to_an_older_image_rebuilds_variants(self):
+        from io import BytesIO
+
+        from PIL import Image
+
+        url = f'/grounds/{self.ground.id}/image/?size=thumb'
+        first = self.client.get(url, HTTP_ACCEPT='image/webp')
+        b''.join(first.streaming_content)
+
+        replacement = os.path.join(self.tmp.name, 'night.png')
+        Image.new('RGB', (1600, 900), (200, 20, 20)).save(replacement)
+        os.utime(replacement, (1_000_000_000, 1_000_000_000))
+        Ground.objects.filter(id=self.ground.id).update(image=replacement)
+
+        second = self.client.get(url, HTTP_ACCEPT='image/webp')
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        with Image.open(BytesIO(b''.join(second.streaming_content))) as thumb:
+            red, green, _ = thumb.convert('RGB').getpixel((240, 135))
+        self.assertGreater(red, green)
+        self.assertEqual(len(os.listdir(os.path.join(self.tmp.name, 'variants'))), 4)
+
+
+class UploadProcessingTests(TestCase):
+    def setUp(self):
+        import tempfile
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(MEDIA_ROOT=self.tmp.name, UPLOAD_IMAGE_MAX_SIDE=1600)
+        override.enable()
+        self.addCleanup(override.disable)
+        owner = User.objects.create_user(
+            email='uploadowner@example.com',
+            phone_number='5333333333',
+            name='Upload Owner',
+            password='password123',
+            role='owner',
+        )
+        self.ground = Ground.objects.create(
+            name='Upload Arena',
+            location='City',
+            owner=owner,
+            day_price=500,
+            night_price=900,
+            opening_time=time(6, 0),
+            closing_time=time(23, 0),
+        )
+
+    def test_review_photo_is_stripped_downsized_and_rendered_with_srcset(self):
+        from io import BytesIO
+
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.template import Context, Template
+        from PIL import Image
+
+        from grounds.models import GroundReview
+
+        photo = Image.new('RGB', (3000, 2000), (200, 30, 30))
+        exif = photo.getexif()
+        exif[0x010F] = 'PhoneMaker'
+        buffer = BytesIO()
+        photo.save(buffer, 'JPEG', exif=exif)
+
+        with patch('grounds.uploads._upload_executor.submit', side_effect=lambda fn, *args: fn(*args)), \
+                self.captureOnCommitCallbacks(execute=True):
+            review = GroundReview.objects.create(
+                ground=self.ground,
+                rating=5,
+                comment='Great pitch',
+                photo=SimpleUploadedFile('pitch.jpg', buffer.getvalue(), content_type='image/jpeg'),
+            )
+
+        review.refresh_from_db()
+        variants = review.photo_variants
+        self.assertEqual(variants['source'], review.photo.name)
+        self.assertEqual(sorted(variants['webp']), ['1080', '480'])
+        with Image.open(review.photo.path) as cleaned:
+            self.assertEqual(cleaned.size, (1600, 1067))
+            self.assertNotIn(0x010F, cleaned.getexif())
+        with Image.open(review.photo.storage.path(variants['webp']['480'])) as small:
+            self.assertEqual((small.format, small.width), ('WEBP', 480))
+
+        html = Template('{% load custom_filters %}{% responsive_image review.photo review.photo_variants alt="Review photo" %}').render(
+            Context({'review': review})
+        )
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('.w480.webp 480w', html)
+        self.assertIn('.w1080.jpg 1080w', html)
+
+    def test_converted_upload_never_overwrites_another_records_file(self):
+        from io import BytesIO
+
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from PIL import Image
+
+        from grounds.models import GroundReview
+
+        existing = default_storage.save('ground-reviews/pitch.jpg', ContentFile(b'another review'))
+        existing_variant = default_storage.save('ground-reviews/pitch.w480.webp', ContentFile(b'another variant'))
+        buffer = BytesIO()
+        Image.new('RGB', (800, 600), (30, 200, 30)).save(buffer, 'GIF')
+
+        with patch('grounds.uploads._upload_executor.submit', side_effect=lambda fn, *args: fn(*args)), \
+                self.captureOnCommitCallbacks(execute=True):
+            review = GroundReview.objects.create(
+                ground=self.ground,
+                rating=4,
+                photo=SimpleUploadedFile('pitch.gif', buffer.getvalue(), content_type='image/gif'),
+            )
+
+        review.refresh_from_db()
+        self.assertNotIn(review.photo.name, {existing, existing_variant})
+        self.assertTrue(review.photo.name.endswith('.jpg'))
+        self.assertNotIn(existing_variant, review.photo_variants['webp'].values())
+        with default_storage.open(existing) as handle:
+            self.assertEqual(handle.read(), b'another review')
+        with default_storage.open(existing_variant) as handle:
+            self.assertEqual(handle.read(), b'another variant')
+        self.assertFalse(default_storage.exists('ground-reviews/pitch.gif'))
+
+
+class PublicLandingCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(
+            email='cacheowner@example.com',
+            phone_number='5111111111',
+            name='Cache Owner',
+            password='password123',
+            role='owner',
+            email_verified=True,
+        )
+        self.ground = Ground.objects.create(
+            name='Cache Arena',
+            location='City',
+            owner=self.owner,
+            day_price=500,
+            night_price=900,
+            opening_time=time(6, 0),
+            closing_time=time(23, 0),
+        )
+        self.search_date = timezone.localdate() + timedelta(days=2)
+
+    def test_public_slot_search_is_cached_until_a_booking_changes(self):
+        url = f'/slots/search/?date={self.search_date.isoformat()}'
+        first = self.client.get(url).json()
+        self.assertEqual(first['total_results'], 17)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(url).json()
+        self.assertEqual(cached['slots'], first['slots'])
+
+        slot = Slot.objects.get(ground=self.ground, date=self.search_date, start_time=time(9, 0))
+        slot.is_booked = True
+        slot.save(update_fields=['is_booked'])
+
+        refreshed = self.client.get(url).json()
+        self.assertEqual(refreshed['total_results'], 16)
+
+    def test_active_grounds_cache_invalidated_by_ground_change(self):
+        self.assertEqual(len(self.client.get('/api/grounds/').json()['grounds']), 1)
+        with self.assertNumQueries(0):
+            self.client.get('/api/grounds/')
+
+        self.ground.is_active = False
+        self.ground.save(update_fields=['is_active'])
+
+        self.assertEqual(self.client.get('/api/grounds/').json()['grounds'], [])
+
+    def test_ground_list_is_cached_until_a_review_changes_its_stats(self):
+        from grounds.models import GroundReview
+
+        customer = User.objects.create_user(
+            email='cachereviewer@example.com',
+            phone_number='5111111112',
+            name='Cache Reviewer',
+            password='password123',
+        )
+        self.client.force_login(customer)
+        self.assertContains(self.client.get('/grounds/'), '0 reviews')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/grounds/')
+        self.assertFalse([query for query in queries.captured_queries if 'grounds_ground' in query['sql']])
+
+        GroundReview.objects.create(ground=self.ground, user=customer, rating=4, comment='Good turf')
+        GroundReview.objects.create(ground=self.ground, user=customer, rating=5, comment='Great lights')
+        self.ground.refresh_from_db()
+        self.assertEqual(self.ground.review_count, 2)
+        self.assertEqual(self.ground.avg_rating, Decimal('4.50'))
+        self.assertContains(self.client.get('/grounds/'), '★ 4.5 · 2 reviews')
+
+    def test_cached_listings_do_not_carry_owner_accounts(self):
+        from .public_cache import cached_ground_list, cached_tournament_list
+
+        Tournament.objects.create(
+            ground=self.ground,
+            title='Cache Cup',
+            start_date=self.search_date,
+            end_date=self.search_date,
+            is_published=True,
+        )
+        self.client.force_login(self.owner)
+        self.client.get('/grounds/')
+        self.client.get('/tournaments/')
+
+        grounds = cached_ground_list(lambda: self.fail('ground list was not cached'))
+        tournaments = cached_tournament_list(timezone.localdate(), lambda: self.fail('tournament list was not cached'))
+        self.assertEqual([ground.id for ground in grounds], [self.ground.id])
+        self.assertNotIn('owner', grounds[0]._state.fields_cache)
+        self.assertEqual([tournament.title for tournament in tournaments], ['Cache Cup'])
+        self.assertNotIn('owner', tournaments[0].ground._state.fields_cache)
+
+    def test_namespaces_are_shared_through_file_backend_and_invalidated_by_tournaments(self):
+        import tempfile
+
+        from .caching import TOURNAMENTS, get_or_build
+
+        builds = []
+
+        def build():
+            builds.append(1)
+            return list(Tournament.objects.values_list('title', flat=True))
+
+        with tempfile.TemporaryDirectory() as location, override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location},
+        }):
+            self.assertEqual(get_or_build('test:tournaments', build, depends_on=(TOURNAMENTS,)), [])
+            self.assertEqual(get_or_build('test:tournaments', build, depends_on=(TOURNAMENTS,)), [])
+            self.assertEqual(len(builds), 1)
+
+            Tournament.objects.create(
+                ground=self.ground,
+                title='Cache Cup',
+                start_date=self.search_date,
+                end_date=self.search_date,
+                entry_fee=300,
+                contact_phone='9999900000',
+            )
+            self.assertEqual(get_or_build('test:tournaments', build, depends_on=(TOURNAMENTS,)), ['Cache Cup'])
+            self.assertEqual(len(builds), 2)
+
+
+class BookingAnalyticsTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email='analyticsowner@example.com',
+            phone_number='5222222222',
+            name='Analytics Owner',
+            password='password123',
+            role='owner',
+            email_verified=True,
+        )
+        other_owner = User.objects.create_user(
+            email='otheranalytics@example.com',
+            phone_number='5333333333',
+            name='Other Owner',
+            password='password123',
+            role='owner',
+            email_verified=True,
+        )
+        self.ground = Ground.objects.create(
+            name='Analytics Arena', location='City', owner=self.owner,
+            day_price=500, night_price=900, opening_time=time(6, 0), closing_time=time(23, 0),
+        )
+        other_ground = Ground.objects.create(
+            name='Other Arena', location='City', owner=other_owner,
+            day_price=500, night_price=900, opening_time=time(6, 0), closing_time=time(23, 0),
+        )
+        self.monday = date(2026, 3, 2)
+        for ground, day_offset, source, paid in (
+            (self.ground, 0, 'MANUAL', 500),
+            (self.ground, 2, 'ONLINE', 500),
+            (self.ground, 14, 'MANUAL', 0),
+            (other_ground, 1, 'MANUAL', 500),
+        ):
+            slot = Slot.objects.create(
+                ground=ground, date=self.monday + timedelta(days=day_offset),
+                start_time=time(9, 0), end_time=time(10, 0), is_booked=True,
+            )
+            Booking.objects.create(
+                slot=slot, customer_name='Player', customer_phone='9000000000',
+                total_amount=500, owner_payout=480, booking_source=source,
+                payment_mode='FULL', payment_status='PAID' if paid else 'PENDING',
+                paid_amount=paid, due_amount=500 - paid,
+            )
+
+    def test_owner_weekly_series_is_zero_filled_and_scoped_to_own_grounds(self):
+        self.client.force_login(self.owner)
+        response = self.client.get('/dashboard/analytics/bookings/', {
+            'granularity': 'week',
+            'start': self.monday.isoformat(),
+            'end': (self.monday + timedelta(days=20)).isoformat(),
+        })
+
+        self.assertEqual(response.status_code, 200)
+        series = response.json()['series']
+        self.assertEqual([row['bucket'] for row in series], ['2026-03-02', '2026-03-09', '2026-03-16'])
+        self.assertEqual([row['bookings'] for row in series], [2, 0, 1])
+        self.assertEqual(series[0]['gmv'], 1000)
+        self.assertEqual(series[0]['owner_payout'], 960)
+        self.assertEqual(series[0]['collected'], 1000)
+        self.assertEqual(series[2]['collected'], 0)
+
+    def test_customers_cannot_read_analytics(self):
+        customer = User.objects.create_user(
+            email='analyticscustomer@example.com',
+            phone_number='5444444444',
+            name='Customer',
+            password='password123',
+            role='customer',
+            email_verified=True,
+        )
+        self.client.force_login(customer)
+        response = self.client.get('/dashboard/analytics/bookings/')
+        self.assertEqual(response.status_code, 403)
+
+
+class SlotUtilisationTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email='occupancyowner@example.com',
+            phone_number='5555555555',
+            name='Occupancy Owner',
+            password='password123',
+            role='owner',
+            email_verified=True,
+        )
+        self.ground = Ground.objects.create(
+            name='Occupancy Arena', location='City', owner=self.owner,
+            day_price=500, night_price=900, opening_time=time(6, 0), closing_time=time(10, 0),
+        )
+        self.day = date(2026, 3, 2)
+        create_initial_slots_for_ground(ground=self.ground, days=2, start_date=self.day)
+        booked_slot = Slot.objects.get(ground=self.ground, date=self.day, start_time=time(7, 0))
+        cancelled_slot = Slot.objects.get(ground=self.ground, date=self.day, start_time=time(8, 0))
+        for slot, status in ((booked_slot, 'BOOKED'), (cancelled_slot, 'CANCELLED')):
+            Booking.objects.create(
+                slot=slot, customer_name='Player', customer_phone='9000000000',
+                total_amount=500, owner_payout=500, status=status,
+            )
+
+    def test_refresh_rollup_counts_only_active_bookings(self):
+        from .utilisation import occupancy_by_ground, occupancy_by_hour, occupancy_by_weekday, refresh_utilisation_rollup
+
+        written = refresh_utilisation_rollup(start_date=self.day, end_date=self.day + timedelta(days=1))
+
+        self.assertEqual(written, 8)
+        ground_row = occupancy_by_ground(start_date=self.day, end_date=self.day + timedelta(days=1))[0]
+        self.assertEqual((ground_row['booked'], ground_row['slots'], ground_row['idle']), (1, 8, 7))
+        self.assertEqual(ground_row['occupancy'], 12.5)
+        hours = {row['hour']: row['occupancy'] for row in occupancy_by_hour(start_date=self.day, end_date=self.day)}
+        self.assertEqual(hours, {6: 0.0, 7: 100.0, 8: 0.0, 9: 0.0})
+        weekdays = {row['weekday']: row['booked'] for row in occupancy_by_weekday(start_date=self.day, end_date=self.day + timedelta(days=1))}
+        self.assertEqual(weekdays, {1: 1, 2: 0})
+
+        refresh_utilisation_rollup(start_date=self.day, end_date=self.day + timedelta(days=1))
+        self.assertEqual(SlotUtilisationRollup.objects.count(), 8)
+
+    def test_booking_change_refreshes_its_day_after_commit(self):
+        from .utilisation import occupancy_by_ground
+
+        slot = Slot.objects.get(ground=self.ground, date=self.day, start_time=time(9, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(
+                slot=slot, customer_name='Player', customer_phone='9000000001', total_amount=500, owner_payout=500,
+            )
+
+        ground_row = occupancy_by_ground(start_date=self.day, end_date=self.day)[0]
+        self.assertEqual((ground_row['booked'], ground_row['slots']), (2, 4))
+        self.assertFalse(SlotUtilisationRollup.objects.filter(date=self.day + timedelta(days=1)).exists())
+
+    def test_only_status_or_slot_changes_refresh_the_rollup(self):
+        slot = Slot.objects.get(ground=self.ground, date=self.day, start_time=time(9, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.create(
+                slot=slot, customer_name='Player', customer_phone='9000000001', total_amount=500, owner_payout=500,
+            )
+
+        with patch('bookings.signals.refresh_slot_day') as refresh, self.captureOnCommitCallbacks(execute=True):
+            booking.payment_status = 'PAID'
+            booking.save(update_fields=['payment_status'])
+            Booking.objects.get(id=booking.id).save()
+        refresh.assert_not_called()
+
+        other_day = Slot.objects.get(ground=self.ground, date=self.day + timedelta(days=1), start_time=time(9, 0))
+        with patch('bookings.signals.refresh_slot_day') as refresh, self.captureOnCommitCallbacks(execute=True):
+            booking.slot = other_day
+            booking.save(update_fields=['slot'])
+        self.assertEqual({call.args[0] for call in refresh.call_args_list}, {slot.id, other_day.id})
+
+        with patch('bookings.signals.refresh_slot_day') as refresh, self.captureOnCommitCallbacks(execute=True):
+            booking.status = 'CANCELLED'
+            booking.save(update_fields=['status'])
+        refresh.assert_called_once_with(other_day.id)
+
+
+class RazorpayReconciliationTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user(
+            email='reconowner@example.com',
+            phone_number='5666666666',
+            name='Recon Owner',
+            password='password123',
+            role='owner',
+            email_verified=True,
+        )
+        ground = Ground.objects.create(
+            name='Recon Arena', location='City', owner=owner,
+            day_price=500, night_price=900, opening_time=time(6, 0), closing_time=time(23, 0),
+        )
+        self.today = timezone.localdate()
+        self.bookings = {}
+        for hour, payment_id, mode, paid in ((9, 'pay_match', 'FULL', 500), (10, 'pay_short', 'FULL', 500), (11, 'pay_orphan', 'PARTIAL_99', 99)):
+            slot = Slot.objects.create(
+                ground=ground, date=self.today + timedelta(days=1),
+                start_time=time(hour, 0), end_time=time(hour + 1, 0), is_booked=True,
+            )
+            self.bookings[payment_id] = Booking.objects.create(
+                slot=slot, customer_name='Online', customer_phone='9000000020', total_amount=500,
+                owner_payout=500, booking_source='ONLINE', payment_mode=mode, payment_status='PAID',
+                paid_amount=paid, due_amount=500 - paid, razorpay_order_id=f'order_{payment_id}',
+                razorpay_payment_id=payment_id,
+            )
+            record_payment(f'order_{payment_id}', payment_id, 'CAPTURED', source='VERIFY', booking=self.bookings[payment_id])
+
+    def test_csv_report_classifies_matches_mismatches_and_orphans(self):
+        import csv as csv_module
+        import io
+        import os
+        import tempfile
+        from django.core.management import call_command
+
+        report = io.StringIO()
+        writer = csv_module.writer(report)
+        writer.writerow(['id', 'order_id', 'amount', 'status', 'created_at'])
+        created = self.today.strftime('%d/%m/%Y 10:00:00')
+        writer.writerow(['pay_match', 'order_pay_match', '500.00', 'captured', created])
+        writer.writerow(['pay_short', 'order_pay_short', '450.00', 'captured', created])
+        writer.writerow(['pay_unknown', 'order_unknown', '300.00', 'captured', created])
+        writer.writerow(['pay_failed', 'order_failed', '300.00', 'failed', created])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            report_path = os.path.join(tmp, 'payments.csv')
+            output_path = os.path.join(tmp, 'mismatches.csv')
+            with open(report_path, 'w', newline='') as handle:
+                handle.write(report.getvalue())
+            out = io.StringIO()
+            call_command('reconcile_razorpay', '--file', report_path, '--output', output_path, stdout=out)
+            with open(output_path, newline='') as handle:
+                mismatch_rows = list(csv_module.DictReader(handle))
+
+        self.assertIn('4 rows, 1 matched, 1 missing booking, 1 amount mismatch, 1 orphan booking, 1 skipped', out.getvalue())
+        results = {row['Payment ID']: row['Result'] for row in mismatch_rows}
+        self.assertEqual(results, {
+            'pay_short': 'AMOUNT_MISMATCH',
+            'pay_unknown': 'MISSING_BOOKING',
+            'pay_orphan': 'ORPHAN_BOOKING',
+        })
+
+    def test_json_reports_are_streamed_item_by_item(self):
+        from io import StringIO
+
+        from . import reconciliation
+        from .reconciliation import iter_report_rows
+
+        items = [
+            {'id': 'pay_1', 'amount': 50000, 'notes': {'text': 'a, b ] }'}},
+            {'id': 'pay_2', 'amount': 12345678, 'status': 'captured'},
+        ]
+        collection = json.dumps({'entity': 'collection', 'count': 2, 'items': items, 'has_more': False})
+        with patch.object(reconciliation, 'JSON_READ_SIZE', 7):
+            self.assertEqual(list(iter_report_rows(StringIO(collection), 'json')), items)
+            self.assertEqual(list(iter_report_rows(StringIO(json.dumps(items, indent=2)), 'json')), items)
+            self.assertEqual(list(iter_report_rows(StringIO(' [ ] '), 'json')), [])
+
+        with patch.object(reconciliation, 'MAX_JSON_ITEM_CHARS', 50), \
+                self.assertRaisesMessage(ValueError, 'export the report as JSON Lines'):
+            list(iter_report_rows(StringIO(json.dumps([{'id': 'pay_1', 'notes': 'x' * 100}])), 'json'))
+        with self.assertRaisesMessage(ValueError, 'Malformed JSON report'):
+            list(iter_report_rows(StringIO('[{"id": "pay_1"}'), 'json'))
+
+    def test_api_stub_pages_payments_in_paise(self):
+        from .reconciliation import iter_api_payments, reconcile_rows
+
+        class _StubPayments:
+            def __init__(self, items):
+                self.items = items
+                self.calls = []
+
+            def all(self, params):
+                self.calls.append(params)
+                return {'items': self.items[params['skip']:params['skip'] + params['count']]}
+
+        payments = _StubPayments([
+            {'id': 'pay_match', 'entity': 'payment', 'order_id': 'order_pay_match', 'amount': 50000, 'status': 'captured'},
+            {'id': 'pay_short', 'entity': 'payment', 'order_id': 'order_pay_short', 'amount': 50000, 'status': 'captured'},
+            {'id': 'pay_orphan', 'entity': 'payment', 'order_id': 'order_pay_orphan', 'amount': 9900, 'status': 'captured'},
+        ])
+        client = type('StubClient', (), {'payment': payments})()
+
+        run = reconcile_rows(
+            iter_api_payments(client, self.today, self.today, page_size=2),
+            source='API', amount_in_paise=True, window_start=self.today, window_end=self.today,
+        )
+
+        self.assertEqual(len(payments.calls), 2)
+        self.assertEqual((run.rows_read, run.matched_count, run.orphan_booking_count), (3, 3, 0))
+
+
+class RazorpayGatewayTests(TestCase):
+    """Runs the pooled client against a local fake Razorpay API."""
+
+    def setUp(self):
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        from .razorpay_gateway import reset_clients
+
+        hits = self.hits = []
+        # Successful fetches only answer once two requests are in flight together,
+        # so a client that fetches one after the other gets a 504 instead.
+        overlap = self.overlap = threading.Barrier(2, timeout=5)
+
+        class FakeRazorpay(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                hits.append(self.path)
+                if self.path.startswith('/v1/payments/pay_down'):
+                    status, body = 500, {'error': {'code': 'SERVER_ERROR', 'description': 'down'}}
+                else:
+                    try:
+                        overlap.wait()
+                    except threading.BrokenBarrierError:
+                        status, body = 504, {'error': {'code': 'GATEWAY_ERROR', 'description': 'not concurrent'}}
+                    else:
+                        entity_id = self.path.rsplit('/', 1)[-1]
+                        status, body = 200, {'id': entity_id, 'order_id': 'order_1', 'status': 'captured'}
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeRazorpay)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.addCleanup(reset_clients)
+        reset_clients()
+        self.settings_override = override_settings(
+            RAZORPAY_KEY_ID='rzp_test',
+            RAZORPAY_KEY_SECRET='secret',
+            RAZORPAY_BASE_URL=f'http://127.0.0.1:{self.server.server_address[1]}',
+            RAZORPAY_CIRCUIT_FAILURE_THRESHOLD=2,
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def test_client_is_shared_and_fetches_run_in_parallel(self):
+        from .razorpay_gateway import fetch_order_and_payment, get_client
+
+        client, key_id = get_client()
+        self.assertIs(get_client()[0], client)
+        self.assertEqual(key_id, 'rzp_test')
+
+        order, payment = fetch_order_and_payment(client, 'order_1', 'pay_1')
+
+        self.assertEqual((order['id'], payment['id']), ('order_1', 'pay_1'))
+        self.assertFalse(self.overlap.broken)
+        self.assertCountEqual(self.hits, ['/v1/orders/order_1', '/v1/payments/pay_1'])
+
+    def test_circuit_opens_after_consecutive_gateway_errors(self):
+        from .razorpay_gateway import CircuitOpenError, get_client
+
+        client, _ = get_client()
+        for _ in range(2):
+            with self.assertRaises(Exception):
+                client.payment.fetch('pay_down')
+        with self.assertRaises(CircuitOpenError):
+            client.payment.fetch('pay_down')
+        self.assertEqual(len(self.hits), 2)
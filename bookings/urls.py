@@ -20,11 +20,15 @@ urlpatterns = [
     path('payments/razorpay/verify-and-book/', views.verify_razorpay_payment_and_book, name='verify_razorpay_payment_and_book'),
     path('payments/razorpay/webhook/', views.razorpay_webhook, name='razorpay_webhook'),
     path('webhooks/whatsapp/', views.whatsapp_webhook, name='whatsapp_webhook'),
+    path('push/subscribe/', views.push_subscribe, name='push_subscribe'),
+    path('push/unsubscribe/', views.push_unsubscribe, name='push_unsubscribe'),
+    path('push-sw.js', views.push_service_worker, name='push_service_worker'),
     path('cancel/<uuid:booking_id>/', views.cancel_booking, name='cancel_booking'),
     path('reschedule/<uuid:booking_id>/', views.customer_reschedule_booking, name='customer_reschedule_booking'),
     path('my-bookings/', views.my_bookings),
 
     path('dashboard/owner/', views.owner_dashboard, name='owner_dashboard'),
+    path('dashboard/analytics/bookings/', views.booking_analytics, name='booking_analytics'),
     path('dashboard/owner/expenses/add/', views.owner_add_expense, name='owner_add_expense'),
     path('dashboard/owner/expenses/<int:expense_id>/delete/', views.owner_delete_expense, name='owner_delete_expense'),
     path('owner/grounds/<int:ground_id>/toggle/', views.toggle_ground_availability, name='toggle_ground_availability'),
@@ -46,6 +50,9 @@ urlpatterns = [
     path('dashboard/admin/invoices/mark-unpaid/', views.mark_invoice_unpaid, name='mark_invoice_unpaid'),
     path('dashboard/admin/invoices/export/', views.export_invoices_csv, name='export_invoices_csv'),
     path('dashboard/admin/invoices/export-bookings/', views.export_bookings_csv, name='export_bookings_csv'),
+    path('dashboard/admin/exports/', views.admin_queue_export_job, name='admin_queue_export_job'),
+    path('dashboard/admin/exports/<int:job_id>/status/', views.admin_export_job_status, name='admin_export_job_status'),
+    path('dashboard/admin/exports/<int:job_id>/download/', views.admin_export_job_download, name='admin_export_job_download'),
     path('dashboard/admin/invoices/pay/<int:invoice_id>/', views.pay_invoice, name='pay_invoice'),
     path('dashboard/admin/invoices/webhook/', views.stripe_webhook, name='stripe_webhook'),
     path('dashboard/admin/online-settlements/', views.admin_online_settlements, name='admin_online_settlements'),
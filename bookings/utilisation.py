@@ -0,0 +1,88 @@
+"""Occupancy rollups: how much generated slot inventory actually gets booked.
+
+`refresh_utilisation_rollup` recomputes a date range with one grouped query over
+Slot joined to active bookings. Dashboards read `SlotUtilisationRollup` only, so
+page views never scan the slot table. A booking whose status or slot changes
+refreshes its ground and day after commit; the `refresh_utilisation` cron run
+covers everything else (e.g. bulk slot generation).
+"""
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay
+
+from .models import Slot, SlotUtilisationRollup
+
+
+def refresh_utilisation_rollup(*, start_date, end_date, grounds=None):
+    """Rebuild rollup rows for the range; returns the number of buckets written."""
+    slots = Slot.objects.filter(date__gte=start_date, date__lte=end_date)
+    if grounds is not None:
+        slots = slots.filter(ground__in=grounds)
+
+    rows = (
+        slots
+        .annotate(hour=ExtractHour('start_time'), weekday=ExtractIsoWeekDay('date'))
+        .values('ground_id', 'date', 'hour', 'weekday')
+        .annotate(
+            slot_count=Count('id', distinct=True),
+            booked_count=Count('id', filter=Q(booking__status='BOOKED'), distinct=True),
+        )
+        .order_by()
+    )
+    buckets = [
+        SlotUtilisationRollup(
+            ground_id=row['ground_id'],
+            date=row['date'],
+            hour=row['hour'],
+            weekday=row['weekday'],
+            slot_count=row['slot_count'],
+            booked_count=row['booked_count'],
+        )
+        for row in rows
+    ]
+
+    stale = SlotUtilisationRollup.objects.filter(date__gte=start_date, date__lte=end_date)
+    if grounds is not None:
+        stale = stale.filter(ground__in=grounds)
+    with transaction.atomic():
+        stale.delete()
+        SlotUtilisationRollup.objects.bulk_create(buckets, batch_size=1000)
+    return len(buckets)
+
+
+def refresh_slot_day(slot_id):
+    """Rebuild the rollup for the ground and day of one slot."""
+    slot = Slot.objects.filter(id=slot_id).values('ground_id', 'date').first()
+    if slot is None:
+        return 0
+    return refresh_utilisation_rollup(start_date=slot['date'], end_date=slot['date'], grounds=[slot['ground_id']])
+
+
+def _occupancy_rows(dimension, *, start_date, end_date, grounds=None):
+    qs = SlotUtilisationRollup.objects.filter(date__gte=start_date, date__lte=end_date)
+    if grounds is not None:
+        qs = qs.filter(ground__in=grounds)
+    rows = list(
+        qs.values(*dimension)
+        .annotate(slots=Sum('slot_count'), booked=Sum('booked_count'))
+        .order_by(*dimension)
+    )
+    for row in rows:
+        row['slots'] = int(row['slots'] or 0)
+        row['booked'] = int(row['booked'] or 0)
+        row['idle'] = row['slots'] - row['booked']
+        row['occupancy'] = round(row['booked'] * 100 / row['slots'], 1) if row['slots'] else 0.0
+    return rows
+
+
+def occupancy_by_ground(**kwargs):
+    return _occupancy_rows(('ground_id', 'ground__name'), **kwargs)
+
+
+def occupancy_by_hour(**kwargs):
+    return _occupancy_rows(('hour',), **kwargs)
+
+
+def occupancy_by_weekday(**kwargs):
+    return _occupancy_rows(('weekday',), **kwargs)
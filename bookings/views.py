@@ -16,8 +16,6 @@ from django.db.models.functions import Coalesce
 import time
 from django.core.mail import send_mail
 from django.conf import settings
-import csv
-import io
 import json
 import uuid
 from decimal import Decimal
@@ -31,20 +29,48 @@ try:
 except Exception:
     stripe = None
 
-try:
-    import razorpay
-except Exception:
-    razorpay = None
-
-from .models import Ground, Slot, Booking, ActivityLog, OwnerExpense, BookingAttendance, AlertSubscription, RewardTransaction, AlertDispatchLog, SettlementRefund, InvoiceLineItem, GroundInvoice, OnlineSettlement, OnlineSettlementLineItem
+from .models import Ground, Slot, Booking, ActivityLog, OwnerExpense, BookingAttendance, AlertSubscription, RewardTransaction, AlertDispatchLog, SettlementRefund, InvoiceLineItem, GroundInvoice, OnlineSettlement, OnlineSettlementLineItem, ExportJob, PushSubscription, SlotWaitlistEntry
 from .money import ground_collected_amount_expression, online_collected_amount_expression
+from .analytics import GRANULARITIES, booking_time_series
+from .utilisation import occupancy_by_ground, occupancy_by_hour
+from .public_cache import cached_active_grounds, cached_ground_list, cached_slot_search, cached_tournament_list
+from .exports import (
+    BOOKING_EXPORT_HEADER,
+    INVOICE_EXPORT_HEADER,
+    booking_export_queryset,
+    booking_export_row,
+    invoice_export_queryset,
+    invoice_export_row,
+    streaming_csv_response,
+)
+from .export_jobs import export_file_response, queue_export_job
+from .invoicing import generate_invoices, invoice_ground
+from .settlements import generate_online_settlements, preview_online_settlements
+from .payments import RAZORPAY_STATUS_MAP, find_attempt, find_reusable_order, record_order, record_payment
+from .razorpay_gateway import fetch_order_and_payment, get_client as get_razorpay_client
+from .webhooks import ingest_event, payload_digest
+from .digests import owner_uses_digest, record_owner_event
+from .push import is_allowed_endpoint, notify_users as notify_push_users, push_configured
+from .price_drops import PEAK_END, PEAK_START, PRICE_DROP_WINDOW_MINUTES
+from .waitlist import (
+    claim_waitlist_hold,
+    held_for_someone_else,
+    join_waitlist,
+    leave_waitlist,
+    offer_freed_slots,
+    send_waitlist_offers,
+)
 from grounds.forms import TournamentForm, TournamentRegistrationForm, GroundReviewForm
 from grounds.models import Tournament, TournamentRegistration, GroundReview
 from .slot_generation import ensure_slots_for_ground_date, ensure_next_month_slots_for_ground
 from .rewards import award_booking_rewards, award_tournament_registration_rewards, redeem_free_booking_credit
 from .whatsapp import send_owner_booking_update
+from config.db_routing import read_only
 import os
 from django.http import FileResponse, Http404
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from grounds import images as ground_images
 from django.conf import settings as djsettings
 
 logger = logging.getLogger(__name__)
@@ -86,7 +112,7 @@ def _slot_price(ground, slot_time):
 
 
 def _is_peak_discount_blocked(slot_time):
-    return 17 <= slot_time.hour < 21
+    return PEAK_START <= slot_time < PEAK_END
 
 
 def _slot_discount(slot):
@@ -95,7 +121,7 @@ def _slot_discount(slot):
     if not slot.ground.last_minute_price_drop_enabled:
         return 0
     minutes_to_start = (_slot_start_datetime(slot) - timezone.localtime(timezone.now())).total_seconds() / 60
-    if 0 < minutes_to_start <= 10 and not _is_peak_discount_blocked(slot.start_time):
+    if 0 < minutes_to_start <= PRICE_DROP_WINDOW_MINUTES and not _is_peak_discount_blocked(slot.start_time):
         base_price = _slot_price(slot.ground, slot.start_time)
         return 51 if base_price < 700 else 101
     return 0
@@ -116,14 +142,6 @@ def _payment_amounts(total_amount, payment_mode):
     return total_amount, 0, 'FULL'
 
 
-def _online_collected_amount_for_booking(booking):
-    if booking.booking_source != 'ONLINE':
-        return Decimal('0.00')
-    if booking.payment_mode == 'PARTIAL_99' and booking.paid_amount > 0:
-        return Decimal('99.00')
-    return Decimal(str(booking.paid_amount or 0)).quantize(Decimal('0.01'))
-
-
 def _finance_tracking_rows(grounds, start_date, end_date):
     ground_list = list(grounds)
     ground_ids = [ground.id for ground in ground_list]
@@ -226,6 +244,9 @@ def _owner_booking_email(booking, *, event='BOOKING_CREATED'):
     owner = booking.slot.ground.owner if booking.slot and booking.slot.ground else None
     if not owner or not owner.email:
         return
+    if owner_uses_digest(owner, event):
+        record_owner_event(owner, booking, event)
+        return
 
     payment_time = timezone.localtime(booking.payment_paid_at).strftime('%Y-%m-%d %I:%M %p') if booking.payment_paid_at else '-'
     todays_bookings = (
@@ -327,6 +348,10 @@ def _booking_notification_recipients(booking):
 
 def _send_booking_cancelled_email(booking, *, cancelled_count=1):
     recipients = _booking_notification_recipients(booking)
+    owner = booking.slot.ground.owner
+    if owner and owner.email in recipients and owner_uses_digest(owner, 'BOOKING_CANCELLED'):
+        record_owner_event(owner, booking, 'BOOKING_CANCELLED')
+        recipients.remove(owner.email)
     if not recipients:
         return
 
@@ -367,7 +392,7 @@ def _cancel_booking_series_from(booking):
         affected = [booking]
 
     if not affected:
-        return [booking]
+        return [booking], set()
 
     with transaction.atomic():
         locked_bookings = list(
@@ -385,9 +410,33 @@ def _cancel_booking_series_from(booking):
             slot = locked_slots.get(item.slot_id)
             if slot and slot.is_booked:
                 slot.is_booked = False
-                slot.save(update_fields=['is_booked'])
+                slot.held_for = None
+                slot.hold_expires_at = None
+                slot.save(update_fields=['is_booked', 'held_for', 'hold_expires_at'])
+        offers = offer_freed_slots(locked_slots.values())
+        if offers:
+            transaction.on_commit(lambda entry_ids=[entry.id for entry in offers]: _queue_waitlist_offers(entry_ids))
+
+    return affected, {(entry.ground_id, entry.date, entry.start_time) for entry in offers}
+
+
+def _send_waitlist_offers(entry_ids):
+    from django.db import close_old_connections
+
+    close_old_connections()
+    try:
+        send_waitlist_offers(entry_ids)
+    except Exception:
+        logger.exception('Waitlist offer notifications failed entries=%s', entry_ids)
+    finally:
+        close_old_connections()
 
-    return affected
+
+def _queue_waitlist_offers(entry_ids):
+    try:
+        _notification_executor.submit(_send_waitlist_offers, entry_ids)
+    except RuntimeError:
+        logger.exception('Could not queue waitlist offers entries=%s', entry_ids)
 
 
 @login_required
@@ -415,11 +464,7 @@ def toggle_ground_availability(request, ground_id):
 
 
 def _razorpay_client():
-    key_id = getattr(settings, 'RAZORPAY_KEY_ID', None)
-    key_secret = getattr(settings, 'RAZORPAY_KEY_SECRET', None)
-    if not key_id or not key_secret or razorpay is None:
-        return None, key_id
-    return razorpay.Client(auth=(key_id, key_secret)), key_id
+    return get_razorpay_client()
 
 
 def _operating_window_for_date(ground, target_date):
@@ -470,22 +515,78 @@ def _send_email(subject, body, recipients):
         logger.exception("Failed to send email subject=%s recipients=%s", subject, recipients)
 
 
+def _send_push_alert(user_ids, payload, ttl):
+    from django.db import close_old_connections
+
+    close_old_connections()
+    try:
+        notify_push_users(user_ids, payload, ttl=ttl)
+    except Exception:
+        logger.exception('Push alert fan-out failed tag=%s', payload.get('tag'))
+    finally:
+        close_old_connections()
+
+
+def _queue_push_alert(user_ids, payload, *, ttl):
+    """Fan out Web Push after commit, off the request thread."""
+    if not push_configured():
+        return
+
+    def _submit():
+        try:
+            _notification_executor.submit(_send_push_alert, user_ids, payload, ttl)
+        except RuntimeError:
+            logger.exception('Could not queue push alert tag=%s', payload.get('tag'))
+
+    transaction.on_commit(_submit)
+
+
+def _send_alert_emails(subject, body, recipients):
+    from django.db import close_old_connections
+
+    close_old_connections()
+    try:
+        for recipient in recipients:
+            _send_email(subject, body, [recipient])
+    finally:
+        close_old_connections()
+
+
+def _queue_alert_emails(subject, body, recipients):
+    """Send one alert email per recipient after commit, off the calling thread.
+
+    Alerts are dispatched while slot rows are locked (see price_drops), so SMTP
+    round-trips must not happen inside that transaction.
+    """
+    if not recipients:
+        return
+
+    def _submit():
+        try:
+            _notification_executor.submit(_send_alert_emails, subject, body, recipients)
+        except RuntimeError:
+            logger.exception('Could not queue alert emails subject=%s', subject)
+
+    transaction.on_commit(_submit)
+
+
 def _dispatch_ground_alerts(ground, slot=None, reason='PRICE_DROP'):
+    """Alert the ground's subscribers; returns True when an alert went out."""
     if not _promo_email_allowed_now():
-        return
+        return False
     alert_date = slot.date if slot else timezone.localdate()
     if AlertDispatchLog.objects.filter(ground=ground, reason=reason, alert_date=alert_date).exists():
-        return
+        return False
     if slot and not _is_evening_alert_slot(slot):
-        return
-    subscribers = AlertSubscription.objects.filter(ground=ground, email_enabled=True)
+        return False
+    subscribers = AlertSubscription.objects.filter(Q(email_enabled=True) | Q(push_enabled=True), ground=ground)
     if reason == 'PRICE_DROP':
         subscribers = subscribers.filter(notify_price_drops=True)
     else:
         subscribers = subscribers.filter(notify_last_minute=True)
     subscribers = subscribers.select_related('user')
     if not subscribers.exists():
-        return
+        return False
 
     if reason == 'PRICE_DROP' and slot:
         subject = f'Last-minute price drop at {ground.name}'
@@ -502,9 +603,19 @@ def _dispatch_ground_alerts(ground, slot=None, reason='PRICE_DROP'):
             f"Check availability and book quickly."
         )
 
+    emails, push_user_ids = [], []
     for subscription in subscribers:
-        _send_email(subject, body, [subscription.user.email])
+        if subscription.email_enabled:
+            emails.append(subscription.user.email)
+        if subscription.push_enabled:
+            push_user_ids.append(subscription.user_id)
     AlertDispatchLog.objects.create(ground=ground, reason=reason, alert_date=alert_date)
+    _queue_alert_emails(subject, body, emails)
+    if push_user_ids:
+        url = f'/grounds/{ground.id}/?date={alert_date.isoformat()}'
+        # A last-minute price only lasts until the slot starts, so the push expires with it.
+        _queue_push_alert(push_user_ids, {'title': subject, 'body': body.split('\n', 1)[0], 'url': url, 'tag': f'{reason}-{ground.id}'}, ttl=getattr(settings, 'PUSH_TTL_SECONDS', 600))
+    return True
 
 
 def _dispatch_tournament_alerts(tournament):
@@ -514,8 +625,8 @@ def _dispatch_tournament_alerts(tournament):
     if AlertDispatchLog.objects.filter(tournament=tournament, reason='TOURNAMENT_PUBLISHED', alert_date=alert_date).exists():
         return
     subscriptions = AlertSubscription.objects.filter(
+        Q(email_enabled=True) | Q(push_enabled=True),
         notify_nearby_tournaments=True,
-        email_enabled=True,
     ).select_related('user')
     if not subscriptions.exists():
         return
@@ -527,9 +638,16 @@ def _dispatch_tournament_alerts(tournament):
         f"Date: {tournament.start_date}\n"
         f"Contact: {tournament.contact_phone or '-'}"
     )
+    emails, push_user_ids = [], []
     for subscription in subscriptions:
-        _send_email(subject, body, [subscription.user.email])
+        if subscription.email_enabled:
+            emails.append(subscription.user.email)
+        if subscription.push_enabled:
+            push_user_ids.append(subscription.user_id)
     AlertDispatchLog.objects.create(tournament=tournament, reason='TOURNAMENT_PUBLISHED', alert_date=alert_date)
+    _queue_alert_emails(subject, body, emails)
+    if push_user_ids:
+        _queue_push_alert(push_user_ids, {'title': subject, 'body': body.split('\n', 1)[0], 'url': '/tournaments/', 'tag': f'tournament-{tournament.id}'}, ttl=getattr(settings, 'PUSH_TOURNAMENT_TTL_SECONDS', 86400))
 
 
 def _weekly_start():
@@ -538,43 +656,35 @@ def _weekly_start():
 
 
 def ground_image(request, ground_id):
-    # Serve a ground image from the project `groundsimages` folder if available.
-    try:
-        ground = Ground.objects.get(id=ground_id)
-    except Ground.DoesNotExist:
-        raise Http404()
+    """Serve a ground image variant (`?size=thumb|card`, default the original) with HTTP caching.
 
-    # If ground.image is set and looks like a URL/path, try to serve it directly
-    if ground.image:
-        # If it's an absolute filesystem path, serve it
-        if os.path.isabs(ground.image) and os.path.exists(ground.image):
-            return FileResponse(open(ground.image, 'rb'))
-        # If it looks like a relative static path (starts with / or without scheme), try to serve from BASE_DIR
-        rel_path = os.path.join(djsettings.BASE_DIR, ground.image.lstrip('/'))
-        if os.path.exists(rel_path):
-            return FileResponse(open(rel_path, 'rb'))
-
-    # Special-case: look in project `groundsimages` directory for a matching file
-    images_dir = os.path.join(djsettings.BASE_DIR, 'groundsimages')
-    if os.path.isdir(images_dir):
-        # Try exact filename mapping for known grounds
-        special_map = {
-            'Simpliz Turf': 'simplisturf.webp',
-        }
-        fname = special_map.get(ground.name)
-        if fname:
-            full = os.path.join(images_dir, fname)
-            if os.path.exists(full):
-                return FileResponse(open(full, 'rb'))
-
-        # fallback: try any file in the folder that contains the ground name (normalized)
-        norm = ''.join(ch for ch in ground.name.lower() if ch.isalnum())
-        for f in os.listdir(images_dir):
-            if norm in ''.join(ch for ch in f.lower() if ch.isalnum()):
-                return FileResponse(open(os.path.join(images_dir, f), 'rb'))
+    WebP is sent to browsers that accept it, JPEG otherwise.
+    """
+    ground = Ground.objects.filter(id=ground_id).values('name', 'image').first()
+    if ground is None:
+        raise Http404()
+    source = ground_images.resolve_source(ground_id, ground['name'], ground['image'])
+    if source is None:
+        raise Http404()
 
-    # Not found
-    raise Http404()
+    path, content_type = source, None
+    size = request.GET.get('size')
+    if size in ground_images.GROUND_IMAGE_SIZES:
+        fmt = 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'jpeg'
+        variant = ground_images.get_variant(ground_id, source, size, fmt)
+        if variant:
+            path, content_type = variant, ground_images.content_type_for(fmt)
+
+    stat = os.stat(path)
+    etag = f'"{ground_id}-{size or "original"}-{os.path.basename(path)}-{int(stat.st_mtime)}-{stat.st_size}"'
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response['Last-Modified'] = http_date(stat.st_mtime)
+    response['ETag'] = etag
+    response['Cache-Control'] = f"public, max-age={getattr(djsettings, 'GROUND_IMAGE_MAX_AGE', 604800)}"
+    patch_vary_headers(response, ('Accept',))
+    return response
 
 
 @login_required
@@ -651,11 +761,10 @@ def home(request):
 
 @login_required
 def ground_list(request):
-    grounds = Ground.objects.filter(is_active=True).select_related('owner').annotate(
-        review_count=Count('reviews', distinct=True),
-    )
+    grounds = cached_ground_list(lambda: list(Ground.objects.filter(is_active=True)))
+    share_base = request.build_absolute_uri('/grounds/')
     for ground in grounds:
-        ground.share_url = request.build_absolute_uri(f'/grounds/{ground.id}/')
+        ground.share_url = f'{share_base}{ground.id}/'
     return render(request, 'grounds/ground_list.html', {
         'grounds': grounds
     })
@@ -673,14 +782,15 @@ def dashboard_redirect(request):
 @login_required
 def tournament_list(request):
     today = timezone.localdate()
-    tournaments = (
+    tournaments = cached_tournament_list(today, lambda: list(
         Tournament.objects
         .filter(is_published=True, status__in=['UPCOMING', 'ONGOING'], end_date__gte=today)
-        .select_related('ground', 'ground__owner')
+        .select_related('ground')
         .order_by('start_date', 'start_time', 'title')
-    )
+    ))
+    share_base = request.build_absolute_uri('/tournaments/')
     for tournament in tournaments:
-        tournament.share_url = request.build_absolute_uri(f'/tournaments/{tournament.id}/register/')
+        tournament.share_url = f'{share_base}{tournament.id}/register/'
     return render(request, 'tournaments/tournament_list.html', {
         'tournaments': tournaments,
     })
@@ -726,6 +836,17 @@ def ground_slots(request, ground_id):
             subscription.save()
             messages.success(request, 'Alert preferences updated for this ground.')
             return redirect(f'/grounds/{ground.id}/?date={(request.POST.get("date") or timezone.localdate().isoformat())}')
+        if action in {'waitlist_join', 'waitlist_leave'}:
+            slot = get_object_or_404(Slot, id=request.POST.get('slot_id'), ground=ground)
+            if action == 'waitlist_leave':
+                leave_waitlist(request.user, slot)
+                messages.success(request, 'You have left the waitlist for this slot.')
+            elif not slot.is_booked or _slot_start_datetime(slot) <= timezone.localtime(timezone.now()):
+                messages.error(request, 'You can only join the waitlist for an upcoming booked slot.')
+            else:
+                join_waitlist(request.user, slot)
+                messages.success(request, "You're on the waitlist. We'll hold the slot for you if it frees up.")
+            return redirect(f'/grounds/{ground.id}/?date={slot.date.isoformat()}')
     # date navigation: ?date=YYYY-MM-DD
     date_str = request.GET.get('date')
     try:
@@ -752,6 +873,17 @@ def ground_slots(request, ground_id):
         ).select_related('user', 'slot')
     }
 
+    waitlisted_slot_keys = set()
+    if request.user.is_authenticated:
+        waitlisted_slot_keys = set(
+            SlotWaitlistEntry.objects.filter(
+                user=request.user,
+                ground=ground,
+                date__in=_slot_dates_for_operating_date(ground, selected_date),
+                status='WAITING',
+            ).values_list('date', 'start_time')
+        )
+
     visible_slots = []
     now_dt = timezone.localtime(timezone.now())
     today = timezone.localdate()
@@ -791,6 +923,8 @@ def ground_slots(request, ground_id):
             'user_booking': user_booking,
             'can_cancel': can_cancel,
             'cancel_no_refund': cancel_no_refund,
+            'on_waitlist': (slot.date, slot.start_time) in waitlisted_slot_keys,
+            'held_for_other': request.user.is_authenticated and held_for_someone_else(slot, request.user, now_dt),
         })
 
     prev_date = selected_date - timezone.timedelta(days=1)
@@ -888,43 +1022,16 @@ def get_active_grounds(request):
     if request.method != 'GET':
         return JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
     
-    grounds = Ground.objects.filter(is_active=True).order_by('name').values('id', 'name', 'location')
+    grounds = cached_active_grounds(
+        lambda: list(Ground.objects.filter(is_active=True).order_by('name').values('id', 'name', 'location'))
+    )
     return JsonResponse({
         'success': True,
-        'grounds': list(grounds)
+        'grounds': grounds
     })
 
 
-def search_public_slots(request):
-    """
-    Public API endpoint to search for available slots without authentication.
-    Used on login page to show users available slots before they login.
-    
-    Query params:
-    - date: YYYY-MM-DD format
-    - ground_id: optional ground UUID to filter results to single ground
-    
-    Returns JSON with available slots across active grounds (or single ground if specified).
-    """
-    if request.method != 'GET':
-        return JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
-    
-    date_str = request.GET.get('date', '')
-    ground_id = request.GET.get('ground_id', '')
-    try:
-        search_date = timezone.datetime.strptime(date_str, '%Y-%m-%d').date()
-    except (ValueError, TypeError):
-        return JsonResponse({'success': False, 'error': 'Invalid date format. Use YYYY-MM-DD'}, status=400)
-    
-    # Only allow searching for today or future dates
-    today = timezone.localdate()
-    if search_date < today:
-        return JsonResponse({'success': False, 'error': 'Cannot search for past dates'}, status=400)
-    
-    # Limit search to next 60 days
-    if (search_date - today).days > 60:
-        return JsonResponse({'success': False, 'error': 'Search limited to next 60 days'}, status=400)
-    
+def _public_slot_search_results(search_date, ground_id):
     # Get active grounds (filtered by ground_id if provided)
     grounds_qs = Ground.objects.filter(is_active=True).order_by('name')
     if ground_id:
@@ -979,7 +1086,48 @@ def search_public_slots(request):
                 'discount': discount,
                 'day_of_week': slot.date.strftime('%a'),
             })
+    return results
+
+
+def search_public_slots(request):
+    """
+    Public API endpoint to search for available slots without authentication.
+    Used on login page to show users available slots before they login.
+    
+    Query params:
+    - date: YYYY-MM-DD format
+    - ground_id: optional ground id to filter results to single ground
+    
+    Returns JSON with available slots across active grounds (or single ground if specified).
+    Results are cached per date/ground and keyed by availability and ground versions.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
     
+    date_str = request.GET.get('date', '')
+    ground_id = request.GET.get('ground_id', '')
+    try:
+        search_date = timezone.datetime.strptime(date_str, '%Y-%m-%d').date()
+    except (ValueError, TypeError):
+        return JsonResponse({'success': False, 'error': 'Invalid date format. Use YYYY-MM-DD'}, status=400)
+    
+    # Only allow searching for today or future dates
+    today = timezone.localdate()
+    if search_date < today:
+        return JsonResponse({'success': False, 'error': 'Cannot search for past dates'}, status=400)
+    
+    # Limit search to next 60 days
+    if (search_date - today).days > 60:
+        return JsonResponse({'success': False, 'error': 'Search limited to next 60 days'}, status=400)
+    if ground_id and not ground_id.isdigit():
+        return JsonResponse({'success': False, 'error': 'Invalid ground_id'}, status=400)
+    
+    results = cached_slot_search(
+        search_date,
+        ground_id,
+        lambda: _public_slot_search_results(search_date, ground_id),
+    )
+
     return JsonResponse({
         'success': True,
         'date': search_date.isoformat(),
@@ -1010,6 +1158,8 @@ def create_razorpay_order(request):
 
     if slot.is_booked or Booking.objects.filter(slot=slot, status='BOOKED').exists():
         return JsonResponse({'success': False, 'error': 'Slot is already booked'}, status=409)
+    if held_for_someone_else(slot, request.user):
+        return JsonResponse({'success': False, 'error': 'Slot is being held for a waitlisted player. Please try again shortly.'}, status=409)
 
     existing_bookings = Booking.objects.filter(
         user=request.user,
@@ -1034,6 +1184,8 @@ def create_razorpay_order(request):
                 return JsonResponse({'success': False, 'error': 'Free booking credits can only be redeemed for morning slots.'}, status=400)
             if slot.is_booked or Booking.objects.filter(slot=slot, status='BOOKED').exists():
                 return JsonResponse({'success': False, 'error': 'Slot is already booked'}, status=409)
+            if held_for_someone_else(slot, user):
+                return JsonResponse({'success': False, 'error': 'Slot is being held for a waitlisted player. Please try again shortly.'}, status=409)
             total_amount = _slot_price_for_slot(slot)
             booking = Booking.objects.create(
                 user=user,
@@ -1051,8 +1203,9 @@ def create_razorpay_order(request):
                 reward_discount_amount=total_amount,
                 loyalty_reward_redeemed=True,
             )
+            claim_waitlist_hold(slot, user)
             slot.is_booked = True
-            slot.save(update_fields=['is_booked'])
+            slot.save(update_fields=['is_booked', 'held_for', 'hold_expires_at'])
             redeem_free_booking_credit(user, booking)
             award_booking_rewards(booking)
             ActivityLog.objects.create(user=user, action='BOOKED', booking=booking, slot=slot, meta={'reward': 'FREE_REWARD'})
@@ -1073,6 +1226,8 @@ def create_razorpay_order(request):
             slot = Slot.objects.select_for_update().select_related('ground').get(id=slot_id, ground__is_active=True)
             if slot.is_booked or Booking.objects.filter(slot=slot, status='BOOKED').exists():
                 return JsonResponse({'success': False, 'error': 'Slot is already booked'}, status=409)
+            if held_for_someone_else(slot, request.user):
+                return JsonResponse({'success': False, 'error': 'Slot is being held for a waitlisted player. Please try again shortly.'}, status=409)
 
             total_amount = _slot_price_for_slot(slot)
             booking = Booking.objects.create(
@@ -1091,8 +1246,9 @@ def create_razorpay_order(request):
                 reward_discount_amount=total_amount,
             )
 
+            claim_waitlist_hold(slot, request.user)
             slot.is_booked = True
-            slot.save(update_fields=['is_booked'])
+            slot.save(update_fields=['is_booked', 'held_for', 'hold_expires_at'])
 
             ActivityLog.objects.create(
                 user=request.user,
@@ -1116,34 +1272,48 @@ def create_razorpay_order(request):
     if not client or not key_id:
         return JsonResponse({'success': False, 'error': 'Razorpay is not configured on server'}, status=500)
 
-    try:
-        order = client.order.create({
-            'amount': pay_now_amount * 100,
-            'currency': 'INR',
-            'payment_capture': 1,
-            'notes': {
-                'slot_id': str(slot.id),
-                'user_id': str(request.user.id),
-                'payment_mode': resolved_mode,
-            }
-        })
-    except Exception as exc:
-        logger.exception(
-            'Failed to create Razorpay order for slot=%s user=%s',
-            slot.id,
-            request.user.id,
+    # Re-opening checkout for the same slot, mode and amount reuses the pending order.
+    attempt = find_reusable_order(user=request.user, slot=slot, payment_mode=resolved_mode, amount=pay_now_amount)
+    if attempt is not None:
+        order_id = attempt.razorpay_order_id
+    else:
+        try:
+            order = client.order.create({
+                'amount': pay_now_amount * 100,
+                'currency': 'INR',
+                'payment_capture': 1,
+                'notes': {
+                    'slot_id': str(slot.id),
+                    'user_id': str(request.user.id),
+                    'payment_mode': resolved_mode,
+                }
+            })
+        except Exception as exc:
+            logger.exception(
+                'Failed to create Razorpay order for slot=%s user=%s',
+                slot.id,
+                request.user.id,
+            )
+            if settings.DEBUG:
+                return JsonResponse({
+                    'success': False,
+                    'error': f'Unable to initialize payment right now: {exc.__class__.__name__}',
+                    'details': str(exc),
+                }, status=500)
+            return JsonResponse({'success': False, 'error': 'Unable to initialize payment right now'}, status=500)
+
+        order_id = order.get('id')
+        record_order(
+            order_id,
+            user=request.user,
+            slot=slot,
+            amount=pay_now_amount,
+            payment_mode=resolved_mode,
         )
-        if settings.DEBUG:
-            return JsonResponse({
-                'success': False,
-                'error': f'Unable to initialize payment right now: {exc.__class__.__name__}',
-                'details': str(exc),
-            }, status=500)
-        return JsonResponse({'success': False, 'error': 'Unable to initialize payment right now'}, status=500)
 
     return JsonResponse({
         'success': True,
-        'order_id': order.get('id'),
+        'order_id': order_id,
         'key_id': key_id,
         'slot_id': slot.id,
         'payment_mode': resolved_mode,
@@ -1191,8 +1361,7 @@ def verify_razorpay_payment_and_book(request):
             'razorpay_payment_id': razorpay_payment_id,
             'razorpay_signature': razorpay_signature,
         })
-        order = client.order.fetch(razorpay_order_id)
-        payment = client.payment.fetch(razorpay_payment_id)
+        order, payment = fetch_order_and_payment(client, razorpay_order_id, razorpay_payment_id)
     except Exception:
         return JsonResponse({'success': False, 'error': 'Payment verification failed'}, status=400)
 
@@ -1206,6 +1375,17 @@ def verify_razorpay_payment_and_book(request):
     if str(order_notes.get('user_id')) != str(request.user.id):
         return JsonResponse({'success': False, 'error': 'User mismatch for payment'}, status=400)
 
+    # A retried checkout callback for a payment that already produced a booking.
+    payment_attempt = find_attempt(payment_id=razorpay_payment_id)
+    paid_booking = payment_attempt.booking if payment_attempt else None
+    if paid_booking and paid_booking.user_id == request.user.id and paid_booking.status == 'BOOKED':
+        return JsonResponse({
+            'success': True,
+            'booking_id': str(paid_booking.id),
+            'redirect_url': '/my-bookings/',
+            'message': 'Booking confirmed. Amount paid is non-refundable.',
+        })
+
     attempts = 3
     for attempt in range(attempts):
         try:
@@ -1213,6 +1393,8 @@ def verify_razorpay_payment_and_book(request):
                 slot = Slot.objects.select_for_update().select_related('ground').get(id=slot_id, ground__is_active=True)
                 if slot.is_booked or Booking.objects.filter(slot=slot, status='BOOKED').exists():
                     return JsonResponse({'success': False, 'error': 'Slot was booked by someone else. Payment is non-refundable; contact support.'}, status=409)
+                if held_for_someone_else(slot, request.user):
+                    return JsonResponse({'success': False, 'error': 'Slot is being held for a waitlisted player. Payment is non-refundable; contact support.'}, status=409)
 
                 if _slot_start_datetime(slot) <= timezone.localtime(timezone.now()):
                     return JsonResponse({'success': False, 'error': 'Slot has already started'}, status=400)
@@ -1252,8 +1434,17 @@ def verify_razorpay_payment_and_book(request):
                     razorpay_signature=razorpay_signature,
                 )
 
+                record_payment(
+                    razorpay_order_id,
+                    razorpay_payment_id,
+                    RAZORPAY_STATUS_MAP.get(payment.get('status'), 'CAPTURED'),
+                    source='VERIFY',
+                    booking=booking,
+                )
+
+                claim_waitlist_hold(slot, request.user)
                 slot.is_booked = True
-                slot.save(update_fields=['is_booked'])
+                slot.save(update_fields=['is_booked', 'held_for', 'hold_expires_at'])
 
                 ActivityLog.objects.create(
                     user=request.user,
@@ -1310,6 +1501,7 @@ def my_bookings(request):
 
 
 @login_required
+@read_only()
 def owner_dashboard(request):
     owner = request.user
     grounds = Ground.objects.filter(owner=owner).select_related('owner')
@@ -1452,6 +1644,9 @@ def owner_dashboard(request):
         .order_by('-revenue', '-bookings_count')[:5]
     )
 
+    ground_occupancy = occupancy_by_ground(start_date=period_start, end_date=period_end, grounds=grounds)
+    hour_occupancy = occupancy_by_hour(start_date=period_start, end_date=period_end, grounds=grounds)
+
     selected_grounds = grounds.values('id', 'name').order_by('name')
     owner_ground_objects = grounds.order_by('name')
     recent_expenses = OwnerExpense.objects.filter(owner=owner).select_related('ground').order_by('-spent_on', '-created_at')[:12]
@@ -1499,6 +1694,8 @@ def owner_dashboard(request):
         'report_month_options': [(idx, month_name[idx]) for idx in range(1, 13)],
         'report_year_options': list(range(today.year - 3, today.year + 1)),
         'ground_performance': ground_performance,
+        'ground_occupancy': ground_occupancy,
+        'hour_occupancy': hour_occupancy,
         'filtered_bookings': filtered_bookings,
         'selected_date': selected_date,
         'bookings_title': bookings_title,
@@ -1513,6 +1710,58 @@ def owner_dashboard(request):
     return render(request, 'dashboard/owner_dashboard.html', context)
 
 
+ANALYTICS_MAX_BUCKETS = 400
+
+
+@login_required
+@read_only()
+def booking_analytics(request):
+    """JSON time series for owner/admin charts; owners only ever see their own grounds."""
+    if request.user.role not in {'owner', 'admin'}:
+        return JsonResponse({'success': False, 'error': 'Permission denied'}, status=403)
+
+    granularity = request.GET.get('granularity') or 'day'
+    if granularity not in GRANULARITIES:
+        return JsonResponse({'success': False, 'error': 'Granularity must be day, week or month'}, status=400)
+
+    today = timezone.localdate()
+    try:
+        end_date = datetime.strptime(request.GET['end'], '%Y-%m-%d').date() if request.GET.get('end') else today
+        start_date = (
+            datetime.strptime(request.GET['start'], '%Y-%m-%d').date()
+            if request.GET.get('start') else end_date - timedelta(days=29)
+        )
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid date format. Use YYYY-MM-DD'}, status=400)
+    if start_date > end_date:
+        return JsonResponse({'success': False, 'error': 'start must be on or before end'}, status=400)
+
+    bucket_days = {'day': 1, 'week': 7, 'month': 28}[granularity]
+    if (end_date - start_date).days // bucket_days > ANALYTICS_MAX_BUCKETS:
+        return JsonResponse({'success': False, 'error': 'Date range too large for this granularity'}, status=400)
+
+    grounds = Ground.objects.all()
+    if request.user.role == 'owner':
+        grounds = grounds.filter(owner=request.user)
+    ground_ids = [value for value in request.GET.getlist('ground_id') if value.isdigit()]
+    if ground_ids:
+        grounds = grounds.filter(id__in=ground_ids)
+
+    series = booking_time_series(
+        start_date=start_date,
+        end_date=end_date,
+        granularity=granularity,
+        grounds=grounds if (request.user.role == 'owner' or ground_ids) else None,
+    )
+    return JsonResponse({
+        'success': True,
+        'granularity': granularity,
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'series': [{**row, 'bucket': row['bucket'].isoformat()} for row in series],
+    })
+
+
 @login_required
 def owner_tournaments(request):
     if request.user.role not in {'owner', 'admin'}:
@@ -1782,6 +2031,7 @@ def mark_invoice_unpaid(request):
 
 
 @login_required
+@read_only()
 def export_invoices_csv(request):
     if request.user.role != 'admin':
         messages.error(request, 'Access denied.')
@@ -1789,100 +2039,90 @@ def export_invoices_csv(request):
 
     start = request.GET.get('start')
     end = request.GET.get('end')
-    qs = None
-    from .models import GroundInvoice
     try:
-        if start and end:
-            qs = GroundInvoice.objects.filter(period_start__gte=start, period_end__lte=end)
-        else:
-            qs = GroundInvoice.objects.all()
+        qs = invoice_export_queryset(start=start, end=end)
     except Exception:
-        qs = GroundInvoice.objects.all()
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Ground', 'Period Start', 'Period End', 'Bookings', 'Charge Per Booking', 'Total', 'Paid', 'Created At'])
-    for inv in qs.order_by('-created_at'):
-        writer.writerow([
-            inv.ground.name,
-            inv.period_start,
-            inv.period_end,
-            inv.bookings_count,
-            f"{inv.charge_per_booking}",
-            f"{inv.total_amount}",
-            'Yes' if inv.is_paid else 'No',
-            inv.created_at,
-        ])
-
-    resp = HttpResponse(output.getvalue(), content_type='text/csv')
-    resp['Content-Disposition'] = 'attachment; filename="ground_invoices.csv"'
-    return resp
+        qs = invoice_export_queryset()
+
+    return streaming_csv_response('ground_invoices.csv', INVOICE_EXPORT_HEADER, qs, invoice_export_row)
 
 
 @login_required
+@read_only()
 def export_bookings_csv(request):
     # Export bookings CSV per-ground for a date range (admin only)
     if request.user.role != 'admin':
         messages.error(request, 'Access denied.')
         return redirect('home')
 
-    ground_id = request.GET.get('ground_id')
-    start = request.GET.get('start')
-    end = request.GET.get('end')
+    qs = booking_export_queryset(
+        ground_id=request.GET.get('ground_id'),
+        start=request.GET.get('start'),
+        end=request.GET.get('end'),
+    )
+    return streaming_csv_response('bookings.csv', BOOKING_EXPORT_HEADER, qs, booking_export_row)
 
-    qs = Booking.objects.select_related('slot__ground', 'user')
-    if ground_id:
-        qs = qs.filter(slot__ground__id=ground_id)
-    if start:
-        qs = qs.filter(slot__date__gte=start)
-    if end:
-        qs = qs.filter(slot__date__lte=end)
-
-    qs = qs.order_by('-slot__date', '-slot__start_time')
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow([
-        'Booking ID',
-        'Ground',
-        'Date',
-        'Start',
-        'End',
-        'Customer Name',
-        'Customer Phone',
-        'User Email',
-        'Booking Source',
-        'Payment Mode',
-        'Payment Status',
-        'Paid Amount',
-        'Due Amount',
-        'Owner Payout',
-        'Amount',
-        'Status',
-    ])
-    for b in qs:
-        writer.writerow([
-            str(b.id),
-            b.slot.ground.name if b.slot and b.slot.ground else '',
-            b.slot.date if b.slot else '',
-            b.slot.start_time.strftime('%H:%M') if b.slot else '',
-            b.slot.end_time.strftime('%H:%M') if b.slot else '',
-            b.customer_name,
-            b.customer_phone,
-            b.user.email if b.user and getattr(b.user, 'email', None) else '',
-            b.get_booking_source_display(),
-            b.get_payment_mode_display(),
-            b.get_payment_status_display(),
-            f"{b.paid_amount}",
-            f"{b.due_amount}",
-            f"{b.owner_payout}",
-            f"{b.total_amount}",
-            b.status,
-        ])
-
-    resp = HttpResponse(output.getvalue(), content_type='text/csv')
-    resp['Content-Disposition'] = 'attachment; filename="bookings.csv"'
-    return resp
+
+@login_required
+def admin_queue_export_job(request):
+    if request.user.role != 'admin':
+        messages.error(request, 'Access denied.')
+        return redirect('home')
+    if request.method != 'POST':
+        return redirect('admin_invoices')
+
+    kind = request.POST.get('kind')
+    file_format = request.POST.get('file_format') or 'csv'
+    if kind not in dict(ExportJob.KIND_CHOICES) or file_format not in dict(ExportJob.FORMAT_CHOICES):
+        messages.error(request, 'Unsupported export type.')
+        return redirect('admin_invoices')
+
+    params = {}
+    for key in ('ground_id', 'start', 'end'):
+        value = (request.POST.get(key) or '').strip()
+        if value:
+            params[key] = value
+    try:
+        for key in ('start', 'end'):
+            if key in params:
+                datetime.strptime(params[key], '%Y-%m-%d')
+        if 'ground_id' in params:
+            params['ground_id'] = int(params['ground_id'])
+    except ValueError:
+        messages.error(request, 'Invalid export filters.')
+        return redirect('admin_invoices')
+
+    job = ExportJob.objects.create(kind=kind, file_format=file_format, params=params, requested_by=request.user)
+    queue_export_job(job)
+    messages.success(request, f'{job.get_kind_display()} export queued. It will appear below when ready.')
+    return redirect('admin_invoices')
+
+
+@login_required
+def admin_export_job_status(request, job_id):
+    if request.user.role != 'admin':
+        return JsonResponse({'success': False, 'error': 'Access denied'}, status=403)
+    job = get_object_or_404(ExportJob, id=job_id)
+    return JsonResponse({
+        'success': True,
+        'id': job.id,
+        'status': job.status,
+        'rows_written': job.rows_written,
+        'total_rows': job.total_rows,
+        'progress': job.progress_percent,
+        'error': job.error,
+    })
+
+
+@login_required
+def admin_export_job_download(request, job_id):
+    if request.user.role != 'admin':
+        messages.error(request, 'Access denied.')
+        return redirect('home')
+    job = get_object_or_404(ExportJob, id=job_id)
+    if job.status != 'DONE' or not job.file or not os.path.exists(job.file.path):
+        raise Http404('Export file is not available.')
+    return export_file_response(request, job)
 
 
 @login_required
@@ -1936,7 +2176,7 @@ def pay_invoice(request, invoice_id):
 
 
 def stripe_webhook(request):
-    # Basic webhook handler to mark invoice paid when payment succeeds
+    # Verify and queue; the webhook processor marks the invoice paid.
     stripe_key = getattr(settings, 'STRIPE_SECRET_KEY', None)
     webhook_secret = getattr(settings, 'STRIPE_WEBHOOK_SECRET', None)
     if stripe is None or not stripe_key or not webhook_secret:
@@ -1949,18 +2189,9 @@ def stripe_webhook(request):
     except Exception:
         return HttpResponse(status=400)
 
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        invoice_id = session.get('metadata', {}).get('invoice_id')
-        if invoice_id:
-            try:
-                inv = GroundInvoice.objects.get(id=invoice_id)
-                inv.is_paid = True
-                inv.settled_at = timezone.now()
-                inv.save(update_fields=['is_paid', 'settled_at'])
-            except GroundInvoice.DoesNotExist:
-                pass
-
+    session = event['data']['object'] if event['type'] == 'checkout.session.completed' else {}
+    invoice_id = (session.get('metadata') or {}).get('invoice_id') or ''
+    ingest_event('STRIPE', payload, dedupe_key=event['id'], event_type=event['type'], ordering_key=str(invoice_id))
     return HttpResponse(status=200)
 
 
@@ -1985,35 +2216,69 @@ def razorpay_webhook(request):
     except Exception:
         return HttpResponse(status=400)
 
-    event_name = event.get('event')
     payment_entity = (event.get('payload') or {}).get('payment', {}).get('entity', {})
-    payment_id = payment_entity.get('id')
-    order_id = payment_entity.get('order_id')
+    ingest_event(
+        'RAZORPAY',
+        payload,
+        dedupe_key=request.headers.get('X-Razorpay-Event-Id') or payload_digest(payload),
+        event_type=event.get('event') or '',
+        ordering_key=payment_entity.get('order_id') or payment_entity.get('id') or '',
+    )
+    return HttpResponse(status=200)
 
-    if event_name in {'payment.captured', 'order.paid'} and payment_id:
-        booking = (
-            Booking.objects
-            .filter(razorpay_payment_id=payment_id)
-            .order_by('-created_at')
-            .first()
-        )
-        if not booking and order_id:
-            booking = (
-                Booking.objects
-                .filter(razorpay_order_id=order_id)
-                .order_by('-created_at')
-                .first()
-            )
-        if booking:
-            if booking.due_amount > 0:
-                booking.payment_status = 'PARTIALLY_PAID'
-            else:
-                booking.payment_status = 'PAID'
-            if not booking.payment_paid_at:
-                booking.payment_paid_at = timezone.now()
-            booking.save(update_fields=['payment_status', 'payment_paid_at'])
 
-    return HttpResponse(status=200)
+@login_required
+def push_subscribe(request):
+    """Store (or refresh) the calling browser's Web Push subscription."""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
+    try:
+        payload = json.loads(request.body.decode('utf-8') or '{}')
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
+
+    if not isinstance(payload, dict) or not isinstance(payload.get('keys'), dict):
+        return JsonResponse({'success': False, 'error': 'Invalid subscription'}, status=400)
+    endpoint = str(payload.get('endpoint') or '').strip()
+    keys = payload['keys']
+    if len(endpoint) > 500 or not is_allowed_endpoint(endpoint) or not keys.get('p256dh') or not keys.get('auth'):
+        return JsonResponse({'success': False, 'error': 'Invalid subscription'}, status=400)
+
+    PushSubscription.objects.update_or_create(
+        endpoint=endpoint,
+        defaults={
+            'user': request.user,
+            'p256dh': str(keys['p256dh'])[:255],
+            'auth': str(keys['auth'])[:255],
+            'user_agent': request.headers.get('User-Agent', '')[:255],
+            'failure_count': 0,
+        },
+    )
+    if not request.user.push_alerts:
+        request.user.push_alerts = True
+        request.user.save(update_fields=['push_alerts'])
+    return JsonResponse({'success': True})
+
+
+@login_required
+def push_unsubscribe(request):
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
+    try:
+        payload = json.loads(request.body.decode('utf-8') or '{}')
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
+    endpoint = payload.get('endpoint') if isinstance(payload, dict) else None
+    deleted, _ = PushSubscription.objects.filter(user=request.user, endpoint=str(endpoint or '')).delete()
+    return JsonResponse({'success': True, 'removed': deleted})
+
+
+def push_service_worker(request):
+    """Served from the site root so the worker's scope covers every page."""
+    response = render(request, 'bookings/push_sw.js', content_type='application/javascript')
+    response['Service-Worker-Allowed'] = '/'
+    response['Cache-Control'] = 'no-cache'
+    return response
 
 
 @csrf_exempt
@@ -2045,19 +2310,23 @@ def whatsapp_webhook(request):
 
     try:
         payload = json.loads(request.body.decode('utf-8'))
-        statuses = [
-            status.get('status')
+        message_ids = [
+            status.get('id')
             for entry in payload.get('entry', [])
             for change in entry.get('changes', [])
-            for value in [change.get('value', {})]
-            for status in value.get('statuses', [])
-            if status.get('status')
+            for status in change.get('value', {}).get('statuses', [])
+            if status.get('id')
         ]
-        if statuses:
-            logger.info('WhatsApp delivery statuses received: %s', ', '.join(statuses))
     except (UnicodeDecodeError, json.JSONDecodeError, AttributeError, TypeError):
         logger.warning('Received malformed WhatsApp webhook payload')
         return HttpResponse(status=400)
+    ingest_event(
+        'WHATSAPP',
+        request.body,
+        dedupe_key=payload_digest(request.body),
+        event_type='statuses' if message_ids else '',
+        ordering_key=message_ids[0] if message_ids else '',
+    )
     return HttpResponse(status=200)
 
 
@@ -2122,6 +2391,27 @@ def admin_invoices(request):
         except Exception:
             selected_ground = None
 
+    # Bill every ground with pending bookings for the selected period in one pass
+    if request.method == 'POST' and request.POST.get('action') == 'generate_all':
+        try:
+            charge_val = Decimal(str(request.POST.get('charge_per_booking')))
+            if charge_val <= 0:
+                raise InvalidOperation()
+        except (InvalidOperation, ValueError):
+            messages.error(request, 'Enter a valid positive charge per booking.')
+            return redirect('admin_invoices')
+        summary = generate_invoices(start_date, end_date, charge_val)
+        messages.success(
+            request,
+            f"Invoices generated: {summary['created']} created, {summary['updated']} updated, "
+            f"{summary['bookings']} bookings billed, total {summary['total']}.",
+        )
+        if summary['skipped_paid']:
+            messages.warning(request, f"Skipped already-paid invoices: {', '.join(summary['skipped_paid'])}.")
+        if summary['failed']:
+            messages.error(request, f"{len(summary['failed'])} ground(s) failed; see the logs for details.")
+        return redirect('admin_invoices')
+
     # Prepare invoice creation
     if request.method == 'POST':
         ground_id = request.POST.get('ground_id')
@@ -2156,75 +2446,15 @@ def admin_invoices(request):
                 raise InvalidOperation()
 
             with transaction.atomic():
-                ground = Ground.objects.select_for_update().get(id=ground_id)
-                period_bookings = list(
-                    Booking.objects.select_for_update()
-                    .filter(
-                        status='BOOKED',
-                        invoiced_at__isnull=True,
-                        slot__ground=ground,
-                        slot__date__gte=gstart_date,
-                        slot__date__lte=gend_date,
-                    )
-                    .select_related('slot')
-                    .order_by('slot__date', 'slot__start_time', 'id')
-                )
-                bookings_count = len(period_bookings)
-                if bookings_count == 0:
-                    messages.warning(request, f'No uninvoiced bookings found for {ground.name} in the selected period.')
-                    return redirect('admin_invoices')
-
-                total = (Decimal(bookings_count) * charge_val).quantize(Decimal('0.01'))
-                invoice = GroundInvoice.objects.select_for_update().filter(
-                    ground=ground,
-                    period_start=gstart_date,
-                    period_end=gend_date,
-                ).first()
-
-                if invoice and invoice.is_paid:
-                    messages.error(request, 'This settlement is already marked paid. Mark it unpaid before updating it.')
-                    return redirect('admin_invoices')
-
-                if invoice is None:
-                    invoice = GroundInvoice.objects.create(
-                        ground=ground,
-                        period_start=gstart_date,
-                        period_end=gend_date,
-                        bookings_count=bookings_count,
-                        charge_per_booking=charge_val,
-                        total_amount=total,
-                        is_paid=False,
-                    )
-                else:
-                    previous_booking_ids = list(invoice.line_items.values_list('booking_id', flat=True))
-                    invoice.bookings_count = bookings_count
-                    invoice.charge_per_booking = charge_val
-                    invoice.total_amount = total
-                    invoice.is_paid = False
-                    invoice.settled_at = None
-                    invoice.settled_by = None
-                    invoice.save(update_fields=[
-                        'bookings_count',
-                        'charge_per_booking',
-                        'total_amount',
-                        'is_paid',
-                        'settled_at',
-                        'settled_by',
-                    ])
-                    invoice.line_items.all().delete()
-                    stale_booking_ids = [booking_id for booking_id in previous_booking_ids if booking_id not in {booking.id for booking in period_bookings}]
-                    if stale_booking_ids:
-                        Booking.objects.filter(id__in=stale_booking_ids, invoiced_at__isnull=False).update(invoiced_at=None)
-
-                InvoiceLineItem.objects.bulk_create([
-                    InvoiceLineItem(
-                        invoice=invoice,
-                        booking=booking,
-                        charge_amount=charge_val,
-                    )
-                    for booking in period_bookings
-                ])
-                Booking.objects.filter(id__in=[booking.id for booking in period_bookings]).update(invoiced_at=timezone.now())
+                status, invoice, bookings_count, total = invoice_ground(ground_id, gstart_date, gend_date, charge_val)
+            if status == 'empty':
+                ground = Ground.objects.get(id=ground_id)
+                messages.warning(request, f'No uninvoiced bookings found for {ground.name} in the selected period.')
+                return redirect('admin_invoices')
+            if status == 'paid':
+                messages.error(request, 'This settlement is already marked paid. Mark it unpaid before updating it.')
+                return redirect('admin_invoices')
+            ground = invoice.ground
 
             messages.success(request, f'Invoice created for {ground.name}: {bookings_count} bookings billed, total {total}.')
             return redirect('admin_invoices')
@@ -2260,6 +2490,7 @@ def admin_invoices(request):
         'existing_invoices': existing_invoices,
         'selected_ground': selected_ground,
         'finance_tracking_rows': _finance_tracking_rows(grounds, start_date, end_date),
+        'export_jobs': ExportJob.objects.select_related('requested_by')[:10],
     })
 
 
@@ -2339,102 +2570,60 @@ def admin_online_settlements(request):
         .order_by('-created_at')[:50]
     )
 
+    settlement_preview = None
     if request.method == 'POST':
+        action = request.POST.get('action')
         ground_id = request.POST.get('ground_id')
         period_start_raw = request.POST.get('period_start')
         period_end_raw = request.POST.get('period_end')
         admin_note = (request.POST.get('admin_note') or '').strip()
         try:
-            if not ground_id:
-                messages.error(request, 'Please select a ground.')
+            period_start = timezone.datetime.strptime(period_start_raw, '%Y-%m-%d').date() if period_start_raw else start_date
+            period_end = timezone.datetime.strptime(period_end_raw, '%Y-%m-%d').date() if period_end_raw else end_date
+
+            if action == 'preview':
+                settlement_preview = {
+                    'rows': preview_online_settlements(period_start, period_end),
+                    'period_start': period_start,
+                    'period_end': period_end,
+                }
+                settlement_preview['booking_count'] = sum(row['booking_count'] for row in settlement_preview['rows'])
+                settlement_preview['collected_amount'] = sum(
+                    (row['collected_amount'] for row in settlement_preview['rows']), Decimal('0.00')
+                )
+            elif action == 'generate_all':
+                summary = generate_online_settlements(
+                    period_start, period_end, created_by=request.user, admin_note=admin_note,
+                )
+                messages.success(
+                    request,
+                    f"Online settlements generated: {summary['created']} created, {summary['updated']} updated, "
+                    f"₹{summary['total']} across {summary['bookings']} bookings.",
+                )
+                if summary['skipped_locked']:
+                    messages.warning(
+                        request,
+                        f"Skipped settlements already transferred or acknowledged: {', '.join(summary['skipped_locked'])}.",
+                    )
                 return redirect('admin_online_settlements')
-
-            with transaction.atomic():
-                ground = Ground.objects.select_for_update().get(id=ground_id)
-                period_start = timezone.datetime.strptime(period_start_raw, '%Y-%m-%d').date() if period_start_raw else start_date
-                period_end = timezone.datetime.strptime(period_end_raw, '%Y-%m-%d').date() if period_end_raw else end_date
-                existing = OnlineSettlement.objects.select_for_update().filter(
-                    ground=ground,
-                    period_start=period_start,
-                    period_end=period_end,
-                ).first()
-                if existing and existing.status == 'ACKNOWLEDGED':
-                    messages.error(request, 'This settlement is already acknowledged by the owner.')
+            else:
+                if not ground_id:
+                    messages.error(request, 'Please select a ground.')
                     return redirect('admin_online_settlements')
 
-                bookings_qs = (
-                    Booking.objects.select_for_update()
-                    .filter(
-                        status='BOOKED',
-                        booking_source='ONLINE',
-                        online_settlement__isnull=True,
-                        slot__ground=ground,
-                        slot__date__gte=period_start,
-                        slot__date__lte=period_end,
-                    )
-                    .select_related('slot', 'slot__ground')
-                    .order_by('slot__date', 'slot__start_time', 'id')
+                ground = Ground.objects.get(id=ground_id)
+                summary = generate_online_settlements(
+                    period_start, period_end, created_by=request.user, admin_note=admin_note, ground_ids=[ground.id],
                 )
-                bookings_list = list(bookings_qs)
-                if not bookings_list:
+                if summary['skipped_locked']:
+                    messages.error(request, 'This settlement has already been transferred or acknowledged.')
+                    return redirect('admin_online_settlements')
+                if not summary['settlements']:
                     messages.warning(request, f'No unsettled online bookings found for {ground.name}.')
                     return redirect('admin_online_settlements')
 
-                collected_amount = sum((_online_collected_amount_for_booking(booking) for booking in bookings_list), Decimal('0.00'))
-                booking_count = len(bookings_list)
-
-                if existing is None:
-                    reference = f"FB-OS-{timezone.now():%Y%m%d}-{str(uuid.uuid4())[:8].upper()}"
-                    settlement = OnlineSettlement.objects.create(
-                        ground=ground,
-                        owner=ground.owner,
-                        period_start=period_start,
-                        period_end=period_end,
-                        booking_count=booking_count,
-                        collected_amount=collected_amount,
-                        status='CREATED',
-                        reference=reference,
-                        admin_note=admin_note,
-                        created_by=request.user,
-                    )
-                else:
-                    settlement = existing
-                    previous_booking_ids = list(settlement.line_items.values_list('booking_id', flat=True))
-                    settlement.booking_count = booking_count
-                    settlement.collected_amount = collected_amount
-                    settlement.admin_note = admin_note
-                    settlement.status = 'CREATED'
-                    settlement.transferred_at = None
-                    settlement.transferred_by = None
-                    settlement.owner_confirmed_at = None
-                    settlement.owner_confirmed_by = None
-                    settlement.save(update_fields=[
-                        'booking_count',
-                        'collected_amount',
-                        'admin_note',
-                        'status',
-                        'transferred_at',
-                        'transferred_by',
-                        'owner_confirmed_at',
-                        'owner_confirmed_by',
-                    ])
-                    settlement.line_items.all().delete()
-                    stale_booking_ids = [booking_id for booking_id in previous_booking_ids if booking_id not in {booking.id for booking in bookings_list}]
-                    if stale_booking_ids:
-                        Booking.objects.filter(id__in=stale_booking_ids, online_settlement__id=settlement.id).update(online_settlement=None)
-
-                OnlineSettlementLineItem.objects.bulk_create([
-                    OnlineSettlementLineItem(
-                        settlement=settlement,
-                        booking=booking,
-                        collected_amount=_online_collected_amount_for_booking(booking),
-                    )
-                    for booking in bookings_list
-                ])
-                Booking.objects.filter(id__in=[booking.id for booking in bookings_list]).update(online_settlement=settlement)
-
-            messages.success(request, f'Online settlement created for {ground.name}: ₹{collected_amount} across {booking_count} bookings.')
-            return redirect('admin_online_settlements')
+                messages.success(request, f"Online settlement created for {ground.name}: ₹{summary['total']} across {summary['bookings']} bookings.")
+                return redirect('admin_online_settlements')
         except Ground.DoesNotExist:
             messages.error(request, 'Invalid ground selected.')
         except ValueError:
@@ -2445,6 +2634,7 @@ def admin_online_settlements(request):
         'end_date': end_date,
         'pending_rows': pending_rows,
         'settlements': settlements,
+        'settlement_preview': settlement_preview,
         'finance_tracking_rows': _finance_tracking_rows(grounds, start_date, end_date),
     })
 
@@ -2856,7 +3046,8 @@ def customer_reschedule_booking(request, booking_id):
                 if new_slot.id == old_slot.id:
                     messages.error(request, 'Please choose a different slot.')
                     return redirect(f'/reschedule/{booking.id}/?date={selected_date}')
-                if new_slot.is_booked or Booking.objects.filter(slot=new_slot, status='BOOKED').exists():
+                if new_slot.is_booked or Booking.objects.filter(slot=new_slot, status='BOOKED').exists() \
+                        or held_for_someone_else(new_slot, request.user):
                     messages.error(request, 'Selected slot is no longer available.')
                     return redirect(f'/reschedule/{booking.id}/?date={selected_date}')
                 if _slot_start_datetime(new_slot) <= timezone.localtime(timezone.now()):
@@ -2865,8 +3056,9 @@ def customer_reschedule_booking(request, booking_id):
 
                 old_slot.is_booked = False
                 old_slot.save(update_fields=['is_booked'])
+                claim_waitlist_hold(new_slot, request.user)
                 new_slot.is_booked = True
-                new_slot.save(update_fields=['is_booked'])
+                new_slot.save(update_fields=['is_booked', 'held_for', 'hold_expires_at'])
 
                 new_total = _slot_price_for_slot(new_slot)
                 locked_booking.slot = new_slot
@@ -3102,7 +3294,7 @@ def cancel_booking(request, booking_id):
     no_refund = ((slot_start - now_dt).total_seconds() / 3600) < 4
 
     with transaction.atomic():
-        cancelled_bookings = _cancel_booking_series_from(booking)
+        cancelled_bookings, offered_slots = _cancel_booking_series_from(booking)
         booking.status = 'CANCELLED'
         booking.cancelled_at = timezone.now()
         ActivityLog.objects.create(
@@ -3113,7 +3305,9 @@ def cancel_booking(request, booking_id):
             meta={'cancelled_count': len(cancelled_bookings)},
         )
 
-    _dispatch_ground_alerts(slot.ground, slot=slot, reason='LAST_MINUTE_OPENING')
+    # Waitlisted players get the freed slot first; the ground-wide alert only goes out when nobody was waiting.
+    if (slot.ground_id, slot.date, slot.start_time) not in offered_slots:
+        _dispatch_ground_alerts(slot.ground, slot=slot, reason='LAST_MINUTE_OPENING')
     transaction.on_commit(lambda booking_id=booking.id, cancelled_count=len(cancelled_bookings): _queue_booking_cancellation_notifications(booking_id, cancelled_count))
 
     if no_refund:
@@ -3142,7 +3336,7 @@ def owner_cancel_booking(request, booking_id):
         return redirect('/dashboard/owner/')
 
     with transaction.atomic():
-        cancelled_bookings = _cancel_booking_series_from(booking)
+        cancelled_bookings, offered_slots = _cancel_booking_series_from(booking)
         booking.status = 'CANCELLED'
         booking.cancelled_at = timezone.now()
         ActivityLog.objects.create(
@@ -3153,7 +3347,9 @@ def owner_cancel_booking(request, booking_id):
             meta={'cancelled_count': len(cancelled_bookings)},
         )
 
-    _dispatch_ground_alerts(slot.ground, slot=slot, reason='LAST_MINUTE_OPENING')
+    # Waitlisted players get the freed slot first; the ground-wide alert only goes out when nobody was waiting.
+    if (slot.ground_id, slot.date, slot.start_time) not in offered_slots:
+        _dispatch_ground_alerts(slot.ground, slot=slot, reason='LAST_MINUTE_OPENING')
     transaction.on_commit(lambda booking_id=booking.id, cancelled_count=len(cancelled_bookings): _queue_booking_cancellation_notifications(booking_id, cancelled_count))
 
     messages.success(
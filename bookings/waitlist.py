@@ -0,0 +1,191 @@
+"""Per-slot waitlists for booked slots.
+
+Players join the waitlist of a booked slot; entries are keyed by
+(ground, date, start_time) and indexed in arrival order. When a cancellation
+frees slots, `offer_freed_slots` matches all of them against the index in one
+query, holds each slot for its first waiting player for
+SLOT_WAITLIST_HOLD_MINUTES and notifies only those players, instead of mailing
+every subscriber of the ground. `expire_waitlist_holds` (run every minute by
+`detect_price_drops`) passes an unclaimed hold to the next player in line, or
+announces the slot to subscribers once the queue is empty. Customer booking
+paths re-check the hold with the slot row locked and `claim_waitlist_hold` it.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Slot, SlotWaitlistEntry
+from .push import notify_users as notify_push_users
+
+
+logger = logging.getLogger(__name__)
+
+
+def join_waitlist(user, slot):
+    """Queue `user` for `slot`; returns `(entry, created)`. Rejoining goes to the back of the queue."""
+    entry, created = SlotWaitlistEntry.objects.get_or_create(
+        user=user,
+        ground=slot.ground,
+        date=slot.date,
+        start_time=slot.start_time,
+    )
+    if not created and entry.status != 'WAITING':
+        entry.status = 'WAITING'
+        entry.offered_at = None
+        entry.created_at = timezone.now()
+        entry.save(update_fields=['status', 'offered_at', 'created_at'])
+        created = True
+    return entry, created
+
+
+def leave_waitlist(user, slot):
+    return SlotWaitlistEntry.objects.filter(
+        user=user,
+        ground=slot.ground,
+        date=slot.date,
+        start_time=slot.start_time,
+        status='WAITING',
+    ).update(status='LEFT')
+
+
+def held_for_someone_else(slot, user, now=None):
+    """True while the slot is on hold for a different waitlisted player."""
+    if not slot.held_for_id or slot.held_for_id == user.id:
+        return False
+    return slot.hold_expires_at is not None and slot.hold_expires_at > (now or timezone.now())
+
+
+def claim_waitlist_hold(slot, user):
+    """Clear the hold on a slot that `user` is booking; the caller saves `held_for` and `hold_expires_at`.
+
+    Call inside the booking transaction with the slot row locked, after checking
+    `held_for_someone_else`. The held player's offer is marked CLAIMED when they
+    booked it themselves, or EXPIRED when their hold had already lapsed.
+    """
+    if not slot.held_for_id:
+        return
+    SlotWaitlistEntry.objects.filter(
+        user_id=slot.held_for_id,
+        ground_id=slot.ground_id,
+        date=slot.date,
+        start_time=slot.start_time,
+        status='OFFERED',
+    ).update(status='CLAIMED' if slot.held_for_id == user.id else 'EXPIRED')
+    slot.held_for = None
+    slot.hold_expires_at = None
+
+
+def offer_freed_slots(slots, now=None):
+    """Hold each freed slot for its first waiting player; returns the offered entries.
+
+    Call inside the transaction that frees the slots (with the slot rows locked)
+    so a hold is never visible without its booking having been cancelled.
+    """
+    now = now or timezone.now()
+    slots = [slot for slot in slots if not slot.is_booked]
+    if not slots:
+        return []
+    slot_by_key = {(slot.ground_id, slot.date, slot.start_time): slot for slot in slots}
+    match = Q()
+    for ground_id, slot_date, start_time in slot_by_key:
+        match |= Q(ground_id=ground_id, date=slot_date, start_time=start_time)
+    waiting = SlotWaitlistEntry.objects.filter(match, status='WAITING').order_by('created_at', 'id')
+
+    first_by_key = {}
+    for entry in waiting:
+        first_by_key.setdefault((entry.ground_id, entry.date, entry.start_time), entry)
+    if not first_by_key:
+        return []
+
+    hold_until = now + timedelta(minutes=getattr(settings, 'SLOT_WAITLIST_HOLD_MINUTES', 15))
+    offers = []
+    for key, entry in first_by_key.items():
+        slot = slot_by_key[key]
+        slot.held_for_id = entry.user_id
+        slot.hold_expires_at = hold_until
+        slot.save(update_fields=['held_for', 'hold_expires_at'])
+        entry.status = 'OFFERED'
+        entry.offered_at = now
+        offers.append(entry)
+    SlotWaitlistEntry.objects.filter(id__in=[entry.id for entry in offers]).update(status='OFFERED', offered_at=now)
+    return offers
+
+
+def expire_waitlist_holds(dispatch_alerts, now=None):
+    """Move lapsed holds on to the next waiting player; returns a summary dict.
+
+    The player whose hold lapsed is marked EXPIRED. Slots with nobody left in
+    the queue go back on general sale and `dispatch_alerts(ground, slot)` is
+    called for each, after commit, as a cancellation would have done.
+    """
+    now = now or timezone.now()
+    summary = {'expired': 0, 'offered': 0, 'released': 0}
+    with transaction.atomic():
+        lapsed = list(
+            Slot.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(held_for__isnull=False, hold_expires_at__lte=now, is_booked=False)
+            .select_related('ground')
+        )
+        if not lapsed:
+            return summary
+        expired = Q()
+        for slot in lapsed:
+            expired |= Q(user_id=slot.held_for_id, ground_id=slot.ground_id, date=slot.date, start_time=slot.start_time)
+        SlotWaitlistEntry.objects.filter(expired, status='OFFERED').update(status='EXPIRED')
+        Slot.objects.filter(id__in=[slot.id for slot in lapsed]).update(held_for=None, hold_expires_at=None)
+        for slot in lapsed:
+            slot.held_for_id = None
+            slot.hold_expires_at = None
+
+        today = timezone.localdate(now)
+        upcoming = [slot for slot in lapsed if slot.date >= today]
+        offers = offer_freed_slots(upcoming, now=now)
+        offered_keys = {(entry.ground_id, entry.date, entry.start_time) for entry in offers}
+        released = [slot for slot in upcoming if (slot.ground_id, slot.date, slot.start_time) not in offered_keys]
+        summary.update(expired=len(lapsed), offered=len(offers), released=len(released))
+    if offers:
+        send_waitlist_offers([entry.id for entry in offers])
+    for slot in released:
+        dispatch_alerts(slot.ground, slot)
+    return summary
+
+
+def send_waitlist_offers(entry_ids):
+    """Email and push each offered player; run after commit, off the request thread."""
+    entries = list(
+        SlotWaitlistEntry.objects.filter(id__in=entry_ids, status='OFFERED').select_related('user', 'ground')
+    )
+    from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', None) or getattr(settings, 'EMAIL_HOST_USER', None)
+    hold_minutes = getattr(settings, 'SLOT_WAITLIST_HOLD_MINUTES', 15)
+    for entry in entries:
+        subject = f'Your waitlisted slot at {entry.ground.name} is free'
+        body = (
+            f"Hello {entry.user.name},\n\n"
+            f"The slot you were waiting for at {entry.ground.name} has just opened up.\n"
+            f"Date: {entry.date}\n"
+            f"Time: {entry.start_time.strftime('%I:%M %p')}\n"
+            f"It is held for you for {hold_minutes} minutes; book it before the hold runs out.\n\n"
+            "Regards,\nFootBook"
+        )
+        if entry.user.email:
+            try:
+                send_mail(subject, body, from_email, [entry.user.email], fail_silently=False)
+            except Exception:
+                logger.exception('Failed to send waitlist offer entry=%s', entry.id)
+        notify_push_users(
+            [entry.user_id],
+            {
+                'title': subject,
+                'body': f"Held for you for {hold_minutes} minutes.",
+                'url': f'/grounds/{entry.ground_id}/?date={entry.date.isoformat()}',
+                'tag': f'WAITLIST-{entry.id}',
+            },
+            ttl=hold_minutes * 60,
+        )
+    return len(entries)
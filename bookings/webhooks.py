@@ -0,0 +1,281 @@
+"""Webhook ingestion: store verified deliveries, acknowledge, apply in the background.
+
+The webhook views only verify the signature and call `ingest_event`, which
+appends a `WebhookEvent` (a duplicate delivery hits the unique dedupe key and is
+acknowledged without a second row). After commit, a single in-process worker
+runs `process_pending_events`, applying events in id order and holding back any
+event whose ordering key still has an earlier pending event. WhatsApp status
+events are applied in batches instead, since their statuses only ever move
+forward. `process_webhook_events` drains the queue after a restart, retries
+failures and replays historic events.
+"""
+
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import GroundInvoice, WebhookEvent
+from .payments import find_attempt, record_payment
+from .whatsapp import merge_delivery_statuses, write_delivery_statuses
+
+
+logger = logging.getLogger(__name__)
+
+# One worker keeps application order equal to arrival order within this process.
+_webhook_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='footbook-webhook')
+
+
+def payload_digest(body):
+    """Fallback dedupe key for providers that send no event id."""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return hashlib.sha256(body).hexdigest()
+
+
+def ingest_event(provider, body, *, dedupe_key, event_type='', ordering_key=''):
+    """Store a verified delivery and queue processing; returns `(event, created)`."""
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+    try:
+        with transaction.atomic():
+            event = WebhookEvent.objects.create(
+                provider=provider,
+                dedupe_key=f'{provider}:{dedupe_key}'[:255],
+                event_type=(event_type or '')[:100],
+                ordering_key=(ordering_key or '')[:100],
+                payload=body,
+            )
+    except IntegrityError:
+        return WebhookEvent.objects.filter(dedupe_key=f'{provider}:{dedupe_key}'[:255]).first(), False
+    transaction.on_commit(_queue_processing)
+    return event, True
+
+
+def _queue_processing():
+    try:
+        _webhook_executor.submit(_process_in_background)
+    except RuntimeError:
+        logger.exception('Could not queue webhook processing')
+
+
+def _process_in_background():
+    try:
+        process_pending_events()
+    except Exception:
+        logger.exception('Webhook processing run failed')
+    finally:
+        close_old_connections()
+
+
+# How far a booking's payment has progressed; a captured-payment event never moves it back.
+PAYMENT_STATUS_RANK = {
+    'PENDING': 0,
+    'FAILED': 0,
+    'PARTIALLY_PAID': 1,
+    'PAID': 2,
+    'PAID_AT_GROUND': 3,
+}
+
+
+def _apply_razorpay(event):
+    data = json.loads(event.payload)
+    event_name = data.get('event')
+    payment_entity = (data.get('payload') or {}).get('payment', {}).get('entity', {})
+    payment_id = payment_entity.get('id')
+    order_id = payment_entity.get('order_id')
+
+    if event_name == 'payment.failed' and order_id:
+        record_payment(order_id, payment_id, 'FAILED', source='WEBHOOK', detail=event_name)
+
+    if event_name in {'payment.captured', 'order.paid'} and payment_id:
+        if order_id:
+            attempt = record_payment(order_id, payment_id, 'CAPTURED', source='WEBHOOK', detail=event_name)
+        else:
+            attempt = find_attempt(payment_id=payment_id)
+        booking = attempt.booking if attempt else None
+        if booking:
+            target = 'PARTIALLY_PAID' if booking.due_amount > 0 else 'PAID'
+            if PAYMENT_STATUS_RANK[target] <= PAYMENT_STATUS_RANK.get(booking.payment_status, 0):
+                return
+            booking.payment_status = target
+            if not booking.payment_paid_at:
+                booking.payment_paid_at = timezone.now()
+            booking.save(update_fields=['payment_status', 'payment_paid_at'])
+
+
+def _apply_stripe(event):
+    data = json.loads(event.payload)
+    if data.get('type') != 'checkout.session.completed':
+        return
+    session = (data.get('data') or {}).get('object') or {}
+    invoice_id = (session.get('metadata') or {}).get('invoice_id')
+    if invoice_id:
+        GroundInvoice.objects.filter(id=invoice_id, is_paid=False).update(is_paid=True, settled_at=timezone.now())
+
+
+def _whatsapp_statuses(event):
+    data = json.loads(event.payload)
+    return [
+        status
+        for entry in data.get('entry', [])
+        for change in entry.get('changes', [])
+        for status in change.get('value', {}).get('statuses', [])
+    ]
+
+
+def _apply_whatsapp(event):
+    statuses = _whatsapp_statuses(event)
+    if statuses:
+        write_delivery_statuses(merge_delivery_statuses(statuses, {}))
+
+
+EVENT_HANDLERS = {
+    'RAZORPAY': _apply_razorpay,
+    'STRIPE': _apply_stripe,
+    'WHATSAPP': _apply_whatsapp,
+}
+
+
+def process_event(event_id):
+    """Apply one pending event; returns its new status, or None if it was skipped.
+
+    An event is skipped while another worker holds it or while an earlier event
+    with the same ordering key is still pending.
+    """
+    with transaction.atomic():
+        event = (
+            WebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(id=event_id, status='PENDING')
+            .first()
+        )
+        if event is None:
+            return None
+        if event.ordering_key and WebhookEvent.objects.filter(
+            provider=event.provider,
+            ordering_key=event.ordering_key,
+            status='PENDING',
+            id__lt=event.id,
+        ).exists():
+            return None
+
+        event.attempts += 1
+        try:
+            with transaction.atomic():
+                EVENT_HANDLERS[event.provider](event)
+        except Exception as exc:
+            logger.exception('Webhook event failed event=%s provider=%s', event.id, event.provider)
+            event.status = 'FAILED'
+            event.error = str(exc)[:1000]
+        else:
+            event.status = 'PROCESSED'
+            event.error = ''
+        event.processed_at = timezone.now()
+        event.save(update_fields=['status', 'attempts', 'error', 'processed_at'])
+    return event.status
+
+
+def process_whatsapp_events(event_ids):
+    """Apply pending WhatsApp status events together; returns `(processed, failed)`.
+
+    All their statuses go out in one upsert inside the transaction that marks the
+    events processed, so if the write fails (or the process dies) the events stay
+    PENDING for the next run. Events locked by another worker are left alone.
+    """
+    with transaction.atomic():
+        events = list(
+            WebhookEvent.objects.select_for_update(skip_locked=True)
+            .filter(id__in=event_ids, provider='WHATSAPP', status='PENDING')
+            .order_by('id')
+        )
+        pending, processed, failed = {}, [], []
+        for event in events:
+            try:
+                merge_delivery_statuses(_whatsapp_statuses(event), pending)
+            except (ValueError, TypeError, AttributeError) as exc:
+                logger.warning('Webhook event failed event=%s provider=WHATSAPP: %s', event.id, exc)
+                failed.append((event.id, str(exc)[:1000]))
+            else:
+                processed.append(event.id)
+        if pending:
+            write_delivery_statuses(pending)
+        now = timezone.now()
+        WebhookEvent.objects.filter(id__in=processed).update(
+            status='PROCESSED', error='', attempts=F('attempts') + 1, processed_at=now,
+        )
+        for event_id, error in failed:
+            WebhookEvent.objects.filter(id=event_id).update(
+                status='FAILED', error=error, attempts=F('attempts') + 1, processed_at=now,
+            )
+    return len(processed), len(failed)
+
+
+def process_pending_events(*, limit=None):
+    """Apply pending events oldest first; returns a summary dict of processed/failed/deferred counts."""
+    summary = {'processed': 0, 'failed': 0, 'deferred': 0}
+    batch_size = max(1, getattr(settings, 'WHATSAPP_STATUS_BATCH_SIZE', 200))
+    while True:
+        pending = WebhookEvent.objects.filter(status='PENDING').order_by('id').values_list('id', 'provider')
+        if limit is not None:
+            pending = pending[:limit]
+        events = list(pending)
+        progressed = False
+        deferred = 0
+
+        whatsapp_ids = [event_id for event_id, provider in events if provider == 'WHATSAPP']
+        for start in range(0, len(whatsapp_ids), batch_size):
+            batch = whatsapp_ids[start:start + batch_size]
+            try:
+                processed, failed = process_whatsapp_events(batch)
+            except Exception:
+                logger.exception('WhatsApp status batch failed events=%s-%s', batch[0], batch[-1])
+                deferred += len(batch)
+                continue
+            summary['processed'] += processed
+            summary['failed'] += failed
+            deferred += len(batch) - processed - failed
+            progressed = progressed or bool(processed or failed)
+
+        for event_id, provider in events:
+            if provider == 'WHATSAPP':
+                continue
+            status = process_event(event_id)
+            if status == 'PROCESSED':
+                summary['processed'] += 1
+                progressed = True
+            elif status == 'FAILED':
+                summary['failed'] += 1
+                progressed = True
+            else:
+                deferred += 1
+        # A held-back event becomes eligible once its predecessor is done, so go round again.
+        if not progressed or not deferred or limit is not None:
+            summary['deferred'] = deferred
+            return summary
+
+
+def replay_events(*, provider=None, since=None, until=None, event_ids=None, statuses=('PROCESSED', 'FAILED')):
+    """Reset matching events to PENDING and apply them again in their original order.
+
+    Handlers are idempotent (payment status only moves forward through
+    PAYMENT_STATUS_RANK, invoices are only marked paid once), so replaying
+    already-processed events is safe.
+    """
+    qs = WebhookEvent.objects.filter(status__in=statuses)
+    if provider:
+        qs = qs.filter(provider=provider)
+    if since:
+        qs = qs.filter(received_at__gte=since)
+    if until:
+        qs = qs.filter(received_at__lt=until)
+    if event_ids is not None:
+        qs = qs.filter(id__in=event_ids)
+    reset = qs.update(status='PENDING', error='')
+    summary = process_pending_events()
+    summary['replayed'] = reset
+    return summary
@@ -1,16 +1,77 @@
-"""Non-blocking WhatsApp Cloud API notifications for ground owners."""
+"""WhatsApp Cloud API notifications for ground owners.
+
+Booking updates and reminders go through a durable outbox: `queue_template` /
+`queue_templates` write `WhatsAppOutboxMessage` rows and `dispatch_outbox` sends
+whatever is due over one pooled keep-alive session, throttled per sender number
+by a one-second send window counted in the shared cache. Retryable failures (network errors, 429/5xx, Meta throttling
+codes) are rescheduled with exponential backoff; `dispatch_whatsapp` drains the
+outbox after a restart.
+
+Every accepted message gets a `WhatsAppDelivery` row keyed by its message id.
+Status callbacks are applied by `webhooks.process_pending_events` in batches:
+the statuses of many webhook events are merged and written in one upsert, in
+the transaction that marks those events processed, so a burst of
+delivered/read callbacks costs two queries per batch rather than one write per
+message, and a crash before commit leaves the events pending.
+"""
 
-import json
 import logging
 import re
-from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
 
+import requests
 from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from .models import WhatsAppDelivery, WhatsAppOutboxMessage
 
 
 logger = logging.getLogger(__name__)
 
+# Callbacks can arrive out of order; a status never moves back down this ranking.
+_DELIVERY_STATUS_RANK = {'ACCEPTED': 0, 'SENT': 1, 'DELIVERED': 2, 'READ': 3, 'FAILED': 4}
+
+# Graph API error codes that mean "slow down / try later" rather than "this message is bad".
+RETRYABLE_ERROR_CODES = {1, 2, 4, 80007, 130429, 131000, 131016, 131056}
+
+# A SENDING row older than this belongs to a worker that died mid-send.
+STALE_SENDING_AFTER = timedelta(minutes=10)
+
+_sessions = {}
+_pool_lock = threading.Lock()
+_dispatch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='footbook-whatsapp')
+
+
+def acquire_send_slot(phone_number_id):
+    """Block until sending from `phone_number_id` stays within WHATSAPP_MESSAGES_PER_SECOND.
+
+    Sends are counted per one-second window in the shared cache, so every gunicorn
+    worker, thread and cron process draws on the same per-number budget. That only
+    holds with a cache shared by all of them and an atomic incr (CACHE_BACKEND=redis);
+    with the per-process locmem default each process gets the full rate.
+    """
+    limit = max(1, int(getattr(settings, 'WHATSAPP_MESSAGES_PER_SECOND', 80)))
+    while True:
+        now = time.time()
+        window = int(now)
+        key = f'whatsapp:rate:{phone_number_id}:{window}'
+        cache.add(key, 0, timeout=5)
+        try:
+            sent = cache.incr(key)
+        except ValueError:
+            # Evicted between add and incr; start the window again.
+            continue
+        if sent <= limit:
+            return
+        time.sleep(window + 1 - now)
+
 
 def _normalise_phone(phone):
     digits = re.sub(r'\D', '', phone or '')
@@ -19,12 +80,37 @@ def _normalise_phone(phone):
     return digits
 
 
-def _send_template(*, recipient, template_name, language, parameters=None):
-    """Send a Cloud API template without exposing credentials in logs."""
+def _session():
+    base_url = getattr(settings, 'WHATSAPP_GRAPH_BASE_URL', 'https://graph.facebook.com')
+    pool_size = getattr(settings, 'WHATSAPP_POOL_SIZE', 10)
+    key = (base_url, pool_size)
+    session = _sessions.get(key)
+    if session is None:
+        with _pool_lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _sessions[key] = session
+    return session
+
+
+def reset_sessions():
+    """Close pooled connections; used by tests and after config changes."""
+    with _pool_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def _post_template(*, recipient, template_name, language, parameters=None):
+    """POST one template message; returns `(message_id, error, retryable)`."""
     token = getattr(settings, 'WHATSAPP_ACCESS_TOKEN', '')
     phone_number_id = getattr(settings, 'WHATSAPP_PHONE_NUMBER_ID', '')
     if not all((token, phone_number_id, template_name, recipient)):
-        return False
+        return None, 'WhatsApp is not configured', False
     template = {'name': template_name, 'language': {'code': language}}
     if parameters:
         template['components'] = [{
@@ -37,30 +123,259 @@ def _send_template(*, recipient, template_name, language, parameters=None):
         'type': 'template',
         'template': template,
     }
+    base_url = getattr(settings, 'WHATSAPP_GRAPH_BASE_URL', 'https://graph.facebook.com')
     version = getattr(settings, 'WHATSAPP_GRAPH_API_VERSION', 'v25.0')
-    request = Request(
-        f'https://graph.facebook.com/{version}/{phone_number_id}/messages',
-        data=json.dumps(payload).encode('utf-8'),
-        headers={
-            'Authorization': f'Bearer {token}',
-            'Content-Type': 'application/json',
-        },
-        method='POST',
+    timeout = (
+        getattr(settings, 'WHATSAPP_CONNECT_TIMEOUT', 3.05),
+        getattr(settings, 'WHATSAPP_READ_TIMEOUT', 10),
     )
+    acquire_send_slot(phone_number_id)
     try:
-        with urlopen(request, timeout=8) as response:
-            if not 200 <= response.status < 300:
-                logger.error('WhatsApp API rejected template=%s status=%s', template_name, response.status)
-                return False
-    except HTTPError as exc:
-        logger.error('WhatsApp API HTTP error template=%s status=%s', template_name, exc.code)
-        return False
-    except (URLError, TimeoutError, OSError):
-        logger.exception('WhatsApp API request failed template=%s', template_name)
+        response = _session().post(
+            f'{base_url}/{version}/{phone_number_id}/messages',
+            json=payload,
+            headers={'Authorization': f'Bearer {token}'},
+            timeout=timeout,
+        )
+    except requests.exceptions.RequestException as exc:
+        logger.warning('WhatsApp API request failed template=%s: %s', template_name, exc.__class__.__name__)
+        return None, exc.__class__.__name__, True
+
+    try:
+        body = response.json()
+    except ValueError:
+        body = {}
+    if 200 <= response.status_code < 300:
+        try:
+            return body['messages'][0]['id'], '', False
+        except (KeyError, IndexError, TypeError):
+            logger.warning('WhatsApp API response had no message id template=%s', template_name)
+            return None, 'Response had no message id', False
+
+    error = (body.get('error') or {}) if isinstance(body, dict) else {}
+    code = error.get('code')
+    retryable = response.status_code == 429 or response.status_code >= 500 or code in RETRYABLE_ERROR_CODES
+    logger.error('WhatsApp API rejected template=%s status=%s code=%s', template_name, response.status_code, code)
+    return None, f'HTTP {response.status_code} code={code}: {error.get("message", "")}'[:255], retryable
+
+
+def _send_template(*, recipient, template_name, language, parameters=None, booking=None):
+    """Send a Cloud API template immediately, without the outbox or retries."""
+    message_id, _, _ = _post_template(
+        recipient=recipient,
+        template_name=template_name,
+        language=language,
+        parameters=parameters,
+    )
+    if not message_id:
         return False
+    record_sent_message(message_id, recipient=recipient, template_name=template_name, booking=booking)
     return True
 
 
+def record_sent_message(message_id, *, recipient, template_name, booking=None):
+    """Store the delivery row for an accepted send."""
+    delivery, _ = WhatsAppDelivery.objects.get_or_create(
+        message_id=message_id,
+        defaults={
+            'recipient': recipient,
+            'template_name': template_name,
+            'booking': booking,
+        },
+    )
+    return delivery
+
+
+def queue_templates(messages):
+    """Add template messages to the outbox in one insert and start a dispatch after commit.
+
+    Each message is a dict with `recipient`, `template_name` and optionally
+    `language`, `parameters` and `booking`. Returns the number queued.
+    """
+    rows = [
+        WhatsAppOutboxMessage(
+            recipient=message['recipient'],
+            template_name=message['template_name'],
+            language=message.get('language') or getattr(settings, 'WHATSAPP_TEMPLATE_LANGUAGE', 'en'),
+            parameters=[str(value) for value in message.get('parameters') or []],
+            booking=message.get('booking'),
+        )
+        for message in messages
+        if message.get('recipient') and message.get('template_name')
+    ]
+    if not rows:
+        return 0
+    WhatsAppOutboxMessage.objects.bulk_create(rows, batch_size=500)
+    transaction.on_commit(_queue_dispatch)
+    return len(rows)
+
+
+def queue_template(*, recipient, template_name, language=None, parameters=None, booking=None):
+    return queue_templates([{
+        'recipient': recipient,
+        'template_name': template_name,
+        'language': language,
+        'parameters': parameters,
+        'booking': booking,
+    }]) == 1
+
+
+def _queue_dispatch():
+    try:
+        _dispatch_executor.submit(_dispatch_in_background)
+    except RuntimeError:
+        logger.exception('Could not queue WhatsApp dispatch')
+
+
+def _dispatch_in_background():
+    try:
+        dispatch_outbox()
+    except Exception:
+        logger.exception('WhatsApp dispatch run failed')
+    finally:
+        close_old_connections()
+
+
+def _retry_delay(attempts):
+    base = getattr(settings, 'WHATSAPP_RETRY_BASE_SECONDS', 30)
+    ceiling = getattr(settings, 'WHATSAPP_RETRY_MAX_SECONDS', 3600)
+    return timedelta(seconds=min(ceiling, base * 2 ** (attempts - 1)))
+
+
+def _claim_due(batch_size):
+    now = timezone.now()
+    due = WhatsAppOutboxMessage.objects.filter(
+        Q(status='QUEUED', next_attempt_at__lte=now)
+        | Q(status='SENDING', next_attempt_at__lte=now - STALE_SENDING_AFTER)
+    )
+    ids = list(due.order_by('next_attempt_at', 'id').values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return []
+    # Re-applying the due filter makes the claim atomic against other workers; the new
+    # next_attempt_at doubles as "sending since" for stale detection.
+    due.filter(id__in=ids).update(status='SENDING', next_attempt_at=now)
+    return list(WhatsAppOutboxMessage.objects.filter(id__in=ids, status='SENDING', next_attempt_at=now))
+
+
+def dispatch_outbox(*, batch_size=100):
+    """Send every due outbox message; returns a summary dict of sent/retrying/failed counts.
+
+    HTTP calls run on a few threads sharing the pooled session and the rate
+    limiter; all database writes stay on the calling thread.
+    """
+    summary = {'sent': 0, 'retrying': 0, 'failed': 0}
+    max_attempts = getattr(settings, 'WHATSAPP_MAX_ATTEMPTS', 5)
+    concurrency = max(1, getattr(settings, 'WHATSAPP_SEND_CONCURRENCY', 4))
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='footbook-whatsapp-send') as pool:
+        while True:
+            batch = _claim_due(batch_size)
+            if not batch:
+                return summary
+            results = pool.map(
+                lambda message: _post_template(
+                    recipient=message.recipient,
+                    template_name=message.template_name,
+                    language=message.language,
+                    parameters=message.parameters,
+                ),
+                batch,
+            )
+            now = timezone.now()
+            deliveries = []
+            for message, (message_id, error, retryable) in zip(batch, results):
+                message.attempts += 1
+                if message_id:
+                    message.status = 'SENT'
+                    message.message_id = message_id
+                    message.sent_at = now
+                    message.last_error = ''
+                    deliveries.append(WhatsAppDelivery(
+                        message_id=message_id,
+                        recipient=message.recipient,
+                        template_name=message.template_name,
+                        booking_id=message.booking_id,
+                    ))
+                    summary['sent'] += 1
+                elif retryable and message.attempts < max_attempts:
+                    message.status = 'QUEUED'
+                    message.next_attempt_at = now + _retry_delay(message.attempts)
+                    message.last_error = error[:255]
+                    summary['retrying'] += 1
+                else:
+                    message.status = 'FAILED'
+                    message.last_error = error[:255]
+                    summary['failed'] += 1
+            WhatsAppOutboxMessage.objects.bulk_update(
+                batch,
+                ['status', 'attempts', 'next_attempt_at', 'last_error', 'message_id', 'sent_at'],
+            )
+            if deliveries:
+                # A fast status callback may already have created the row; keep its status.
+                WhatsAppDelivery.objects.bulk_create(
+                    deliveries,
+                    update_conflicts=True,
+                    unique_fields=['message_id'],
+                    update_fields=['recipient', 'template_name', 'booking'],
+                )
+
+
+def merge_delivery_statuses(statuses, pending):
+    """Fold webhook `statuses` entries into `pending` ({message_id: update}) and return it.
+
+    A later status never downgrades an earlier one for the same message.
+    """
+    for status in statuses:
+        message_id = status.get('id')
+        code = (status.get('status') or '').upper()
+        if not message_id or code not in _DELIVERY_STATUS_RANK:
+            continue
+        current = pending.get(message_id)
+        if current is None or _DELIVERY_STATUS_RANK[code] >= _DELIVERY_STATUS_RANK[current['status']]:
+            pending[message_id] = {
+                'status': code,
+                'recipient': status.get('recipient_id') or '',
+                'timestamp': status.get('timestamp'),
+                'errors': status.get('errors') or [],
+            }
+    return pending
+
+
+def _status_time(timestamp):
+    try:
+        return datetime.fromtimestamp(int(timestamp), tz=dt_timezone.utc)
+    except (TypeError, ValueError):
+        return timezone.now()
+
+
+def write_delivery_statuses(pending):
+    """Upsert merged statuses with two queries; returns the number of messages written."""
+    existing = dict(
+        WhatsAppDelivery.objects.filter(message_id__in=pending).values_list('message_id', 'status')
+    )
+    rows = []
+    for message_id, update in pending.items():
+        current = existing.get(message_id)
+        if current and _DELIVERY_STATUS_RANK[update['status']] < _DELIVERY_STATUS_RANK.get(current, 0):
+            continue
+        error = update['errors'][0] if update['errors'] else {}
+        rows.append(WhatsAppDelivery(
+            message_id=message_id,
+            recipient=update['recipient'][:20],
+            status=update['status'],
+            error_code=str(error.get('code') or '')[:20],
+            error_title=(error.get('title') or '')[:255],
+            status_at=_status_time(update['timestamp']),
+        ))
+    if rows:
+        WhatsAppDelivery.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['message_id'],
+            update_fields=['status', 'error_code', 'error_title', 'status_at', 'updated_at'],
+        )
+    return len(rows)
+
+
 def send_test_template(recipient, *, template_name='hello_world', language='en_US'):
     """Use Meta's allow-listed test recipient flow without enabling booking sends."""
     return _send_template(
@@ -70,18 +385,24 @@ def send_test_template(recipient, *, template_name='hello_world', language='en_U
     )
 
 
-def send_owner_booking_update(booking):
-    """Send a pre-approved template; failures must never affect a booking."""
+def _owner_recipient(booking):
     if not getattr(settings, 'WHATSAPP_ENABLED', False):
-        return False
+        return ''
     owner = booking.slot.ground.owner
     if not getattr(owner, 'whatsapp_booking_updates_enabled', False):
-        return False
+        return ''
     recipient = _normalise_phone(getattr(owner, 'phone_number', ''))
     if not recipient:
-        logger.warning('WhatsApp booking update skipped: owner has no valid phone booking=%s', booking.id)
+        logger.warning('WhatsApp message skipped: owner has no valid phone booking=%s', booking.id)
+    return recipient
+
+
+def send_owner_booking_update(booking):
+    """Queue a pre-approved template; failures must never affect a booking."""
+    recipient = _owner_recipient(booking)
+    if not recipient:
         return False
-    return _send_template(
+    return queue_template(
         recipient=recipient,
         template_name=getattr(settings, 'WHATSAPP_BOOKING_TEMPLATE_NAME', ''),
         language=getattr(settings, 'WHATSAPP_TEMPLATE_LANGUAGE', 'en'),
@@ -94,4 +415,28 @@ def send_owner_booking_update(booking):
             booking.get_status_display(),
             booking.get_payment_status_display(),
         ],
+        booking=booking,
     )
+
+
+def queue_owner_reminders(bookings):
+    """Queue one reminder template per booking for owners who opted in; returns the number queued."""
+    template_name = getattr(settings, 'WHATSAPP_REMINDER_TEMPLATE_NAME', '')
+    if not template_name:
+        return 0
+    messages = []
+    for booking in bookings:
+        recipient = _owner_recipient(booking)
+        if recipient:
+            messages.append({
+                'recipient': recipient,
+                'template_name': template_name,
+                'parameters': [
+                    booking.slot.ground.name,
+                    booking.slot.date.strftime('%d %b %Y'),
+                    booking.slot.start_time.strftime('%I:%M %p'),
+                    booking.customer_name,
+                ],
+                'booking': booking,
+            })
+    return queue_templates(messages)
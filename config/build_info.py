@@ -0,0 +1,26 @@
+"""Version and build metadata, resolved once when the process starts.
+
+The version comes from the VERSION file; the git sha and build time come from
+BUILD_GIT_SHA / BUILD_TIME, which the deploy workflow sets as app settings.
+"""
+
+import os
+
+from django.conf import settings
+
+
+def load_build_info():
+    version = '0.0.0'
+    try:
+        with open(os.path.join(settings.BASE_DIR, 'VERSION'), 'r') as f:
+            version = f.read().strip() or version
+    except OSError:
+        pass
+    return {
+        'version': version,
+        'git_sha': os.getenv('BUILD_GIT_SHA', '').strip(),
+        'build_time': os.getenv('BUILD_TIME', '').strip(),
+    }
+
+
+BUILD_INFO = load_build_info()
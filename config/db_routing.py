@@ -0,0 +1,119 @@
+"""Read-replica routing.
+
+Every query goes to `default` unless it runs inside an explicit `read_only()`
+context (dashboards, analytics, CSV exports) and a `replica` database is
+configured. Reads in such a context go to the replica, except:
+
+- inside a transaction on `default`, so a view never mixes snapshots;
+- after the current request has written anything;
+- for REPLICA_STICKY_SECONDS after a request from the same browser wrote,
+  tracked by `PrimaryStickinessMiddleware` with a short-lived cookie, so a user
+  who just booked sees the booking on their dashboard despite replica lag.
+
+Values written to the shared cache are built under `use_primary()` (see
+bookings.caching), since a lagging read cached under a freshly bumped namespace
+version would be served to everyone until it expires.
+
+Without a `replica` entry in DATABASES the router is a no-op. Tests mirror the
+replica onto `default` (TEST["MIRROR"]), so routed reads see test data.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+STICKY_COOKIE = 'footbook_primary'
+
+_read_only = ContextVar('footbook_read_only', default=False)
+# Per-request state set by PrimaryStickinessMiddleware: {'pinned': bool, 'wrote': bool}.
+_request_state = ContextVar('footbook_db_request_state', default=None)
+
+
+def replica_alias():
+    alias = getattr(settings, 'DATABASE_REPLICA_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def sticky_seconds():
+    return int(getattr(settings, 'REPLICA_STICKY_SECONDS', 10))
+
+
+@contextmanager
+def read_only():
+    """Send reads in this block (or decorated view) to the replica when it is safe to."""
+    token = _read_only.set(True)
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Read from `default` inside this block, even within a read_only() context."""
+    token = _read_only.set(False)
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
+
+
+def _primary_required():
+    state = _request_state.get()
+    if state is not None and (state['pinned'] or state['wrote']):
+        return True
+    return connections[DEFAULT_DB_ALIAS].in_atomic_block
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        if alias is None or not _read_only.get() or _primary_required():
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is fed by replication, never migrated directly.
+        if db == replica_alias():
+            return False
+        return None
+
+
+class PrimaryStickinessMiddleware:
+    """Pin a browser's routed reads to the primary for a short period after it writes."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = {'pinned': STICKY_COOKIE in request.COOKIES, 'wrote': False}
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if replica_alias() is not None and (state['wrote'] or request.method not in ('GET', 'HEAD', 'OPTIONS')):
+            response.set_cookie(
+                STICKY_COOKIE,
+                '1',
+                max_age=sticky_seconds(),
+                httponly=True,
+                secure=request.is_secure(),
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,13 @@
+"""Gunicorn hooks; worker settings are passed on the command line by config.startup."""
+
+
+def post_fork(server, worker):
+    # With --preload the master imports the app before forking; sockets it opened
+    # must not be shared with workers, so each worker starts with fresh connections.
+    from django.core.cache import caches
+    from django.db import connections
+
+    connections.close_all()
+    for cache in caches.all(initialized_only=True):
+        cache.close()
+
@@ -10,9 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import importlib.util
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -106,6 +108,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "config.db_routing.PrimaryStickinessMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -159,6 +162,54 @@ else:
         }
     }
 
+# Read replica: reads inside db_routing.read_only() blocks (dashboards, analytics, exports)
+# go here. Set DB_REPLICA_HOST for a Postgres replica, or DB_REPLICA_NAME to point the
+# SQLite setup at a second database file (e.g. a copy of db.sqlite3) for local testing.
+if os.getenv("DB_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": os.getenv("DB_REPLICA_HOST"),
+        "PORT": os.getenv("DB_REPLICA_PORT", DATABASES["default"].get("PORT", "5432")),
+    }
+elif os.getenv("DB_REPLICA_NAME"):
+    DATABASES["replica"] = {**DATABASES["default"], "NAME": os.getenv("DB_REPLICA_NAME")}
+if "replica" in DATABASES:
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+DATABASE_ROUTERS = ["config.db_routing.ReplicaRouter"]
+DATABASE_REPLICA_ALIAS = "replica"
+# After a request writes, that browser's routed reads stay on the primary for this long.
+REPLICA_STICKY_SECONDS = int(env_text("REPLICA_STICKY_SECONDS", "10"))
+
+
+# Cache
+# CACHE_BACKEND picks locmem (per process, the default), file (shared by workers on one
+# host) or redis (shared across hosts). Asking for redis without the redis package is an
+# error: a silent per-process fallback would hide invalidations from the other workers.
+CACHE_BACKEND = env_text("CACHE_BACKEND", "locmem").lower()
+CACHE_KEY_PREFIX = env_text("CACHE_KEY_PREFIX", "footbook")
+CACHE_DEFAULT_TIMEOUT = int(env_text("CACHE_DEFAULT_TIMEOUT", "300"))
+if CACHE_BACKEND == "redis":
+    if importlib.util.find_spec("redis") is None:
+        raise ImproperlyConfigured("CACHE_BACKEND=redis requires the redis package (pip install -r requirements.txt).")
+    _cache_backend = "django.core.cache.backends.redis.RedisCache"
+    _cache_location = env_text("REDIS_URL", "redis://127.0.0.1:6379/1")
+elif CACHE_BACKEND == "file":
+    _cache_backend = "django.core.cache.backends.filebased.FileBasedCache"
+    _cache_location = env_text("CACHE_LOCATION", str(BASE_DIR / ".cache"))
+else:
+    _cache_backend = "django.core.cache.backends.locmem.LocMemCache"
+    _cache_location = "footbook"
+CACHES = {
+    "default": {
+        "BACKEND": _cache_backend,
+        "LOCATION": _cache_location,
+        "KEY_PREFIX": CACHE_KEY_PREFIX,
+        # Bump CACHE_VERSION on deploys that change the shape of cached payloads.
+        "VERSION": int(env_text("CACHE_VERSION", "1")),
+        "TIMEOUT": CACHE_DEFAULT_TIMEOUT,
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -187,6 +238,15 @@ STATICFILES_DIRS = [BASE_DIR / "static"]
 STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# Admin export files (PII); kept outside MEDIA_ROOT and served only through the admin download view.
+EXPORT_ROOT = Path(env_text("EXPORT_ROOT", str(BASE_DIR / "private" / "exports")))
+# Resized WebP/JPEG ground images, built by `sync_ground_images` or on first request.
+GROUND_IMAGE_VARIANT_DIR = Path(env_text("GROUND_IMAGE_VARIANT_DIR", str(MEDIA_ROOT / "ground-variants")))
+GROUND_IMAGE_MAX_AGE = int(env_text("GROUND_IMAGE_MAX_AGE", "604800"))
+# Tournament images and review photos are stripped of EXIF, capped at UPLOAD_IMAGE_MAX_SIDE
+# and re-encoded as WebP/JPEG at each width for srcset.
+UPLOAD_IMAGE_MAX_SIDE = int(env_text("UPLOAD_IMAGE_MAX_SIDE", "2048"))
+UPLOAD_IMAGE_WIDTHS = [int(width) for width in env_list("UPLOAD_IMAGE_WIDTHS", ["480", "1080"])]
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -215,6 +275,8 @@ EMAIL_SENDER_ADDRESS = env_text("EMAIL_SENDER_ADDRESS", EMAIL_HOST_USER)
 DEFAULT_FROM_EMAIL = f"{EMAIL_SENDER_NAME} <{EMAIL_SENDER_ADDRESS}>"
 SERVER_EMAIL = EMAIL_SENDER_ADDRESS
 EMAIL_SUBJECT_PREFIX = env_text("EMAIL_SUBJECT_PREFIX", "[FootBook] ")
+# Owners on an hourly/daily digest still get these booking events by email straight away.
+OWNER_DIGEST_URGENT_EVENTS = env_list("OWNER_DIGEST_URGENT_EVENTS", ["BOOKING_CANCELLED"])
 EMAIL_BACKEND = os.getenv(
     "EMAIL_BACKEND",
     (
@@ -234,6 +296,44 @@ WHATSAPP_BOOKING_TEMPLATE_NAME = env_text('WHATSAPP_BOOKING_TEMPLATE_NAME', '')
 WHATSAPP_TEMPLATE_LANGUAGE = env_text('WHATSAPP_TEMPLATE_LANGUAGE', 'en')
 WHATSAPP_WEBHOOK_VERIFY_TOKEN = env_text('WHATSAPP_WEBHOOK_VERIFY_TOKEN', '')
 WHATSAPP_APP_SECRET = env_text('WHATSAPP_APP_SECRET', '')
+# Delivery-status webhook events are applied in batches of this many, one upsert per batch.
+WHATSAPP_STATUS_BATCH_SIZE = int(env_text('WHATSAPP_STATUS_BATCH_SIZE', '200'))
+WHATSAPP_REMINDER_TEMPLATE_NAME = env_text('WHATSAPP_REMINDER_TEMPLATE_NAME', '')
+WHATSAPP_GRAPH_BASE_URL = env_text('WHATSAPP_GRAPH_BASE_URL', 'https://graph.facebook.com')
+WHATSAPP_CONNECT_TIMEOUT = float(env_text('WHATSAPP_CONNECT_TIMEOUT', '3.05'))
+WHATSAPP_READ_TIMEOUT = float(env_text('WHATSAPP_READ_TIMEOUT', '10'))
+WHATSAPP_POOL_SIZE = int(env_text('WHATSAPP_POOL_SIZE', '10'))
+WHATSAPP_SEND_CONCURRENCY = int(env_text('WHATSAPP_SEND_CONCURRENCY', '4'))
+# Meta's default throughput per business phone number is 80 messages/second. The limit is
+# counted in the cache, so it only spans all workers and cron jobs with CACHE_BACKEND=redis.
+WHATSAPP_MESSAGES_PER_SECOND = float(env_text('WHATSAPP_MESSAGES_PER_SECOND', '80'))
+# Retryable send failures back off base * 2^(attempt-1) seconds, capped, up to WHATSAPP_MAX_ATTEMPTS.
+WHATSAPP_MAX_ATTEMPTS = int(env_text('WHATSAPP_MAX_ATTEMPTS', '5'))
+WHATSAPP_RETRY_BASE_SECONDS = int(env_text('WHATSAPP_RETRY_BASE_SECONDS', '30'))
+WHATSAPP_RETRY_MAX_SECONDS = int(env_text('WHATSAPP_RETRY_MAX_SECONDS', '3600'))
+
+# Web Push (VAPID). Generate a key pair once (e.g. `vapid --gen`) and keep the private key secret;
+# push alerts stay off until both keys are set and pywebpush is installed.
+VAPID_PUBLIC_KEY = env_text('VAPID_PUBLIC_KEY', '')
+VAPID_PRIVATE_KEY = env_secret('VAPID_PRIVATE_KEY', '')
+VAPID_CLAIM_SUBJECT = env_text('VAPID_CLAIM_SUBJECT', f'mailto:{EMAIL_SENDER_ADDRESS}')
+PUSH_MAX_WORKERS = int(env_text('PUSH_MAX_WORKERS', '8'))
+PUSH_TIMEOUT_SECONDS = float(env_text('PUSH_TIMEOUT_SECONDS', '5'))
+PUSH_TTL_SECONDS = int(env_text('PUSH_TTL_SECONDS', '600'))
+# Tournament announcements stay relevant for a day, unlike last-minute slot alerts.
+PUSH_TOURNAMENT_TTL_SECONDS = int(env_text('PUSH_TOURNAMENT_TTL_SECONDS', '86400'))
+# Subscriptions are only accepted for these push services (a host or any subdomain of it),
+# so the server never POSTs to an arbitrary user-supplied URL.
+PUSH_ALLOWED_HOSTS = env_list('PUSH_ALLOWED_HOSTS', [
+    'fcm.googleapis.com',
+    'push.services.mozilla.com',
+    'push.apple.com',
+    'notify.windows.com',
+])
+# Endpoints failing this many sends in a row (without a 404/410) are pruned too.
+PUSH_MAX_FAILURES = int(env_text('PUSH_MAX_FAILURES', '5'))
+# A cancelled slot is held this long for the first waitlisted player before anyone can book it.
+SLOT_WAITLIST_HOLD_MINUTES = int(env_text('SLOT_WAITLIST_HOLD_MINUTES', '15'))
 STATICFILES_STORAGE = (
     "django.contrib.staticfiles.storage.StaticFilesStorage"
     if DEBUG
@@ -257,11 +357,23 @@ CSRF_FAILURE_VIEW = "accounts.views.csrf_failure"
 RAZORPAY_KEY_ID = env_secret("RAZORPAY_KEY_ID", "")
 RAZORPAY_KEY_SECRET = env_secret("RAZORPAY_KEY_SECRET", "")
 RAZORPAY_WEBHOOK_SECRET = env_secret("RAZORPAY_WEBHOOK_SECRET", "")
+# Shared Razorpay HTTP session: pooled keep-alive connections, bounded timeouts and
+# a circuit breaker that fails fast after consecutive gateway errors.
+RAZORPAY_BASE_URL = env_text("RAZORPAY_BASE_URL", "https://api.razorpay.com")
+RAZORPAY_CONNECT_TIMEOUT = float(os.getenv("RAZORPAY_CONNECT_TIMEOUT", "3.05"))
+RAZORPAY_READ_TIMEOUT = float(os.getenv("RAZORPAY_READ_TIMEOUT", "10"))
+RAZORPAY_POOL_SIZE = int(os.getenv("RAZORPAY_POOL_SIZE", "10"))
+RAZORPAY_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("RAZORPAY_CIRCUIT_FAILURE_THRESHOLD", "5"))
+RAZORPAY_CIRCUIT_RESET_SECONDS = float(os.getenv("RAZORPAY_CIRCUIT_RESET_SECONDS", "30"))
+# Re-opening checkout for the same slot/mode/amount within this window reuses the pending order.
+RAZORPAY_ORDER_REUSE_SECONDS = int(os.getenv("RAZORPAY_ORDER_REUSE_SECONDS", "900"))
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY", "")
 STRIPE_PUBLIC_KEY = os.getenv("STRIPE_PUBLIC_KEY", "")
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "")
 STRIPE_CURRENCY = os.getenv("STRIPE_CURRENCY", "inr")
 SECURE_SSL_REDIRECT = env_bool("SECURE_SSL_REDIRECT", default=not DEBUG)
+# Load balancer health probes hit the app over plain HTTP.
+SECURE_REDIRECT_EXEMPT = [r"^healthz$"]
 
 PREPEND_WWW = env_bool("PREPEND_WWW", default=False)
 FOOTBOOK_DEMO_MODE = env_bool("FOOTBOOK_DEMO_MODE", default=False)
@@ -280,5 +392,11 @@ LOGGING = {
             "level": os.getenv("FOOTBOOK_LOG_LEVEL", "INFO"),
             "propagate": False,
         },
+        # Per-call Razorpay latency lines (method, path, status, duration_ms).
+        "bookings.razorpay_gateway": {
+            "handlers": ["console"],
+            "level": os.getenv("RAZORPAY_LOG_LEVEL", "INFO"),
+            "propagate": False,
+        },
     },
 }
@@ -1,22 +1,163 @@
+"""Container entry point: run the boot steps that are needed, then exec gunicorn.
+
+Boot steps are skipped when they would be no-ops: `migrate` only runs when the
+migration plan is non-empty, and `collectstatic` only when the static source
+fingerprint differs from the one recorded after the last collection. Set
+STARTUP_MIGRATE / STARTUP_COLLECTSTATIC to `always` or `never` to override.
+
+The gunicorn command line comes from a server profile (SERVER_PROFILE):
+
+- `gthread` (default): CPU-count workers with GUNICORN_THREADS threads each,
+  suited to the I/O-bound views (payment gateway, email, push).
+- `sync`: the classic 2 * CPU + 1 single-threaded workers.
+
+WEB_CONCURRENCY overrides the worker count. The app is preloaded in the master
+(config.gunicorn_conf closes inherited DB and cache connections after fork)
+and workers are recycled after GUNICORN_MAX_REQUESTS requests.
+"""
+
+import hashlib
 import os
 import subprocess
 import sys
 
 
+STATIC_FINGERPRINT_FILE = ".footbook-static-fingerprint"
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def server_profile(cpu_count=None):
+    cpus = max(1, cpu_count or os.cpu_count() or 1)
+    profile = (os.getenv("SERVER_PROFILE") or "gthread").strip().lower()
+    if profile == "sync":
+        workers, threads = 2 * cpus + 1, 1
+    else:
+        profile = "gthread"
+        workers, threads = max(2, cpus), _env_int("GUNICORN_THREADS", 4)
+    return {
+        "worker_class": profile,
+        "workers": _env_int("WEB_CONCURRENCY", workers),
+        "threads": threads,
+        "timeout": _env_int("GUNICORN_TIMEOUT", 60),
+        "max_requests": _env_int("GUNICORN_MAX_REQUESTS", 1000),
+        "max_requests_jitter": _env_int("GUNICORN_MAX_REQUESTS_JITTER", 100),
+        "preload": (os.getenv("GUNICORN_PRELOAD") or "true").strip().lower() in {"1", "true", "yes", "on"},
+    }
+
+
+def gunicorn_args(port, profile):
+    args = [
+        "gunicorn",
+        "config.wsgi:application",
+        "--bind",
+        f"0.0.0.0:{port}",
+        "--config",
+        "python:config.gunicorn_conf",
+        "--worker-class",
+        profile["worker_class"],
+        "--workers",
+        str(profile["workers"]),
+        "--timeout",
+        str(profile["timeout"]),
+    ]
+    if profile["worker_class"] == "gthread":
+        args += ["--threads", str(profile["threads"])]
+    if profile["max_requests"] > 0:
+        args += ["--max-requests", str(profile["max_requests"]), "--max-requests-jitter", str(profile["max_requests_jitter"])]
+    if profile["preload"]:
+        args.append("--preload")
+    return args
+
+
+def _setup_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    import django
+
+    django.setup()
+
+
+def has_pending_migrations():
+    from django.db import connections
+    from django.db.migrations.executor import MigrationExecutor
+
+    connection = connections["default"]
+    try:
+        executor = MigrationExecutor(connection)
+        return bool(executor.migration_plan(executor.loader.graph.leaf_nodes()))
+    finally:
+        connection.close()
+
+
+def static_fingerprint():
+    """Hash of every static source file's path, size and mtime, as found by the staticfiles finders."""
+    from django.contrib.staticfiles.finders import get_finders
+
+    digest = hashlib.sha256()
+    entries = []
+    for finder in get_finders():
+        for path, storage in finder.list([]):
+            stat = os.stat(storage.path(path))
+            entries.append(f"{path}\0{stat.st_size}\0{int(stat.st_mtime)}")
+    for entry in sorted(entries):
+        digest.update(entry.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def _fingerprint_path():
+    from django.conf import settings
+
+    return os.path.join(settings.STATIC_ROOT, STATIC_FINGERPRINT_FILE)
+
+
+def static_is_current(fingerprint):
+    try:
+        with open(_fingerprint_path()) as f:
+            return f.read().strip() == fingerprint
+    except OSError:
+        return False
+
+
+def record_static_fingerprint(fingerprint):
+    with open(_fingerprint_path(), "w") as f:
+        f.write(fingerprint)
+
+
+def _step_mode(name):
+    mode = (os.getenv(name) or "auto").strip().lower()
+    return mode if mode in {"auto", "always", "never"} else "auto"
+
+
+def run_boot_steps():
+    _setup_django()
+
+    migrate = _step_mode("STARTUP_MIGRATE")
+    if migrate == "always" or (migrate == "auto" and has_pending_migrations()):
+        subprocess.check_call([sys.executable, "manage.py", "migrate", "--noinput"])
+    else:
+        print("startup: no pending migrations, skipping migrate", flush=True)
+
+    collect = _step_mode("STARTUP_COLLECTSTATIC")
+    fingerprint = static_fingerprint() if collect != "never" else None
+    if collect == "always" or (collect == "auto" and not static_is_current(fingerprint)):
+        subprocess.check_call([sys.executable, "manage.py", "collectstatic", "--noinput"])
+        record_static_fingerprint(fingerprint)
+    else:
+        print("startup: static files unchanged, skipping collectstatic", flush=True)
+
+
 def main():
-    subprocess.check_call([sys.executable, "manage.py", "migrate", "--noinput"])
-    subprocess.check_call([sys.executable, "manage.py", "collectstatic", "--noinput"])
+    run_boot_steps()
 
     port = os.getenv("PORT", "8000")
-    os.execvp(
-        "gunicorn",
-        [
-            "gunicorn",
-            "config.wsgi:application",
-            "--bind",
-            f"0.0.0.0:{port}",
-        ],
-    )
+    args = gunicorn_args(port, server_profile())
+    os.execvp("gunicorn", args)
 
 
 if __name__ == "__main__":
@@ -1,14 +1,17 @@
 from io import StringIO
 import sys
+import threading
 
-from django.test import SimpleTestCase
-from django.test import override_settings
+from django.test import SimpleTestCase, TestCase
+from django.test import RequestFactory, override_settings
+from django.http import HttpResponse
 from django.core.management import call_command
 from django.core.management.base import CommandError
 from unittest.mock import patch
 
 from config.settings import env_secret, env_text
-from config import startup
+from accounts.models import User
+from config import db_routing, startup
 
 
 class EnvHelpersTests(SimpleTestCase):
@@ -43,13 +46,144 @@ class EnvHelpersTests(SimpleTestCase):
 
     @patch("config.startup.subprocess.check_call")
     @patch("config.startup.os.execvp")
-    @patch("config.startup.os.getenv", return_value="9000")
-    def test_startup_invokes_manage_commands_and_gunicorn(self, mocked_getenv, mocked_execvp, mocked_check_call):
+    @patch("config.startup.record_static_fingerprint")
+    @patch("config.startup.static_is_current", return_value=False)
+    @patch("config.startup.has_pending_migrations", return_value=True)
+    @patch.dict("os.environ", {"PORT": "9000", "SERVER_PROFILE": "sync", "WEB_CONCURRENCY": "3"})
+    def test_startup_invokes_manage_commands_and_gunicorn(self, _pending, _current, mocked_record, mocked_execvp, mocked_check_call):
         startup.main()
 
         mocked_check_call.assert_any_call([sys.executable, "manage.py", "migrate", "--noinput"])
         mocked_check_call.assert_any_call([sys.executable, "manage.py", "collectstatic", "--noinput"])
-        mocked_execvp.assert_called_once_with(
-            "gunicorn",
-            ["gunicorn", "config.wsgi:application", "--bind", "0.0.0.0:9000"],
+        mocked_record.assert_called_once()
+        args = mocked_execvp.call_args.args[1]
+        self.assertEqual(args[:4], ["gunicorn", "config.wsgi:application", "--bind", "0.0.0.0:9000"])
+        self.assertIn("python:config.gunicorn_conf", args)
+        self.assertEqual(args[args.index("--worker-class") + 1], "sync")
+        self.assertEqual(args[args.index("--workers") + 1], "3")
+        self.assertNotIn("--threads", args)
+        self.assertIn("--preload", args)
+
+    @patch("config.startup.subprocess.check_call")
+    @patch("config.startup.static_is_current", return_value=True)
+    @patch("config.startup.has_pending_migrations", return_value=False)
+    def test_startup_skips_boot_steps_that_are_up_to_date(self, _pending, _current, mocked_check_call):
+        startup.run_boot_steps()
+
+        mocked_check_call.assert_not_called()
+
+    @patch("config.startup.subprocess.check_call")
+    @patch("config.startup.has_pending_migrations", return_value=False)
+    @patch.dict("os.environ", {"STARTUP_MIGRATE": "always", "STARTUP_COLLECTSTATIC": "never"})
+    def test_startup_step_overrides(self, mocked_pending, mocked_check_call):
+        startup.run_boot_steps()
+
+        mocked_pending.assert_not_called()
+        mocked_check_call.assert_called_once_with([sys.executable, "manage.py", "migrate", "--noinput"])
+
+    @patch.dict("os.environ", {}, clear=True)
+    def test_server_profile_derives_workers_from_cpu_count(self):
+        gthread = startup.server_profile(cpu_count=4)
+        self.assertEqual((gthread["worker_class"], gthread["workers"], gthread["threads"]), ("gthread", 4, 4))
+        self.assertEqual(gthread["max_requests"], 1000)
+
+        with patch.dict("os.environ", {"SERVER_PROFILE": "sync", "GUNICORN_MAX_REQUESTS": "0"}):
+            sync = startup.server_profile(cpu_count=4)
+        self.assertEqual((sync["worker_class"], sync["workers"]), ("sync", 9))
+        self.assertNotIn("--max-requests", startup.gunicorn_args("8000", sync))
+
+    def test_static_fingerprint_is_stable(self):
+        self.assertEqual(startup.static_fingerprint(), startup.static_fingerprint())
+
+
+class HealthzTests(TestCase):
+    @patch.dict("config.build_info.BUILD_INFO", {"version": "9.9.9", "git_sha": "abc123", "build_time": "2026-01-01T00:00:00Z"})
+    def test_healthz_reports_build_metadata(self):
+        response = self.client.get("/healthz")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "no-store")
+        self.assertEqual(
+            response.json(),
+            {"status": "ok", "version": "9.9.9", "git_sha": "abc123", "build_time": "2026-01-01T00:00:00Z"},
         )
+
+
+@patch("config.db_routing.replica_alias", return_value="replica")
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.router = db_routing.ReplicaRouter()
+
+    def test_only_read_only_blocks_use_the_replica(self, _alias):
+        self.assertEqual(self.router.db_for_read(User), "default")
+        with db_routing.read_only():
+            self.assertEqual(self.router.db_for_read(User), "replica")
+        self.assertEqual(self.router.db_for_read(User), "default")
+
+    def test_decorated_views_keep_routing_state_per_thread(self, _alias):
+        both_inside = threading.Barrier(2, timeout=5)
+        seen, errors = [], []
+
+        @db_routing.read_only()
+        def view():
+            both_inside.wait()
+            seen.append(self.router.db_for_read(User))
+
+        def run():
+            try:
+                view()
+                seen.append(self.router.db_for_read(User))
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=run) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(seen), ["default", "default", "replica", "replica"])
+
+    def test_cache_builders_read_the_primary(self, _alias):
+        from bookings.caching import get_or_build
+
+        seen = []
+        with db_routing.read_only():
+            get_or_build("routing-test", lambda: seen.append(self.router.db_for_read(User)) or True)
+            seen.append(self.router.db_for_read(User))
+        self.assertEqual(seen, ["default", "replica"])
+
+    def test_router_is_a_no_op_without_a_replica(self, mocked_alias):
+        mocked_alias.return_value = None
+        with db_routing.read_only():
+            self.assertEqual(self.router.db_for_read(User), "default")
+
+    def test_write_in_request_pins_later_reads_to_primary(self, _alias):
+        seen = []
+
+        def view(request):
+            with db_routing.read_only():
+                seen.append(self.router.db_for_read(User))
+                self.router.db_for_write(User)
+                seen.append(self.router.db_for_read(User))
+            return HttpResponse()
+
+        response = db_routing.PrimaryStickinessMiddleware(view)(RequestFactory().get("/"))
+
+        self.assertEqual(seen, ["replica", "default"])
+        self.assertEqual(response.cookies[db_routing.STICKY_COOKIE]["max-age"], db_routing.sticky_seconds())
+
+    def test_sticky_cookie_pins_reads_after_a_post(self, _alias):
+        def view(request):
+            with db_routing.read_only():
+                return HttpResponse(self.router.db_for_read(User))
+
+        middleware = db_routing.PrimaryStickinessMiddleware(view)
+        response = middleware(RequestFactory().post("/"))
+        self.assertIn(db_routing.STICKY_COOKIE, response.cookies)
+
+        request = RequestFactory().get("/")
+        request.COOKIES[db_routing.STICKY_COOKIE] = "1"
+        self.assertEqual(middleware(request).content, b"default")
+        self.assertEqual(middleware(RequestFactory().get("/")).content, b"replica")
@@ -3,10 +3,12 @@ from django.contrib.auth import views as auth_views
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib.sitemaps.views import sitemap
-from django.http import HttpResponse
+from django.db import DatabaseError, connection
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import redirect
 from django.urls import include, path, re_path
 from bookings.sitemaps import StaticViewSitemap
+from config.build_info import BUILD_INFO
 
 
 sitemaps = {
@@ -23,6 +25,19 @@ def robots_txt(request):
     return HttpResponse("\n".join(lines), content_type="text/plain")
 
 
+def healthz(request):
+    """Load balancer probe: build metadata, and 503 while the database is unreachable."""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        status = 'ok'
+    except DatabaseError:
+        status = 'database-unavailable'
+    response = JsonResponse({'status': status, **BUILD_INFO}, status=200 if status == 'ok' else 503)
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
 def redirect_unknown(request, path=None):
     if request.user.is_authenticated:
         if request.user.role == 'admin':
@@ -39,6 +54,7 @@ urlpatterns = [
 
     path('sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
     path('robots.txt', robots_txt, name='robots_txt'),
+    path('healthz', healthz, name='healthz'),
 
     path('', include('bookings.urls')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT) + [
@@ -4,17 +4,20 @@ from datetime import timedelta
 
 # Register your models here.
 from .models import Ground, Tournament, TournamentRegistration, GroundReview
+from bookings.caching import GROUNDS, invalidate
 from bookings.slot_generation import ensure_slots_for_ground_date
 
 
 @admin.action(description='Mark selected grounds as available')
 def mark_ground_available(modeladmin, request, queryset):
     queryset.update(is_active=True)
+    invalidate(GROUNDS)
 
 
 @admin.action(description='Mark selected grounds as temporarily unavailable')
 def mark_ground_unavailable(modeladmin, request, queryset):
     queryset.update(is_active=False)
+    invalidate(GROUNDS)
 
 
 @admin.action(description='Generate slots for next 3 months')
@@ -44,8 +47,11 @@ class GroundAdmin(admin.ModelAdmin):
         'night_price',
         'is_active',
         'last_minute_price_drop_enabled',
+        'review_count',
+        'avg_rating',
         'created_at',
     )
+    readonly_fields = ('review_count', 'avg_rating')
     search_fields = ('name', 'location')
     list_filter = ('is_active', 'last_minute_price_drop_enabled')
     actions = (mark_ground_available, mark_ground_unavailable, generate_slots_for_3_months)
@@ -0,0 +1,182 @@
+"""Ground image pipeline.
+
+Each ground's source image (its `image` path, or a match in `groundsimages/`)
+is resolved once per process and rendered with Pillow into fixed-size variants
+(`GROUND_IMAGE_SIZES`) in both WebP and JPEG. Variant files are named after the
+source's identity (path, size and mtime), so pointing a ground at a different
+file can never serve the old picture, even if the new file is older.
+`sync_ground_images` builds the variants ahead of time; anything missing is
+built on first request. `ground_image` serves them with long-lived cache headers, an
+ETag and Last-Modified so browsers revalidate instead of re-downloading.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+
+from django.conf import settings
+
+try:
+    from PIL import Image, ImageOps, UnidentifiedImageError
+except ImportError:  # pragma: no cover - Pillow is in requirements.txt
+    Image = None
+    ImageOps = None
+    UnidentifiedImageError = OSError
+
+
+logger = logging.getLogger(__name__)
+
+# name -> (width, height); variants are centre-cropped to exactly this size.
+GROUND_IMAGE_SIZES = {
+    'thumb': (480, 270),
+    'card': (960, 540),
+}
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Ground names whose file in groundsimages/ does not contain the name itself.
+SPECIAL_FILENAMES = {
+    'Simpliz Turf': 'simplisturf.webp',
+}
+
+_sources = {}
+_undecodable = set()
+_images_index = None
+_lock = threading.Lock()
+
+
+def normalize(name):
+    return ''.join(ch for ch in name.lower() if ch.isalnum())
+
+
+def images_dir():
+    return os.path.join(settings.BASE_DIR, 'groundsimages')
+
+
+def variants_dir():
+    return str(getattr(settings, 'GROUND_IMAGE_VARIANT_DIR', os.path.join(settings.MEDIA_ROOT, 'ground-variants')))
+
+
+def _groundsimages_index():
+    """Normalised filename -> filename for groundsimages/, listed once per process."""
+    global _images_index
+    if _images_index is None:
+        folder = images_dir()
+        index = {}
+        if os.path.isdir(folder):
+            for filename in sorted(os.listdir(folder)):
+                if os.path.isfile(os.path.join(folder, filename)):
+                    index[normalize(filename)] = filename
+        _images_index = index
+    return _images_index
+
+
+def _find_source(name, image):
+    if image:
+        if os.path.isabs(image) and os.path.isfile(image):
+            return image
+        relative = os.path.join(settings.BASE_DIR, image.lstrip('/'))
+        if os.path.isfile(relative):
+            return relative
+
+    index = _groundsimages_index()
+    filename = SPECIAL_FILENAMES.get(name)
+    if filename and normalize(filename) in index:
+        return os.path.join(images_dir(), filename)
+    norm = normalize(name)
+    for key, filename in index.items():
+        if norm in key:
+            return os.path.join(images_dir(), filename)
+    return None
+
+
+def resolve_source(ground_id, name, image):
+    """Path of the ground's source image, or None; cached until the name or image changes."""
+    cache_key = (ground_id, name, image or '')
+    if cache_key not in _sources:
+        _sources[cache_key] = _find_source(name, image)
+    return _sources[cache_key]
+
+
+def reset_caches():
+    global _images_index
+    with _lock:
+        _images_index = None
+        _sources.clear()
+        _undecodable.clear()
+
+
+def source_identity(source):
+    """Short digest of the source's path, size and mtime; raises OSError if it is gone."""
+    stat = os.stat(source)
+    key = f'{os.path.abspath(source)}\0{stat.st_size}\0{stat.st_mtime_ns}'
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+
+
+def variant_path(ground_id, identity, size, fmt):
+    return os.path.join(variants_dir(), f'{ground_id}-{identity}-{size}.{fmt}')
+
+
+def _remove_old_variants(ground_id, identity):
+    prefix = f'{ground_id}-'
+    current = f'{prefix}{identity}-'
+    for filename in os.listdir(variants_dir()):
+        if filename.startswith(prefix) and not filename.startswith(current):
+            try:
+                os.remove(os.path.join(variants_dir(), filename))
+            except OSError:
+                pass
+
+
+def build_variants(ground_id, source):
+    """Render every size/format variant of `source`; returns the number written."""
+    if Image is None:
+        return 0
+    os.makedirs(variants_dir(), exist_ok=True)
+    identity = source_identity(source)
+    with Image.open(source) as original:
+        picture = ImageOps.exif_transpose(original).convert('RGB')
+    written = 0
+    for size, dimensions in GROUND_IMAGE_SIZES.items():
+        resized = ImageOps.fit(picture, dimensions, method=Image.Resampling.LANCZOS)
+        for fmt, (pil_format, _content_type, options) in FORMATS.items():
+            target = variant_path(ground_id, identity, size, fmt)
+            # Write then rename so a concurrent request never serves a half-written file.
+            partial = f'{target}.{threading.get_ident()}.tmp'
+            resized.save(partial, pil_format, **options)
+            os.replace(partial, target)
+            written += 1
+    _remove_old_variants(ground_id, identity)
+    return written
+
+
+def get_variant(ground_id, source, size, fmt):
+    """Path of the requested variant, building all variants once if missing.
+
+    Returns None when the source cannot be decoded (e.g. an SVG) or has gone,
+    so the caller can fall back to the original file.
+    """
+    try:
+        identity = source_identity(source)
+    except OSError:
+        return None
+    if identity in _undecodable:
+        return None
+    path = variant_path(ground_id, identity, size, fmt)
+    if not os.path.isfile(path):
+        with _lock:
+            if not os.path.isfile(path):
+                try:
+                    build_variants(ground_id, source)
+                except (UnidentifiedImageError, OSError, ValueError):
+                    logger.warning('Could not build image variants ground=%s source=%s', ground_id, source, exc_info=True)
+                    _undecodable.add(identity)
+                    return None
+    return path if os.path.isfile(path) else None
+
+
+def content_type_for(fmt):
+    return FORMATS[fmt][1]
@@ -1,20 +1,21 @@
 from django.core.management.base import BaseCommand
 from django.conf import settings
+from grounds.images import build_variants, normalize, reset_caches, resolve_source, variants_dir
 from grounds.models import Ground
 import os, shutil
 
 
-def normalize(s):
-    return ''.join(ch for ch in s.lower() if ch.isalnum())
-
-
 class Command(BaseCommand):
-    help = 'Sync images from project groundsimages/ into static/images/grounds and set Ground.image paths'
+    help = (
+        'Sync images from project groundsimages/ into static/images/grounds, set Ground.image paths '
+        'and build the resized WebP/JPEG variants served by ground_image'
+    )
 
     def add_arguments(self, parser):
         parser.add_argument('--source', help='Source images directory (default: <BASE_DIR>/groundsimages)', default=None)
         parser.add_argument('--dest', help='Destination static directory (default: static/images/grounds)', default=None)
         parser.add_argument('--dry-run', action='store_true', help='Show actions without copying')
+        parser.add_argument('--skip-variants', action='store_true', help='Copy images without building resized variants')
 
     def handle(self, *args, **options):
         base = settings.BASE_DIR
@@ -40,6 +41,7 @@ class Command(BaseCommand):
             lookup[key] = f
 
         updated = 0
+        variants = 0
         for ground in Ground.objects.all():
             norm = normalize(ground.name)
             # Try exact filename match first
@@ -75,4 +77,14 @@ class Command(BaseCommand):
             else:
                 self.stdout.write(self.style.NOTICE(f'No image match for ground {ground.name}'))
 
-        self.stdout.write(self.style.SUCCESS(f'Done. {updated} grounds updated.'))
+            if dry or options['skip_variants']:
+                continue
+            source = resolve_source(ground.id, ground.name, ground.image)
+            if source:
+                try:
+                    variants += build_variants(ground.id, source)
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f'Could not build variants for {ground.name}: {e}'))
+
+        reset_caches()
+        self.stdout.write(self.style.SUCCESS(f'Done. {updated} grounds updated, {variants} image variants written to {variants_dir()}.'))
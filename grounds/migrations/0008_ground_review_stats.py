@@ -0,0 +1,39 @@
+# Generated by Django 4.2.28 on 2026-10-19 02:05
+
+from django.db import migrations, models
+
+
+def backfill_review_stats(apps, schema_editor):
+    Ground = apps.get_model('grounds', 'Ground')
+    GroundReview = apps.get_model('grounds', 'GroundReview')
+    stats = GroundReview.objects.values('ground_id').annotate(count=models.Count('id'), average=models.Avg('rating'))
+    for row in stats:
+        Ground.objects.filter(id=row['ground_id']).update(
+            review_count=row['count'],
+            avg_rating=round(row['average'] or 0, 2),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grounds', '0007_ground_last_minute_price_drop_enabled'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='groundpricing',
+            options={'ordering': ['start_time', 'end_time']},
+        ),
+        migrations.AddField(
+            model_name='ground',
+            name='avg_rating',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=3),
+        ),
+        migrations.AddField(
+            model_name='ground',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_review_stats, migrations.RunPython.noop),
+    ]
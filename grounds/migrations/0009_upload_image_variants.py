@@ -0,0 +1,23 @@
+# Generated by Django 4.2.28 on 2026-10-19 02:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grounds', '0008_ground_review_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='groundreview',
+            name='photo_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='tournament',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -34,11 +34,22 @@ class Ground(models.Model):
 
     is_active = models.BooleanField(default=True)
     last_minute_price_drop_enabled = models.BooleanField(default=True)
+    # Denormalised from `reviews` by `refresh_review_stats` so listings need no aggregation.
+    review_count = models.PositiveIntegerField(default=0)
+    avg_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def refresh_review_stats(cls, ground_id):
+        stats = GroundReview.objects.filter(ground_id=ground_id).aggregate(count=models.Count('id'), average=models.Avg('rating'))
+        cls.objects.filter(id=ground_id).update(
+            review_count=stats['count'],
+            avg_rating=round(stats['average'] or 0, 2),
+        )
+
     def get_price_for_time(self, slot_time):
         pricing_blocks = list(self.groundpricing_set.all())
         for pricing in pricing_blocks:
@@ -70,6 +81,8 @@ class Tournament(models.Model):
 
     ground = models.ForeignKey(Ground, on_delete=models.CASCADE, related_name='tournaments')
     image = models.ImageField(upload_to='tournaments/', blank=True, null=True)
+    # Resized WebP/JPEG renditions of `image`, written by `grounds.uploads`.
+    image_variants = models.JSONField(default=dict, blank=True)
     title = models.CharField(max_length=150)
     description = models.TextField(blank=True)
     start_date = models.DateField()
@@ -137,6 +150,8 @@ class GroundReview(models.Model):
     headline = models.CharField(max_length=120, blank=True)
     comment = models.TextField()
     photo = models.ImageField(upload_to='ground-reviews/', blank=True, null=True)
+    # Resized WebP/JPEG renditions of `photo`, written by `grounds.uploads`.
+    photo_variants = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
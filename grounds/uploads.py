@@ -0,0 +1,156 @@
+"""Upload processing for tournament images and review photos.
+
+After an upload is committed, a background worker rewrites the stored file
+without EXIF metadata (location, camera details), capped at
+UPLOAD_IMAGE_MAX_SIDE pixels, and writes WebP and JPEG renditions at each of
+UPLOAD_IMAGE_WIDTHS. The renditions are recorded in the model's `*_variants`
+JSON field and rendered as `srcset` by the `responsive_image` template tag;
+until processing finishes, templates fall back to the original file.
+"""
+
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+
+try:
+    from PIL import Image, ImageOps, UnidentifiedImageError
+except ImportError:  # pragma: no cover - Pillow is in requirements.txt
+    Image = None
+    ImageOps = None
+    UnidentifiedImageError = OSError
+
+
+logger = logging.getLogger(__name__)
+
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# Formats the cleaned original is re-saved in; anything else Pillow decodes (MPO from phones,
+# GIF, BMP) becomes JPEG. HEIF/HEIC needs a plugin we do not ship, so those uploads are
+# logged and left unprocessed.
+ORIGINAL_FORMATS = {'JPEG', 'PNG', 'WEBP'}
+
+_upload_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='footbook-uploads')
+
+
+def variant_widths():
+    return tuple(getattr(settings, 'UPLOAD_IMAGE_WIDTHS', (480, 1080)))
+
+
+def _encode(picture, pil_format, **options):
+    buffer = BytesIO()
+    if pil_format == 'JPEG' and picture.mode != 'RGB':
+        picture = picture.convert('RGB')
+    picture.save(buffer, pil_format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def _stored_names(variants):
+    yield variants['source']
+    for fmt in VARIANT_FORMATS:
+        yield from variants.get(fmt, {}).values()
+
+
+def process_upload(field_file):
+    """Clean the stored image and write its renditions; returns the variants dict.
+
+    The dict maps format to `{width: storage name}` and records the processed
+    `source` name, so a later re-upload is detected as unprocessed. Every file
+    is written under a fresh storage name: upload folders are shared between
+    records, so an existing file of the same name may belong to someone else.
+    The uploaded original is left for the caller to remove.
+    """
+    storage = field_file.storage
+    name = field_file.name
+    with storage.open(name, 'rb') as handle:
+        with Image.open(handle) as uploaded:
+            uploaded.load()
+            source_format = uploaded.format
+            picture = ImageOps.exif_transpose(uploaded)
+    if picture.mode not in ('RGB', 'RGBA'):
+        picture = picture.convert('RGBA' if 'transparency' in picture.info or picture.mode in ('LA', 'P') else 'RGB')
+
+    max_side = getattr(settings, 'UPLOAD_IMAGE_MAX_SIDE', 2048)
+    picture.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    original_format = source_format if source_format in ORIGINAL_FORMATS else 'JPEG'
+    if original_format != source_format:
+        name = f'{os.path.splitext(name)[0]}.jpg'
+    # Re-encoding drops EXIF: Pillow only writes metadata that is passed in explicitly.
+    cleaned_name = storage.save(name, _encode(picture, original_format))
+
+    base = os.path.splitext(cleaned_name)[0]
+    variants = {'source': cleaned_name}
+    for fmt, (pil_format, options) in VARIANT_FORMATS.items():
+        variants[fmt] = {}
+        for width in variant_widths():
+            if width > picture.width and width != min(variant_widths()):
+                continue
+            resized = picture.copy()
+            resized.thumbnail((width, width * 4), Image.Resampling.LANCZOS)
+            variant_name = f'{base}.w{width}.{"jpg" if fmt == "jpeg" else fmt}'
+            variants[fmt][str(width)] = storage.save(variant_name, _encode(resized, pil_format, **options))
+    return variants
+
+
+def needs_processing(field_file, variants):
+    return bool(field_file) and (variants or {}).get('source') != field_file.name
+
+
+def process_instance(model, pk, field_name):
+    """Process one stored upload and record its variants; safe to call repeatedly."""
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return None
+    field_file = getattr(instance, field_name)
+    variants_field = f'{field_name}_variants'
+    if not needs_processing(field_file, getattr(instance, variants_field)):
+        return None
+    uploaded_name = field_file.name
+    try:
+        variants = process_upload(field_file)
+    except (UnidentifiedImageError, OSError, ValueError):
+        logger.warning('Could not process upload %s pk=%s %s', model.__name__, pk, uploaded_name, exc_info=True)
+        return None
+    # Only record the result if the upload was not replaced while we worked.
+    recorded = model.objects.filter(pk=pk, **{field_name: uploaded_name}).update(
+        **{field_name: variants['source'], variants_field: variants}
+    )
+    storage = field_file.storage
+    if not recorded:
+        for name in _stored_names(variants):
+            storage.delete(name)
+        return None
+    storage.delete(uploaded_name)
+    return variants
+
+
+def _process_in_background(model, pk, field_name, on_done):
+    close_old_connections()
+    try:
+        if process_instance(model, pk, field_name) is not None and on_done:
+            on_done()
+    except Exception:
+        logger.exception('Upload processing failed %s pk=%s', model.__name__, pk)
+    finally:
+        close_old_connections()
+
+
+def queue_processing(instance, field_name, on_done=None):
+    """Process `instance.<field_name>` after commit, off the request thread."""
+    if Image is None or not needs_processing(getattr(instance, field_name), getattr(instance, f'{field_name}_variants')):
+        return
+    model, pk = type(instance), instance.pk
+
+    def _submit():
+        try:
+            _upload_executor.submit(_process_in_background, model, pk, field_name, on_done)
+        except RuntimeError:
+            logger.exception('Could not queue upload processing %s pk=%s', model.__name__, pk)
+
+    transaction.on_commit(_submit)
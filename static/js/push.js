@@ -0,0 +1,47 @@
+(function () {
+  var form = document.querySelector('[data-vapid-public-key]');
+  if (!form || !('serviceWorker' in navigator) || !('PushManager' in window)) return;
+  var checkbox = form.querySelector('input[name="push_alerts"]');
+  var publicKey = form.getAttribute('data-vapid-public-key');
+  if (!checkbox || !publicKey) return;
+
+  function keyBytes(base64) {
+    var padded = (base64 + '==='.slice((base64.length + 3) % 4)).replace(/-/g, '+').replace(/_/g, '/');
+    var raw = window.atob(padded);
+    var bytes = new Uint8Array(raw.length);
+    for (var i = 0; i < raw.length; i++) bytes[i] = raw.charCodeAt(i);
+    return bytes;
+  }
+
+  function post(url, body) {
+    var match = document.cookie.match(/csrftoken=([^;]+)/);
+    return fetch(url, {
+      method: 'POST',
+      credentials: 'same-origin',
+      headers: { 'Content-Type': 'application/json', 'X-CSRFToken': match ? match[1] : '' },
+      body: JSON.stringify(body)
+    });
+  }
+
+  checkbox.addEventListener('change', function () {
+    navigator.serviceWorker.register('/push-sw.js').then(function (registration) {
+      return registration.pushManager.getSubscription().then(function (existing) {
+        if (!checkbox.checked) {
+          if (!existing) return null;
+          return post('/push/unsubscribe/', { endpoint: existing.endpoint }).then(function () {
+            return existing.unsubscribe();
+          });
+        }
+        if (existing) return post('/push/subscribe/', existing.toJSON());
+        return registration.pushManager.subscribe({
+          userVisibleOnly: true,
+          applicationServerKey: keyBytes(publicKey)
+        }).then(function (subscription) {
+          return post('/push/subscribe/', subscription.toJSON());
+        });
+      });
+    }).catch(function () {
+      checkbox.checked = false;
+    });
+  });
+})();
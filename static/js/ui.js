@@ -370,7 +370,7 @@ document.addEventListener('DOMContentLoaded', function() {
       var state = flag.getAttribute('data-slot-state');
       if (state === 'available') available += 1;
       if (state === 'booked') booked += 1;
-      if (state === 'past') booked += 1;
+      if (state === 'past' || state === 'held') booked += 1;
       if (state === 'your') yours += 1;
     });
 
@@ -0,0 +1,18 @@
+self.addEventListener('push', function (event) {
+  var data = {};
+  try {
+    data = event.data ? event.data.json() : {};
+  } catch (err) {
+    data = {};
+  }
+  event.waitUntil(self.registration.showNotification(data.title || 'FootBook', {
+    body: data.body || '',
+    tag: data.tag || undefined,
+    data: { url: data.url || '/' }
+  }));
+});
+
+self.addEventListener('notificationclick', function (event) {
+  event.notification.close();
+  event.waitUntil(clients.openWindow(event.notification.data.url));
+});